@@ -14,26 +14,41 @@
 # javascript
 # https://blog.logrocket.com/build-interactive-charts-flask-d3js/
 
-import numpy as np
+import functools
+import gzip
+import hashlib
+import math
+import os
+from collections.abc import Callable
+from urllib.parse import quote, urlencode
+
 import pandas as pd
-from calculations import calculate_comparison_school_list
 from flask import (
     Flask,
+    Response,
+    abort,
+    make_response,
     render_template,
     request,
 )
 
 # local imports
+from cache import VersionedCache
 from load_data import (
-    current_academic_year,
-    current_demographic_year,
+    db_path,
     get_academic_data,
     get_available_years,
+    get_comparison_list,
+    get_data_version,
+    get_context,
     get_demographic_data,
+    get_pool_stats,
     get_public_dropdown,
-    get_school_coordinates,
 )
+from load_data import warm_up as warm_up_data
 from process_data import clean_academic_data
+from serialize import dumps, to_columns, to_records
+from work_pool import Overloaded, WorkPool
 
 # basedir = os.path.abspath(os.path.dirname(__file__))  # noqa: ERA001
 
@@ -44,119 +59,374 @@ app = Flask(__name__, static_folder="./modules")
 # db = SQLAlchemy(app)  # noqa: ERA001
 
 
+# HTTP caching: every data endpoint is a function of its parameters and of
+# the data, so the ETag of a response is a hash of the data version, the
+# route, and the canonical parameters, and is computed before the response
+# is. A request with a matching If-None-Match gets a 304 without any work.
+# GET responses may be cached for cache_max_age seconds (and revalidated
+# after that). Bump response_version when the format of a response changes.
+response_version = "1"
+
+cache_max_age = int(os.environ.get("DASHBOARD_CACHE_MAX_AGE", "300"))
+
+# parameters that are lists (comma separated in a query string)
+list_parameters = ["comparison_schools"]
+
+
+def get_selections() -> dict:
+    """
+    Gets the parameters of a data request, either from the json body of a
+    POST or from the query string of the equivalent GET, e.g.:
+
+        /academic?comparison_schools=1234,5678&hs_tab=gradTab&k8_tab=...
+
+    Returns:
+        dict: request parameters
+    """
+    if request.method == "POST":
+        return request.get_json()
+
+    selections = request.args.to_dict()
+    selections.pop("format", None)
+
+    for key in list_parameters:
+        if key in selections:
+            selections[key] = [v for v in selections[key].split(",") if v]
+
+    return selections
+
+
+def canonical_query(selections: dict) -> str:
+    """
+    Returns:
+        str: the canonical query string of a set of parameters - sorted by
+        name, lists joined by commas, and null values left out (the same
+        as canonicalQuery in modules/utils.js)
+    """
+    return urlencode(
+        [
+            (key, ",".join(str(v) for v in value) if isinstance(value, list) else value)
+            for key, value in sorted(selections.items())
+            if value is not None
+        ],
+        safe=",!*'()",
+        quote_via=quote,
+    )
+
+
+def accepts_gzip() -> bool:
+    # responses may be gzip compressed, so the compressed and uncompressed
+    # versions of a response have different ETags
+    return request.accept_encodings["gzip"] > 0
+
+
+def get_etag(selections: dict) -> str:
+    """
+    Returns:
+        str: the ETag of the response to the current request
+    """
+    key = "|".join(
+        [
+            response_version,
+            get_data_version(),
+            request.method,
+            request.path,
+            request.args.get("format", ""),
+            "gzip" if accepts_gzip() else "",
+            canonical_query(selections),
+        ],
+    )
+
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def cached(view: Callable) -> Callable:
+    """
+    Adds ETag and Cache-Control headers to the responses of a route, and
+    answers a conditional request for an unchanged response with a 304.
+    """
+    @functools.wraps(view)
+    def cached_view(*args, **kwargs) -> Response:  # noqa: ANN002, ANN003
+        etag = get_etag(get_selections())
+
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+
+            if response.status_code != 200:  # noqa: PLR2004
+                return response
+
+        response.set_etag(etag)
+        response.vary.add("Accept-Encoding")
+
+        if request.method == "GET":
+            response.headers["Cache-Control"] = f"public, max-age={cache_max_age}"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+
+        return response
+
+    return cached_view
+
+
+def json_response(data: object) -> Response:
+    """
+    Returns data (e.g., a list of records from serialize.to_records) encoded
+    by serialize.dumps.
+    """
+    return Response(dumps(data), mimetype="application/json")
+
+
+def encode_frame(df: pd.DataFrame) -> list | dict:
+    """
+    Returns a frame as row records, or in the columnar format if the request
+    has format=columnar in its query string (see serialize.to_columns and
+    fromColumnar in modules/utils.js).
+    """
+    if request.args.get("format") == "columnar":
+        return to_columns(df)
+
+    return to_records(df)
+
+
+# the sqlite/pandas work of the data endpoints runs on a bounded pool (see
+# work_pool.py). When it is full, requests get a 503 with Retry-After.
+work_pool = WorkPool(
+    max_workers=int(os.environ.get("DASHBOARD_WORK_THREADS", "2")),
+    max_pending=int(os.environ.get("DASHBOARD_MAX_PENDING", "14")),
+    timeout=float(os.environ.get("DASHBOARD_WORK_TIMEOUT", "30")),
+)
+
+retry_after = 1
+
+
+@app.errorhandler(Overloaded)
+def overloaded(error: Overloaded) -> Response:
+    response = json_response({"error": str(error)})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(retry_after)
+
+    return response
+
+
+# the /load response only changes when new data is loaded, so it is encoded
+# (and compressed) once - on first use, and again if the database changes
+dropdown_responses = VersionedCache(db_path)
+
+
+def get_dropdown_response() -> tuple[bytes, bytes]:
+    """
+    Returns:
+        tuple: the encoded school dropdown list, and the same gzip compressed
+    """
+    def encode() -> tuple[bytes, bytes]:
+        school_df = get_public_dropdown()
+        school_df = school_df.sort_values(
+            ["Corporation Name", "School Name"], ascending=[True, True])
+
+        body = dumps(to_records(school_df))
+
+        return body, gzip.compress(body, compresslevel=6)
+
+    return dropdown_responses.get_or_create("load", encode)
+
+
+def warm_up(all_years: bool = False) -> None:
+    """
+    Startup hook: creates the data context (see load_data.DataContext) and
+    fills the caches, including the /load response, before the first
+    request. Without it, the first request does this work.
+
+    Args:
+        all_years (bool): build the comparison indexes of every year
+    """
+    context = warm_up_data(all_years)
+
+    context.timed("Dropdown response encoded", get_dropdown_response)
+
+
 @app.route("/")
 def index():
     return render_template("index.html")
 
 
 @app.route("/config", methods=["GET"])
+@cached
 def load_config():
 
-    # these are global values  calculated in load_data
+    # these are read from the database (and re-read when it changes)
+    context = get_context()
+
     return {
-        "academic_year": current_academic_year,
-        "demographic_year": current_demographic_year,
+        "academic_year": context.current_academic_year,
+        "demographic_year": context.current_demographic_year,
     }
 
 
+# database connection pool and cache statistics
+@app.route("/pool", methods=["GET"])
+def load_pool_stats():
+
+    return {**get_pool_stats(), "work_pool": work_pool.stats()}
+
+
 # school dropdown list
 @app.route("/load", methods=["GET"])
+@cached
 def load_school_dropdown():
 
-    school_df = get_public_dropdown()
-    school_df = school_df.sort_values(
-        ["Corporation Name", "School Name"], ascending=[True, True])
+    body, compressed = get_dropdown_response()
 
-    return [
-        {k: v for k, v in m.items() if v == v and v is not None}
-        for m in school_df.to_dict(orient="records")
-    ]
+    if not accepts_gzip():
+        return Response(body, mimetype="application/json")
+
+    response = Response(compressed, mimetype="application/json")
+    response.headers["Content-Encoding"] = "gzip"
+
+    return response
 
 
 # comparison schools list
-@app.route("/where", methods=["POST"])
+@app.route("/where", methods=["GET", "POST"])
+@cached
 def load_school_coordinates():
 
-    selections = request.get_json()
-    school_id = selections["school_id"]
-    year = int(selections["year"])
-    school_type = selections["school_type"]
+    selections = get_selections()
 
-    # get coordinates for all schools for a year
-    coordinates = get_school_coordinates(year, school_type)
+    # lists are precomputed by prepare_database.py, falling back to the
+    # comparison index of all schools for the year and type. Schools with
+    # fewer than 30 students, or without at least a two grade overlap with
+    # the selected school, are filtered out of the nearest neighbors (the
+    # selected school is always retained) - see calculations.ComparisonIndex.
+    # The optional max_distance parameter limits the list to the schools
+    # within that many miles.
 
-    # Drop any school not testing at least 20 students (probably only
-    # impacts ~20 schools). the second condition ensures that the school
-    # is retained if it exists
-    coordinates["Total Student Count"] = coordinates[
-        "Total Student Count"
-    ].replace("", np.nan)
+# TODO: Add School Type Here to filter out unrelated schools from the list
+# TODO: MS are still showing up for IREAD - NEED TO DROP THEM
+    comparison_list, scanned = get_comparison_list(
+        selections["year"],
+        selections["school_type"],
+        selections["school_id"],
+        selections["type_tab"],
+        20,
+        get_max_distance(selections),
+    )
 
-    coordinates = coordinates.dropna(subset=["Total Student Count"])
+    # the number of candidate schools checked is reported in a header so
+    # that the response body is unchanged
+    return comparison_list, {"X-Candidates-Scanned": str(scanned)}
 
-    coordinates["Total Student Count"] = pd.to_numeric(
-        coordinates["Total Student Count"], errors="coerce")
 
-    coordinates = coordinates[
-        (coordinates["Total Student Count"].astype(int) >= 30)
-        | (coordinates["School ID"] == int(school_id))
-    ]
+def get_max_distance(selections: dict) -> float:
+    """
+    Returns:
+        float: the max_distance parameter of a comparison school list (in
+        miles), or inf if it is not set
+    """
+    max_distance = selections.get("max_distance")
 
-    # NOTE: Before we do the distance check, we reduce the size of the
-    # df removing schools where there is no or only one grade overlap
-    # between the comparison schools.the variable "overlap" is one less
-    # than the the number of grades that we want as a minimum (a value
-    # of "1" means a 2 grade overlap, "2" means 3 grade overlap, etc.).
-    # coordinates = check_for_gradespan_overlap(selections, coordinates)  # noqa: ERA001
+    if max_distance is None or max_distance == "":
+        return math.inf
 
-# TODO: Add School Type Here to filter out unrelated schools from the list
-# TODO: MS are still showing up for IREAD - NEED TO DROP THEM
-    # use scipy.spatial KDTree method to calculate distances from given school_id
-    return calculate_comparison_school_list(selections, coordinates, 20)
+    try:
+        max_distance = float(max_distance)
+    except (TypeError, ValueError):
+        max_distance = math.nan
 
+    if not max_distance > 0:
+        abort(400, "max_distance must be a positive number of miles")
+
+    return max_distance
 
-@app.route("/demographic", methods=["post"])
-def load_demographic_data():
 
-    data = request.get_json()
+def get_school_type(selections: dict) -> str:
+    """
+    The school type of the academic data of a selection. school_subtype for
+    K12 will either be K8 or HS, school_subtype for K8 will be ES, MS, or K8.
 
-    all_demographic_data = get_demographic_data(data)
+    Returns:
+        str: K8, HS, or AHS
+    """
+    if selections["school_type"] == "K12":
+        if selections["school_subtype"] == "K12":
+            return "HS" if selections["type_tab"] == "hsTab" else "K8"
 
-    all_demographic_data = all_demographic_data.sort_values(by="Year")
+        return selections["school_subtype"]
 
-    all_demographic_data.columns = all_demographic_data.columns.str.replace(
+    return selections["school_type"]
+
+
+def get_category(selections: dict, school_type: str) -> str:
+    """
+    Returns:
+        str: the selected category tab of the school type
+    """
+    return selections["k8_tab"] if school_type == "K8" else selections["hs_tab"]
+
+
+def demographic_response(data: pd.DataFrame) -> list:
+    """
+    Returns:
+        list: the /demographic response for the demographic data
+    """
+    data = data.sort_values(by="Year")
+
+    data.columns = data.columns.str.replace(
         "Native Hawaiian or Other Pacific Islander", "Pacific Islander",
         regex=True)
 
-    all_demographic_data_object = [
-        {k: v for k, v in m.items() if v == v and v is not None}
-        for m in all_demographic_data.to_dict(orient="records")
-    ]
+    return [encode_frame(data)]
+
+
+def academic_response(data: pd.DataFrame) -> list:
+    """
+    Returns:
+        list: the /academic response for processed academic data
+    """
+    # df is empty or only has information cols (e.g., MS for IREAD data)
+    if len(data.columns) <= 6:
+        return []
+
+    # # clarify school type (NOTE: Bake this in to clean_data?)
+    # gradespan = get_gradespan(data["school_id"], data["school_type"],
+    # data["year"])
+
+    data = data.sort_values(by="Year")
+
+    data.columns = data.columns.str.replace(
+        "English Language", "English", regex=True)
+
+# TODO: Check to see if we are even loading Pacific Islander data ..
+    data.columns = data.columns.str.replace(
+        "Native Hawaiian or Other Pacific Islander", "Pacific Islander",
+        regex=True)
+
+    return [encode_frame(data)]
+
+
+@app.route("/demographic", methods=["GET", "POST"])
+@cached
+def load_demographic_data():
 
-    return [all_demographic_data_object]
+    data = get_selections()
 
+    all_demographic_data = work_pool.run(get_demographic_data, data)
 
-@app.route("/years", methods=["POST"])
+    return json_response(demographic_response(all_demographic_data))
+
+
+@app.route("/years", methods=["GET", "POST"])
+@cached
 def get_years():
 
-    data = request.get_json()
+    data = get_selections()
 
     print(data)
 
     school_id = int(data["school_id"])
 
-    # school_subtype for K12 will either be K8 or HS, school_subtype
-    # for K8 will be ES, MS, or K8
-
-    if data["school_type"] == "K12":
-        if data["school_subtype"] == "K12":
-            school_type = "HS" if data["type_tab"] == "hsTab" else "K8"
-        else:
-            school_type = data["school_subtype"]
-    else:
-        school_type = data["school_type"]
-
-    category = data["k8_tab"] if school_type == "K8" else data["hs_tab"]
+    category = get_category(data, get_school_type(data))
 
     available_years = get_available_years(school_id, category)
 
@@ -165,62 +435,117 @@ def get_years():
     return available_years
 
 
+def read_academic_data(
+    schools: list, school_type: str, year: str, page_tab: str, category: str,
+) -> pd.DataFrame:
+    """
+    Reads and processes the academic data of a school and its comparison
+    schools (run on the work pool).
+    """
+    raw_data = get_academic_data(schools, school_type, category)
+
+    return clean_academic_data(
+        raw_data, schools, school_type, year, page_tab, category,
+    )
+
+
 # academic data
-@app.route("/academic", methods=["POST"])
+@app.route("/academic", methods=["GET", "POST"])
+@cached
 def load_academic_data():
 
-    data = request.get_json()
-
-    schools = [int(data["school_id"])] + data["comparison_schools"]
+    data = get_selections()
 
-    # school_subtype for K12 will either be K8 or HS, school_subtype
-    # for K8 will be ES, MS, or K8
+    schools = [int(data["school_id"])] + data.get("comparison_schools", [])
 
-    if data["school_type"] == "K12":
-        if data["school_subtype"] == "K12":
-            school_type = "HS" if data["type_tab"] == "hsTab" else "K8"
-        else:
-            school_type = data["school_subtype"]
-    else:
-        school_type = data["school_type"]
+    school_type = get_school_type(data)
 
-    raw_data = get_academic_data(schools, school_type)
+    # only the columns needed by the selected category tab are read
+    category = get_category(data, school_type)
 
-    data = clean_academic_data(
-        raw_data,
+    data = work_pool.run(
+        read_academic_data,
         schools,
         school_type,
         data["year"],
         data["page_tab"],
+        category,
     )
 
-    # df is empty or only has information cols (e.g., MS for IREAD data)
-    if len(data.columns) <= 6:
-        return_values = []
+    return json_response(academic_response(data))
 
-    else:
-        # # clarify school type (NOTE: Bake this in to clean_data?)
-        # gradespan = get_gradespan(data["school_id"], data["school_type"],
-        # data["year"])
 
-        data = data.sort_values(by="Year")
+def read_school_academic_data(
+    schools: list, school_type: str, year: str, category: str,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Reads and processes the academic information (the school) and analysis
+    (the school and its comparison schools) data of a school. The raw rows
+    of each school are cached (see load_data.get_academic_data), so the
+    rows of the school are only read once.
 
-        data.columns = data.columns.str.replace(
-            "English Language", "English", regex=True)
+    Returns:
+        tuple: the info and the analysis data
+    """
+    analysis_data = read_academic_data(
+        schools, school_type, year, "analysisTab", category,
+    )
 
-# TODO: Check to see if we are even loading Pacific Islander data ..
-        data.columns = data.columns.str.replace(
-            "Native Hawaiian or Other Pacific Islander", "Pacific Islander",
-            regex=True)
+    info_data = read_academic_data(
+        schools[:1], school_type, year, "infoTab", category,
+    )
+
+    return info_data, analysis_data
+
+
+# everything the page loads for a school, in one round trip: the
+# /demographic, /years, /where, and /academic (info and analysis page)
+# responses for the same selections. The comparison schools of the analysis
+# data are the selected comparison_schools or, if there are none, the four
+# closest schools of the comparison list (the page's default selection).
+@app.route("/school", methods=["GET", "POST"])
+@cached
+def load_school_data():
+
+    data = get_selections()
+
+    school_id = int(data["school_id"])
 
-        school_proficiency = [
-            {k: v for k, v in m.items() if v == v and v is not None}
-            for m in data.to_dict(orient="records")
-        ]
+    # the school type is resolved once for all of the parts
+    school_type = get_school_type(data)
+    category = get_category(data, school_type)
 
-        return_values = [school_proficiency]
+    comparison_list, _ = get_comparison_list(
+        data["year"],
+        data["school_type"],
+        school_id,
+        data["type_tab"],
+        20,
+        get_max_distance(data),
+    )
+
+    comparison_schools = data.get("comparison_schools") or [
+        school["School ID"] for school in comparison_list[1:5]
+    ]
+
+    schools = [school_id] + [int(s) for s in comparison_schools]
+
+    # the parts are read in parallel on the work pool
+    demographic_data, available_years, (info_data, analysis_data) = (
+        work_pool.run_all([
+            (get_demographic_data, data),
+            (get_available_years, school_id, category),
+            (read_school_academic_data, schools, school_type, data["year"], category),
+        ])
+    )
 
-    return return_values
+    return json_response({
+        "demographic": demographic_response(demographic_data),
+        "years": available_years,
+        "comparison_schools": comparison_list,
+        "info": academic_response(info_data),
+        "analysis": academic_response(analysis_data),
+    })
 
 
 if __name__ == "__main__":
@@ -0,0 +1,1039 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# micro-benchmarks                      #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+# Run from the project root (uses the dashboard database):
+#
+#   python benchmark.py check_total_tested
+#   python benchmark.py kernels
+#   python benchmark.py projection
+#   python benchmark.py serialize
+#   python benchmark.py startup
+#   python benchmark.py workers     (requires gunicorn)
+#   python benchmark.py load        (requires gunicorn)
+#   python benchmark.py school
+#   python benchmark.py partitions
+#
+# Each benchmark times the current implementation against a copy of the
+# implementation it replaced, and checks that both return the same result.
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from sqlalchemy import text
+
+from calculations import (
+    calculate_percentage,
+    calculate_proficiency,
+    recalculate_total_proficiency,
+)
+from load_data import (
+    academic_data_cache,
+    get_academic_data,
+    get_context,
+    run_query,
+)
+from measures import Measures
+from process_data import check_total_tested, clean_academic_data
+from serialize import dumps, orjson, to_columns, to_records
+
+
+def time_call(func: Callable, repeat: int) -> float:
+    """
+    Returns:
+        float: the best time of [repeat] calls of func, in milliseconds
+    """
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best * 1000
+
+
+def report(name: str, reference_ms: float, current_ms: float) -> None:
+    print(  # noqa: T201
+        f"{name}: reference {reference_ms:.2f} ms, current {current_ms:.2f} ms "
+        f"({reference_ms / current_ms:.1f}x)",
+    )
+
+
+def current_year() -> int:
+    """
+    Returns:
+        int: the current academic year
+    """
+    return get_context().current_academic_year
+
+
+def get_analysis_schools(school_type: str, num_schools: int) -> list:
+    """
+    Returns:
+        list: the IDs of [num_schools] schools of a type, the same number as
+        an analysis page request for a school and its comparison schools
+    """
+    table = "academic_data_k8" if school_type == "K8" else "academic_data_hs"
+
+    q = text(
+        f"""
+        SELECT DISTINCT SchoolID
+        FROM {table}
+        WHERE Year = :year AND SchoolType = :type
+        LIMIT :limit
+    """,  # noqa: S608
+    )
+
+    return run_query(
+        q, {"year": current_year(), "type": school_type, "limit": num_schools},
+    )["School ID"].tolist()
+
+
+def get_analysis_frame(school_type: str, num_schools: int) -> pd.DataFrame:
+    """
+    Gets the raw academic data of [num_schools] schools, the same as an
+    analysis page request for a school and its comparison schools.
+    """
+    return get_academic_data(get_analysis_schools(school_type, num_schools), school_type)
+
+
+def check_total_tested_reference(
+    df: pd.DataFrame, school_id: str, school_type: str,
+) -> pd.DataFrame:
+    # check_total_tested before it was vectorized
+    drop_columns = []
+
+    data = df.copy()
+
+    data["School ID"] = data["School ID"].astype("Int64").astype("str")
+    data["Corporation ID"] = data["Corporation ID"].astype("Int64").astype("str")
+
+    if school_type == "K8":
+        tested_cols = [
+            col
+            for col in data.columns.to_list()
+            if "Total Tested" in col or "Test N" in col
+        ]
+    else:
+        tested_cols = [
+            col
+            for col in data.columns.to_list()
+            if "Total Tested" in col or "Cohort Count" in col
+        ]
+
+    for col in tested_cols:
+        if (
+            pd.to_numeric(
+                data[data["School ID"] == str(school_id)][col], errors="coerce",
+            ).sum()
+            == 0
+            or data[data["School ID"] == str(school_id)][col].isnull().all()
+        ):
+            if "Total Tested" in col:
+                match_string = " Total Tested"
+            else:
+                match_string = " Test N" if school_type == "K8" else "|Cohort Count"
+
+            matching_cols = data.columns[
+                pd.Series(data.columns).str.startswith(col.split(match_string)[0])
+            ]
+
+            drop_columns.append(matching_cols.tolist())
+
+    drop_all = [i for sub_list in drop_columns for i in sub_list]
+
+    data = data.drop(drop_all, axis=1).copy()
+
+    return data.reset_index(drop=True)
+
+
+def benchmark_check_total_tested(num_schools: int, repeat: int) -> None:
+    for school_type in ["K8", "HS"]:
+        data = get_analysis_frame(school_type, num_schools)
+
+        if data.empty:
+            continue
+
+        school_id = str(int(data["School ID"].iloc[0]))
+
+        pd.testing.assert_frame_equal(
+            check_total_tested_reference(data, school_id, school_type),
+            check_total_tested(data, school_id, school_type),
+        )
+
+        report(
+            f"check_total_tested {school_type} ({num_schools} schools, "
+            f"{len(data.columns)} columns)",
+            time_call(
+                lambda d=data, s=school_id, t=school_type: (
+                    check_total_tested_reference(d, s, t)
+                ),
+                repeat,
+            ),
+            time_call(
+                lambda d=data, s=school_id, t=school_type: check_total_tested(d, s, t),
+                repeat,
+            ),
+        )
+
+
+def calculate_percentage_reference(
+    numerator: pd.Series, denominator: pd.Series,
+) -> npt.NDArray:
+    # calculate_percentage before the kernels were fused
+    return np.where(
+        (numerator == "***") | (denominator == "***"),
+        "***",
+        np.where(
+            pd.to_numeric(numerator, errors="coerce").isna()
+            & pd.to_numeric(denominator, errors="coerce").isna(),
+            None,
+            np.where(
+                pd.to_numeric(numerator, errors="coerce").isna(),
+                0,
+                pd.to_numeric(numerator, errors="coerce")
+                / pd.to_numeric(denominator, errors="coerce"),
+            ),
+        ),
+    )
+
+
+def assert_same_values(expected: npt.NDArray, result: npt.NDArray) -> None:
+    """
+    Exact comparison of two object arrays (same shape, same types, and same
+    values - NaN is equal to NaN).
+    """
+    assert expected.shape == result.shape, (expected.shape, result.shape)
+    assert expected.dtype == result.dtype, (expected.dtype, result.dtype)
+
+    for e, r in zip(expected.ravel(), result.ravel(), strict=True):
+        assert type(e) is type(r), (e, r)
+        assert e == r or (e != e and r != r), (e, r)  # noqa: PLR0124
+
+
+def benchmark_kernels(num_schools: int, repeat: int) -> None:
+    data = get_analysis_frame("K8", num_schools)
+
+    tested = [c for c in data.columns if c.endswith("Total Tested")]
+    proficient = [c.replace("Total Tested", "Total Proficient") for c in tested]
+
+    def reference_loop() -> list:
+        return [
+            calculate_percentage_reference(data[p], data[t])
+            for p, t in zip(proficient, tested, strict=True)
+        ]
+
+    def fused_block() -> npt.NDArray:
+        return calculate_percentage(data[proficient], data[tested])
+
+    expected = np.column_stack(reference_loop()) if tested else np.empty((0, 0))
+    assert_same_values(expected.astype(object), fused_block())
+
+    report(
+        f"calculate_percentage ({num_schools} schools, {len(tested)} categories)",
+        time_call(reference_loop, repeat),
+        time_call(fused_block, repeat),
+    )
+
+
+def benchmark_projection(num_schools: int, repeat: int) -> None:
+    """
+    Times reading (uncached) and processing the academic data of an analysis
+    page request with every column against only the columns of each tab,
+    and checks that the processed data of a tab is the same either way.
+    """
+    for school_type, tab in [
+        ("K8", "ilearnTab"),
+        ("K8", "ireadTab"),
+        ("HS", "gradTab"),
+        ("HS", "satTab"),
+    ]:
+        school_ids = get_analysis_schools(school_type, num_schools)
+
+        if not school_ids:
+            continue
+
+        def read(
+            ids: list = school_ids, t: str = school_type, c: str | None = tab,
+        ) -> pd.DataFrame:
+            academic_data_cache.clear()
+            return get_academic_data(ids, t, c)
+
+        def process(
+            ids: list = school_ids, t: str = school_type, c: str | None = tab,
+        ) -> pd.DataFrame:
+            return clean_academic_data(
+                get_academic_data(ids, t, c), ids, t, current_year(),
+                "analysisTab", c,
+            )
+
+        full = read(c=None)
+        projected = read()
+
+        expected = process(c=None)
+        result = process()
+
+        pd.testing.assert_frame_equal(expected[result.columns], result)
+
+        print(  # noqa: T201
+            f"projection {tab}: {len(projected.columns)} of {len(full.columns)} "
+            f"columns, {projected.memory_usage(deep=True).sum() / 1024:.0f} of "
+            f"{full.memory_usage(deep=True).sum() / 1024:.0f} KB",
+        )
+
+        report(
+            f"get_academic_data {tab} ({num_schools} schools)",
+            time_call(lambda r=read: r(c=None), repeat),
+            time_call(read, repeat),
+        )
+
+        report(
+            f"clean_academic_data {tab} ({num_schools} schools)",
+            time_call(lambda p=process: p(c=None), repeat),
+            time_call(process, repeat),
+        )
+
+
+def serialize_reference(df: pd.DataFrame) -> bytes:
+    # the records comprehension and the Flask (stdlib json) encoding that
+    # serialize.py replaced
+    records = [
+        {k: v for k, v in m.items() if v == v and v is not None}
+        for m in df.to_dict(orient="records")
+    ]
+
+    return json.dumps(records, sort_keys=True, separators=(",", ":")).encode()
+
+
+def without_infinity(value: object) -> object:
+    # serialize.to_records() keeps infinite values as null
+    if isinstance(value, float) and math.isinf(value):
+        return None
+
+    if isinstance(value, dict):
+        return {k: without_infinity(v) for k, v in value.items()}
+
+    if isinstance(value, list):
+        return [without_infinity(v) for v in value]
+
+    return value
+
+
+def from_columns(table: dict) -> list:
+    # python version of fromColumnar() (modules/utils.js)
+    nulls = [set(rows) for rows in table["nulls"]]
+
+    return [
+        {
+            column: table["values"][j][i]
+            for j, column in enumerate(table["columns"])
+            if i not in nulls[j]
+        }
+        for i in range(len(table["values"][0]) if table["columns"] else 0)
+    ]
+
+
+def benchmark_serialize(num_schools: int, repeat: int) -> None:
+    """
+    Times encoding a processed analysis page frame as json with the records
+    comprehension against serialize.to_records() and serialize.dumps(), and
+    checks that both decode to the same data. Also compares the size of the
+    records with the columnar format (format=columnar).
+    """
+    print(f"serialize: orjson {'installed' if orjson else 'not installed'}")  # noqa: T201
+
+    for school_type, tab in [("K8", "ilearnTab"), ("HS", "satTab")]:
+        school_ids = get_analysis_schools(school_type, num_schools)
+
+        if not school_ids:
+            continue
+
+        data = clean_academic_data(
+            get_academic_data(school_ids, school_type, tab),
+            school_ids, school_type, current_year(), "analysisTab", tab,
+        )
+
+        assert without_infinity(json.loads(serialize_reference(data))) == json.loads(
+            dumps(to_records(data)),
+        )
+
+        report(
+            f"serialize {tab} ({len(data.index)} rows, {len(data.columns)} columns)",
+            time_call(lambda d=data: serialize_reference(d), repeat),
+            time_call(lambda d=data: dumps(to_records(d)), repeat),
+        )
+
+        records = dumps(to_records(data))
+        columns = dumps(to_columns(data))
+
+        assert from_columns(json.loads(columns)) == json.loads(records)
+
+        report(
+            f"serialize {tab} columnar",
+            time_call(lambda d=data: serialize_reference(d), repeat),
+            time_call(lambda d=data: dumps(to_columns(d)), repeat),
+        )
+
+        print(  # noqa: T201
+            f"serialize {tab}: records {len(records) / 1024:.0f} KB, "
+            f"columnar {len(columns) / 1024:.0f} KB",
+        )
+
+
+def run_python(code: str, cwd: str | None = None) -> str:
+    """
+    Runs python code in a new interpreter, in cwd (by default the current
+    directory - the database path is relative), with the project on the path.
+
+    Returns:
+        str: the last line of the output
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code],
+        cwd=cwd,
+        env={**os.environ, "PYTHONPATH": root},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    return result.stdout.strip().splitlines()[-1]
+
+
+def benchmark_startup(num_schools: int, repeat: int) -> None:  # noqa: ARG001
+    """
+    Times importing the app in a new interpreter (which no longer reads from
+    the database) and warming up the data context, and checks that the app
+    can be imported when the database file is missing.
+    """
+    timer = "import time; start = time.perf_counter(); {}; " \
+        "print((time.perf_counter() - start) * 1000)"
+
+    runs = min(repeat, 5)
+
+    import_ms = min(
+        float(run_python(timer.format("import app"))) for _ in range(runs)
+    )
+
+    warm_up_ms = min(
+        float(run_python("import app; " + timer.format("app.warm_up()")))
+        for _ in range(runs)
+    )
+
+    print(  # noqa: T201
+        f"startup: import app {import_ms:.0f} ms, warm_up {warm_up_ms:.0f} ms",
+    )
+
+    # the database path is relative, so it does not exist in an empty directory
+    with tempfile.TemporaryDirectory() as empty:
+        missing = run_python(
+            "import app, load_data\n"
+            "try:\n"
+            "    load_data.get_context()\n"
+            "except FileNotFoundError as e:\n"
+            "    print(e)",
+            cwd=empty,
+        )
+
+    assert missing.startswith("database file not found"), missing
+
+    print("startup: app imports without the database")  # noqa: T201
+
+
+def get_memory(pid: int) -> dict:
+    """
+    Returns:
+        dict: the resident (Rss), proportional (Pss - shared pages divided
+        among the processes that share them), and private memory of a
+        process, in KiB (from /proc/[pid]/smaps_rollup)
+    """
+    memory = {}
+
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+
+            if value.strip().endswith("kB"):
+                memory[name] = int(value.split()[0])
+
+    memory["Private"] = memory["Private_Clean"] + memory["Private_Dirty"]
+
+    return memory
+
+
+def get_worker_pids(pid: int) -> list:
+    """
+    Returns:
+        list: the pids of the child processes (workers) of a process
+    """
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def report_workers(label: str, pids: list) -> None:
+    memory = [get_memory(p) for p in pids]
+
+    rss = [m["Rss"] / 1024 for m in memory]
+    pss = [m["Pss"] / 1024 for m in memory]
+    private = [m["Private"] / 1024 for m in memory]
+
+    print(  # noqa: T201
+        f"  {label}: worker Rss {' '.join(f'{r:.0f}' for r in rss)} MB, "
+        f"Pss {' '.join(f'{p:.0f}' for p in pss)} MB "
+        f"(total {sum(pss):.0f} MB), private {sum(private) / len(private):.0f} MB "
+        "per worker",
+    )
+
+
+def get_json(url: str) -> object:
+    with urllib.request.urlopen(url, timeout=30) as response:  # noqa: S310
+        return json.loads(response.read())
+
+
+def send_traffic(url: str, num_schools: int) -> None:
+    """
+    Requests the info and analysis pages of num_schools K8 schools.
+    """
+    for page_url in get_page_urls(url, num_schools):
+        get_json(page_url)
+
+
+@contextlib.contextmanager
+def gunicorn_server(
+    port: int, num_workers: int, env: dict, args: list | None = None,
+) -> Iterator[subprocess.Popen]:
+    """
+    Runs gunicorn (with gunicorn.conf.py) until every worker is forked and
+    warmed up.
+
+    Args:
+        port (int): port to bind
+        num_workers (int): number of workers
+        env (dict): environment variables (e.g., DASHBOARD_PRELOAD)
+        args (list|None): other gunicorn arguments
+
+    Yields:
+        subprocess.Popen: the gunicorn master
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+
+    # the "encoded" line is logged once by each warm-up
+    expected = num_workers if env.get("DASHBOARD_PRELOAD") == "0" else 1
+
+    with tempfile.TemporaryFile(mode="w+") as log:
+        server = subprocess.Popen(  # noqa: S603
+            [
+                sys.executable, "-m", "gunicorn",
+                "-c", os.path.join(root, "gunicorn.conf.py"),
+                "--bind", f"127.0.0.1:{port}",
+                "--workers", str(num_workers),
+                *(args or []),
+            ],
+            env={**os.environ, "PYTHONPATH": root, **env},
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+        try:
+            deadline = time.monotonic() + 120
+
+            while True:
+                log.seek(0)
+                warmed_up = log.read().count("Dropdown response encoded")
+                forked = len(get_worker_pids(server.pid))
+
+                if warmed_up >= expected and forked == num_workers:
+                    break
+
+                if server.poll() is not None or time.monotonic() > deadline:
+                    log.seek(0)
+                    raise RuntimeError(log.read())
+
+                time.sleep(0.2)
+
+            yield server
+
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def benchmark_workers(num_schools: int, repeat: int) -> None:  # noqa: ARG001
+    """
+    Starts gunicorn (gunicorn.conf.py, 4 workers) with and without the
+    preforking warm-up (DASHBOARD_PRELOAD), and reports the memory of each
+    worker once it is warmed up, and again after serving the pages of
+    num_schools schools.
+    """
+    num_workers = 4
+
+    for port, preload in [(3101, "0"), (3102, "1")]:
+        with gunicorn_server(
+            port, num_workers, {"DASHBOARD_PRELOAD": preload},
+        ) as server:
+            pids = get_worker_pids(server.pid)
+
+            print(f"workers: preload={preload}")  # noqa: T201
+            report_workers("warmed up", pids)
+
+            send_traffic(f"http://127.0.0.1:{port}", num_schools)
+
+            report_workers(f"after {num_schools} schools", pids)
+
+
+def get_page_urls(url: str, num_schools: int) -> list:
+    """
+    Returns:
+        list: the data requests of the info and analysis pages of
+        num_schools K8 schools, as the page makes them
+    """
+    schools = [s for s in get_json(f"{url}/load") if s["School Type"] == "K8"]
+    year = get_json(f"{url}/config")["academic_year"]
+
+    urls = []
+
+    for school in schools[:num_schools]:
+        selections = {
+            "school_id": school["School ID"],
+            "year": year,
+            "school_type": "K8",
+            "school_subtype": "K8",
+            "comparison_schools": "",
+            "page_tab": "infoTab",
+            "k8_tab": "ilearnTab",
+            "hs_tab": "gradTab",
+            "type_tab": "k8Tab",
+            "analysis_tab": "singleTab",
+        }
+
+        where = f"{url}/where?{urlencode(selections)}"
+
+        urls += [
+            f"{url}/demographic?{urlencode(selections)}&format=columnar",
+            f"{url}/academic?{urlencode(selections)}&format=columnar",
+            f"{url}/years?{urlencode(selections)}",
+            where,
+        ]
+
+        selections["comparison_schools"] = ",".join(
+            str(s["School ID"]) for s in get_json(where)[1:]
+        )
+        selections["page_tab"] = "analysisTab"
+
+        urls.append(f"{url}/academic?{urlencode(selections)}&format=columnar")
+
+    return urls
+
+
+def run_load(urls: list, num_clients: int, seconds: float) -> dict:
+    """
+    Requests random urls from num_clients threads for [seconds] seconds.
+    Like the page (fetchWithRetry in modules/utils.js), a client that gets a
+    503 waits for Retry-After seconds and tries again.
+
+    Returns:
+        dict: the number of responses by status, and the latencies (ms,
+        including retries) of the data (/academic, /demographic) and other
+        requests
+    """
+    statuses = Counter()
+    latencies = {"data": [], "other": []}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client(seed: int) -> None:
+        rng = random.Random(seed)
+
+        while time.monotonic() < deadline:
+            page_url = rng.choice(urls)
+            start = time.perf_counter()
+
+            while True:
+                try:
+                    with urllib.request.urlopen(page_url, timeout=60) as r:  # noqa: S310
+                        r.read()
+                        status = r.status
+                except urllib.error.HTTPError as e:
+                    status = e.code
+                    retry_after = e.headers.get("Retry-After")
+
+                with lock:
+                    statuses[status] += 1
+
+                if status != 503:  # noqa: PLR2004
+                    break
+
+                time.sleep(float(retry_after or 1))
+
+            data = "/academic" in page_url or "/demographic" in page_url
+            kind = "data" if data else "other"
+
+            with lock:
+                latencies[kind].append((time.perf_counter() - start) * 1000)
+
+    threads = [
+        threading.Thread(target=client, args=(i,)) for i in range(num_clients)
+    ]
+
+    for t in threads:
+        t.start()
+
+    for t in threads:
+        t.join()
+
+    return {"statuses": statuses, "latencies": latencies}
+
+
+def percentiles(latencies: list) -> str:
+    """
+    Returns:
+        str: the median and 95th percentile of a list of latencies
+    """
+    if not latencies:
+        return "-"
+
+    latencies = sorted(latencies)
+
+    return (
+        f"p50 {latencies[len(latencies) // 2]:.0f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95)]:.0f} ms"
+    )
+
+
+def benchmark_load(num_schools: int, repeat: int) -> None:  # noqa: ARG001
+    """
+    Load test: the data requests of the info and analysis pages of
+    num_schools schools, from 1, 16 and 32 concurrent clients, against one
+    gunicorn worker - a sync worker (one request at a time) and a gthread
+    worker (concurrent requests, data work on the bounded pool). Reports
+    requests per second, latency, and rejected (503) requests.
+    """
+    seconds = 10
+
+    configurations = [
+        ("sync", 3103, ["--worker-class", "sync", "--threads", "1"]),
+        ("gthread", 3104, []),
+    ]
+
+    for name, port, args in configurations:
+        with gunicorn_server(port, 1, {"DASHBOARD_PRELOAD": "1"}, args):
+            url = f"http://127.0.0.1:{port}"
+            urls = get_page_urls(url, num_schools)
+
+            # fill the data caches, as a running server would have
+            run_load(urls, 4, 2)
+
+            for num_clients in [1, 16, 32]:
+                result = run_load(urls, num_clients, seconds)
+
+                latencies = result["latencies"]
+                completed = len(latencies["data"]) + len(latencies["other"])
+
+                print(  # noqa: T201
+                    f"load: {name} worker, {num_clients} clients: "
+                    f"{completed / seconds:.1f} requests/s, "
+                    f"{result['statuses'][503]} rejected (503) and retried\n"
+                    f"  /academic, /demographic: {percentiles(latencies['data'])}\n"
+                    f"  /years, /where: {percentiles(latencies['other'])}",
+                )
+
+
+def benchmark_school(num_schools: int, repeat: int) -> None:
+    """
+    Times the requests the page made for a school (/where, then /demographic,
+    /years, and /academic for the info and analysis pages) against the one
+    /school request, and checks that the parts of the /school response are
+    the same as the separate responses.
+    """
+    from app import app, canonical_query  # noqa: PLC0415
+
+    client = app.test_client()
+
+    selections = {
+        "year": str(current_year()),
+        "school_type": "K8",
+        "school_subtype": "K8",
+        "page_tab": "infoTab",
+        "k8_tab": "ilearnTab",
+        "hs_tab": "gradTab",
+        "type_tab": "k8Tab",
+        "analysis_tab": "singleTab",
+        "comparison_schools": [],
+        "format": "columnar",
+    }
+
+    def get(route: str, **params: object) -> object:
+        response = client.get(f"{route}?{canonical_query({**selections, **params})}")
+        assert response.status_code == 200, response.status_code  # noqa: PLR2004
+        return response.get_json()
+
+    def separate(school_id: int) -> dict:
+        where = get("/where", school_id=school_id)
+
+        return {
+            "comparison_schools": where,
+            "demographic": get("/demographic", school_id=school_id),
+            "years": get("/years", school_id=school_id),
+            "info": get("/academic", school_id=school_id),
+            "analysis": get(
+                "/academic",
+                school_id=school_id,
+                page_tab="analysisTab",
+                comparison_schools=[s["School ID"] for s in where[1:5]],
+            ),
+        }
+
+    def bundle(school_id: int) -> dict:
+        return get("/school", school_id=school_id)
+
+    school_ids = get_analysis_schools("K8", num_schools)
+
+    for school_id in school_ids:
+        assert separate(school_id) == bundle(school_id), school_id
+
+    def run(func: Callable) -> None:
+        for school_id in school_ids:
+            academic_data_cache.clear()
+            func(school_id)
+
+    reference = time_call(lambda: run(separate), repeat) / len(school_ids)
+    current = time_call(lambda: run(bundle), repeat) / len(school_ids)
+
+    report(f"school page data ({len(school_ids)} schools)", reference, current)
+
+
+def get_comparison_frame(num_comparisons: int) -> tuple:
+    """
+    Returns:
+        tuple: the raw K8 academic data of a school and num_comparisons
+        comparison schools (as clean_academic_data has it before the
+        checks), and the list of their IDs. If the database does not have
+        enough schools, copies of the comparison schools (with new IDs) are
+        added.
+    """
+    school_ids = get_analysis_schools("K8", num_comparisons + 1)
+    raw = get_academic_data(school_ids, "K8", "ilearnTab")
+
+    comparisons = raw[raw["School ID"] != school_ids[0]]
+    frames = [raw]
+    copy = 0
+
+    while len(comparisons.index) and len(school_ids) < num_comparisons + 1:
+        copy += 1
+        copied = comparisons.copy()
+        copied["School ID"] = copied["School ID"] + 100000 * copy
+        frames.append(copied)
+        school_ids += sorted(copied["School ID"].unique().tolist())
+
+    school_ids = school_ids[: num_comparisons + 1]
+    raw = pd.concat(frames, ignore_index=True)
+    raw = raw[raw["School ID"].isin(school_ids)]
+
+    raw = raw.sort_values(by="Year", ascending=False).reset_index(drop=True)
+    raw = raw.drop(list(raw.filter(regex="ELA and Math")), axis=1)
+
+    return raw, [str(i) for i in school_ids]
+
+
+def calculate_schools(data: pd.DataFrame, school_id: str) -> tuple:
+    """
+    check_total_tested, calculate_proficiency and
+    recalculate_total_proficiency, as clean_academic_data runs them for a
+    K8 analysis page.
+
+    Returns:
+        tuple: the processed rows and the revised comparison totals
+    """
+    measures = Measures.from_frame(data)
+
+    processed = check_total_tested(data, school_id, "K8", measures)
+    processed = calculate_proficiency(processed, measures)
+
+    comparison_rows = (processed["School ID"] != school_id).to_numpy()
+
+    revised = recalculate_total_proficiency(
+        processed.loc[comparison_rows].copy(),
+        processed.loc[~comparison_rows].copy(),
+        measures.take(comparison_rows),
+    )
+
+    return processed, revised
+
+
+def calculate_partitioned(
+    data: pd.DataFrame, school_ids: list, executor: Executor | None,
+) -> tuple:
+    """
+    calculate_schools() split per comparison school. Every partition holds
+    the selected school's rows as well, because check_total_tested and
+    recalculate_total_proficiency key on them. The partitions are run on
+    executor (or in a loop if None) and reassembled in the original row
+    order.
+    """
+    school_id = school_ids[0]
+    ids = data["School ID"].astype(str).to_numpy()
+    selected = ids == school_id
+
+    positions = [
+        np.flatnonzero(selected | (ids == comparison))
+        for comparison in school_ids[1:]
+    ]
+    parts = [data.iloc[rows].reset_index(drop=True) for rows in positions]
+
+    if executor is None:
+        results = [calculate_schools(part, school_id) for part in parts]
+    else:
+        results = list(executor.map(calculate_schools, parts, [school_id] * len(parts)))
+
+    # the selected school's rows from the first partition, the comparison
+    # rows from each
+    frames = [results[0][0].loc[selected[positions[0]]]]
+    rows = [positions[0][selected[positions[0]]]]
+
+    for part_rows, (processed, _) in zip(positions, results, strict=True):
+        frames.append(processed.loc[~selected[part_rows]])
+        rows.append(part_rows[~selected[part_rows]])
+
+    order = np.argsort(np.concatenate(rows), kind="stable")
+
+    processed = pd.concat(frames).iloc[order].reset_index(drop=True)
+
+    revised_rows = np.concatenate(
+        [part_rows[~selected[part_rows]] for part_rows in positions],
+    )
+
+    revised = pd.concat([r for _, r in results]).iloc[
+        np.argsort(revised_rows, kind="stable")
+    ].reset_index(drop=True)
+
+    return processed, revised
+
+
+def same_result(expected: tuple, result: tuple) -> bool:
+    """
+    Returns:
+        bool: whether a partitioned result has the same columns and values
+        as the serial result
+    """
+    try:
+        for e, r in zip(expected, result, strict=True):
+            pd.testing.assert_frame_equal(
+                e.reset_index(drop=True), r.reset_index(drop=True), check_dtype=False,
+            )
+    except AssertionError:
+        return False
+
+    return True
+
+
+def benchmark_partitions(num_schools: int, repeat: int) -> None:  # noqa: ARG001
+    """
+    Times check_total_tested, calculate_proficiency and
+    recalculate_total_proficiency for a school and 1, 5, 20, and 50
+    comparison schools: on the whole frame (serial, as clean_academic_data
+    runs them), and split per comparison school - in a loop, on a thread
+    pool, and on a process pool. Also reports whether the partitioned result
+    matches the serial one (the category checks look at the rows they are
+    given, so a partition can keep or drop categories the whole frame does
+    not).
+    """
+    workers = max(os.cpu_count() or 1, 2)
+
+    print(f"partitions: {os.cpu_count()} CPUs, {workers} pool workers")  # noqa: T201
+
+    with (
+        ThreadPoolExecutor(max_workers=workers) as threads,
+        ProcessPoolExecutor(max_workers=workers) as processes,
+    ):
+        for num_comparisons in [1, 5, 20, 50]:
+            data, school_ids = get_comparison_frame(num_comparisons)
+
+            if len(school_ids) < 2:  # noqa: PLR2004
+                continue
+
+            expected = calculate_schools(data, school_ids[0])
+
+            modes = {
+                "serial": lambda d=data, ids=school_ids: calculate_schools(d, ids[0]),
+            }
+
+            for name, executor in [
+                ("partitions", None), ("threads", threads), ("processes", processes),
+            ]:
+                modes[name] = lambda d=data, ids=school_ids, e=executor: (
+                    calculate_partitioned(d, ids, e)
+                )
+
+            times = {}
+
+            for name, func in modes.items():
+                same = same_result(expected, func())
+                times[name] = time_call(func, repeat)
+
+            print(  # noqa: T201
+                f"partitions: K8 {num_comparisons} comparison schools "
+                f"({len(data.index)} rows): "
+                + ", ".join(
+                    f"{name} {ms:.1f} ms ({times['serial'] / ms:.2f}x)"
+                    for name, ms in times.items()
+                )
+                + f", partitioned result {'matches' if same else 'differs'}",
+            )
+
+
+benchmarks = {
+    "check_total_tested": benchmark_check_total_tested,
+    "kernels": benchmark_kernels,
+    "projection": benchmark_projection,
+    "serialize": benchmark_serialize,
+    "startup": benchmark_startup,
+    "workers": benchmark_workers,
+    "load": benchmark_load,
+    "school": benchmark_school,
+    "partitions": benchmark_partitions,
+}
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Dashboard micro-benchmarks.")
+    parser.add_argument("benchmark", choices=[*benchmarks, "all"])
+    parser.add_argument("--schools", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+
+    args = parser.parse_args(argv)
+
+    names = list(benchmarks) if args.benchmark == "all" else [args.benchmark]
+
+    for name in names:
+        benchmarks[name](args.schools, args.repeat)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
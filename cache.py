@@ -0,0 +1,255 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# in-process data caches                #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+import numpy as np
+import pandas as pd
+
+
+class FrameCache:
+    """
+    A bounded, thread safe LRU cache of dataframes. The size of the cache is
+    measured in bytes rather than entries because academic frames are very
+    wide. When adding a frame pushes the cache over max_bytes, the least
+    recently used frames are evicted. The underlying data only changes when
+    the database file is replaced, so every entry is dropped when the
+    modification time of the database file changes.
+
+    Args:
+        db_path (str): path to the sqlite database file
+        max_bytes (int): maximum combined size of the cached frames
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self._mtime = self._get_mtime()
+
+    def _get_mtime(self) -> float | None:
+        try:
+            return os.path.getmtime(self.db_path)
+        except OSError:
+            return None
+
+    def validate(self) -> None:
+        """
+        Clears the cache if the database file has changed since the cached
+        frames were loaded.
+        """
+        mtime = self._get_mtime()
+
+        if mtime != self._mtime:
+            with self._lock:
+                self._clear()
+                self._mtime = mtime
+
+    def get(self, key: Hashable) -> pd.DataFrame | None:
+        """
+        Returns the cached frame for key (marking it as most recently used)
+        or None if there is no entry for key.
+        """
+        with self._lock:
+            entry = self._frames.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._frames.move_to_end(key)
+            self.hits += 1
+
+            return entry[0]
+
+    def put(self, key: Hashable, frame: pd.DataFrame) -> None:
+        """
+        Adds a frame to the cache, evicting the least recently used frames
+        until the cache fits within max_bytes. Frames larger than max_bytes
+        are not cached.
+        """
+        nbytes = int(frame.memory_usage(index=True, deep=True).sum())
+
+        if nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._frames:
+                self.size -= self._frames.pop(key)[1]
+
+            self._frames[key] = (frame, nbytes)
+            self.size += nbytes
+
+            while self.size > self.max_bytes:
+                _, (_, evicted_bytes) = self._frames.popitem(last=False)
+                self.size -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        self._frames.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: entries, bytes, hits, misses, and evictions
+        """
+        return {
+            "entries": len(self._frames),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def file_version(path: str) -> tuple | None:
+    """
+    Returns:
+        tuple|None: the modification time (ns) and size of a file, or None
+        if it does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ResidentTable:
+    """
+    An in-memory copy of a database table that is read once and then served
+    by index slicing rather than by sql. Object columns that do not hold any
+    strings (e.g., numbers mixed with nulls) are converted to numeric dtypes.
+    Columns holding strings are left alone, because "***", "", "KG", etc.
+    have meaning downstream. The row positions of every value of the key columns (e.g.,
+    School ID, Corporation ID, and Year) are computed once when the table is
+    loaded. The version of the database file the table was read from is
+    kept, so the table can be reloaded when the file changes.
+
+    Args:
+        frame (pd.DataFrame): the full table
+        keys (list): the columns used for lookups
+        version (tuple|None): file_version() of the database when read
+    """
+
+    def __init__(
+        self, frame: pd.DataFrame, keys: list, version: tuple | None = None,
+    ) -> None:
+        self.frame = self._coerce_numeric(frame).reset_index(drop=True)
+        self.keys = keys
+        self.version = version
+
+        self._positions = {
+            key: self.frame.groupby(key, sort=False).indices for key in keys
+        }
+
+    @staticmethod
+    def _coerce_numeric(frame: pd.DataFrame) -> pd.DataFrame:
+        data = frame.copy()
+
+        for col in data.columns[data.dtypes == object]:
+            if not data[col].map(lambda v: isinstance(v, str)).any():
+                data[col] = pd.to_numeric(data[col], errors="coerce")
+
+        return data
+
+    def select(
+        self, key: str, values: list, columns: list | None = None,
+    ) -> pd.DataFrame:
+        """
+        Gets the rows matching any of the values of a key column, in the
+        order of the values.
+
+        Args:
+            key (str): key column (must be one of self.keys)
+            values (list): key values to select
+            columns (list|None): columns to return (all columns if None)
+
+        Returns:
+            pd.DataFrame: the selected rows
+        """
+        positions = self._positions[key]
+
+        matches = [positions[v] for v in values if v in positions]
+
+        rows = np.concatenate(matches) if matches else np.empty(0, dtype=np.intp)
+
+        if columns is None:
+            cols = np.arange(len(self.frame.columns))
+        else:
+            cols = self.frame.columns.get_indexer(columns)
+
+        return self.frame.iloc[rows, cols].reset_index(drop=True)
+
+    def memory_usage(self) -> int:
+        """
+        Returns:
+            int: size of the table (including object values) in bytes
+        """
+        return int(self.frame.memory_usage(index=True, deep=True).sum())
+
+
+class VersionedCache:
+    """
+    An unbounded cache for objects derived from the database that are
+    expensive to build, but small (e.g., spatial indexes). Every entry is
+    dropped when the modification time of the database file changes.
+
+    Args:
+        db_path (str): path to the sqlite database file
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+
+        self._items = {}
+        self._lock = threading.Lock()
+        self._mtime = self._get_mtime()
+
+    def _get_mtime(self) -> float | None:
+        try:
+            return os.path.getmtime(self.db_path)
+        except OSError:
+            return None
+
+    def get_or_create(self, key: Hashable, factory: Callable) -> object:
+        """
+        Returns the cached object for key, calling factory() to build it if
+        it does not exist (or if the database has changed).
+        """
+        mtime = self._get_mtime()
+
+        with self._lock:
+            if mtime != self._mtime:
+                self._items.clear()
+                self._mtime = mtime
+
+            if key not in self._items:
+                self._items[key] = factory()
+
+            return self._items[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
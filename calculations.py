@@ -12,6 +12,7 @@ import numpy as np
 import numpy.typing as npt
 import pandas as pd
 import scipy.spatial as spatial
+from measures import Measure, Measures, as_measure, select_measures
 
 
 def conditional_fillna(data: pd.DataFrame) -> pd.DataFrame:
@@ -74,8 +75,7 @@ def calculate_ahs_average(df: pd.DataFrame) -> pd.DataFrame:
     ]
     sum_cols = [c for c in data.columns if c not in non_sum_cols]
 
-    for col in sum_cols:
-        data[col] = pd.to_numeric(data[col], errors="coerce")
+    data[sum_cols] = data[sum_cols].apply(pd.to_numeric, errors="coerce")
 
     # create a dict for agg()
     column_map = {col: "first" for col in non_sum_cols}
@@ -93,7 +93,10 @@ def calculate_ahs_average(df: pd.DataFrame) -> pd.DataFrame:
 
 
 
-def calculate_percentage(numerator: str, denominator: str) -> npt.NDArray:
+def calculate_percentage(
+    numerator: pd.Series | pd.DataFrame | Measure,
+    denominator: pd.Series | pd.DataFrame | Measure,
+) -> npt.NDArray:
     """
     Calculates a percentage given a numerator and a denominator, while accounting for
     two special cases: a string representing insufficent n-size ("***") and certain
@@ -107,115 +110,182 @@ def calculate_percentage(numerator: str, denominator: str) -> npt.NDArray:
         returns "0"
       4) if none of the above are true, the function divides the numerator by the
         denominator.
+    The inputs are coerced once and the special cases are applied as masks, so
+    the numerator and denominator can also be 2-D blocks (rows x categories) of
+    the same shape, in which case every category is calculated at once.
+
     Args:
-        numerator (str): numerator (is a str to account for special cases)
-        denominator (str): denominator (is a str to account for special cases)
+        numerator (pd.Series|pd.DataFrame|Measure): numerator (raw values to
+            account for special cases)
+        denominator (pd.Series|pd.DataFrame|Measure): denominator (raw values to
+            account for special cases)
 
     Returns:
         float|None|str: see conditions
     """
-    return np.where(
-        (numerator == "***") | (denominator == "***"),
-        "***",
-        np.where(  # type: ignore
-            pd.to_numeric(numerator, errors="coerce").isna()
-            & pd.to_numeric(denominator, errors="coerce").isna(),
-            None,
-            np.where(
-                pd.to_numeric(numerator, errors="coerce").isna(),
-                0,
-                pd.to_numeric(numerator, errors="coerce")
-                / pd.to_numeric(denominator, errors="coerce"),
-            ),
-        ),
-    )
+    numerator = as_measure(numerator)
+    denominator = as_measure(denominator)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.where(
+            np.isnan(numerator.values), 0, numerator.values / denominator.values,
+        ).astype(object)
+
+    result[np.isnan(numerator.values) & np.isnan(denominator.values)] = None
+    result[numerator.suppressed | denominator.suppressed] = "***"
+
+    return result
 
 
-def calculate_difference(value1: str, value2: str) -> npt.NDArray:
+def _as_difference(
+    value1: Measure, value2: Measure,
+) -> npt.NDArray:
+    # the difference as an object array. pd.to_numeric keeps integer columns
+    # as integers, so the difference of two integer columns is an integer
+    difference = value1.values - value2.values
+
+    result = difference.astype(object)
+    integer = np.logical_and(value1.integer, value2.integer)
+
+    if difference.ndim == 1:
+        if integer:
+            result = difference.astype(np.int64).astype(object)
+    elif integer.any():
+        result[:, integer] = difference[:, integer].astype(np.int64).astype(object)
+
+    return result
+
+
+def calculate_difference(
+    value1: pd.Series | pd.DataFrame | Measure,
+    value2: pd.Series | pd.DataFrame | Measure,
+) -> npt.NDArray:
     """
     Calculate the difference between two dataframes with specific mixed datatypes
-    and conditions.
+    and conditions (1-D or 2-D, see calculate_percentage).
 
     Args:
-        value1 (str): first value (is a str to account for special cases)
-        value2 (str): second value (is a str to account for special cases)
+        value1 (pd.Series|pd.DataFrame|Measure): first value (raw values to account
+            for special cases)
+        value2 (pd.Series|pd.DataFrame|Measure): second value (raw values to account
+            for special cases)
 
     Returns:
         float|None|str: see conditions
     """
+    value1 = as_measure(value1)
+    value2 = as_measure(value2)
 
-    return np.where(
-        (value1 == "***") | (value2 == "***"),
-        "***",
-        np.where(  # type: ignore
-            pd.to_numeric(value1, errors="coerce").isna(),
-            None,
-            pd.to_numeric(value1, errors="coerce")
-            - pd.to_numeric(value2, errors="coerce"),
-        ),
+    result = _as_difference(value1, value2)
+
+    result[np.isnan(value1.values)] = None
+    result[value1.suppressed | value2.suppressed] = "***"
+
+    return result
+
+
+def add_columns(data: pd.DataFrame, columns: list, values: npt.NDArray) -> pd.DataFrame:
+    """
+    Adds a block of calculated columns to a dataframe with a single concat,
+    rather than inserting them one at a time (which fragments the frame).
+    Columns that already exist are replaced in place.
+
+    Args:
+        data (pd.DataFrame): a dataframe
+        columns (list): the names of the new columns
+        values (np.ndarray): a (rows x columns) array of values
+
+    Returns:
+        pd.DataFrame: the dataframe with the columns added
+    """
+    block = pd.DataFrame(values, columns=columns, index=data.index)
+
+    existing = [c for c in columns if c in data.columns]
+
+    if existing:
+        data = data.copy()
+        data[existing] = block[existing]
+
+    return pd.concat(
+        [data, block[[c for c in columns if c not in data.columns]]], axis=1,
     )
 
 
-def calculate_graduation_rate(data: pd.DataFrame) -> pd.DataFrame:
+def calculate_graduation_rate(
+    data: pd.DataFrame, measures: Measures | None = None,
+) -> pd.DataFrame:
     """
     Wrapper around calculate_percentage() used to calculate graduation rate from a
-    dataframe (Graduates / Cohort Count)
+    dataframe (Graduates / Cohort Count). All categories are calculated at once.
 
     Args:
         data (pd.DataFrame): dataframe of graduation data
+        measures (Measures|None): the coerced measure columns of data
 
     Returns:
         pd.DataFrame: the same dataframe with "Graduation Rate" column added.
     """
-    cohorts = data[
-        data.columns[data.columns.str.contains(r"Cohort Count")]
-    ].columns.tolist()
+    cohorts = data.columns[data.columns.str.contains(r"Cohort Count")].tolist()
 
-    for cohort in cohorts:
-        if cohort in data.columns:
-            cat_sub = cohort.split("|Cohort Count")[0]
-            data[cat_sub + "|Graduation Rate"] = calculate_percentage(
-                data[cat_sub + "|Graduates"], data[cohort],
-            )
+    if not cohorts:
+        return data
 
-    return data
+    cat_subs = [cohort.split("|Cohort Count")[0] for cohort in cohorts]
+
+    graduation_rates = calculate_percentage(
+        select_measures(data, measures, [c + "|Graduates" for c in cat_subs]),
+        select_measures(data, measures, cohorts),
+    )
+
+    return add_columns(
+        data, [c + "|Graduation Rate" for c in cat_subs], graduation_rates,
+    )
 
 
-def calculate_sat_rate(data: pd.DataFrame) -> pd.DataFrame:
+def calculate_sat_rate(
+    data: pd.DataFrame, measures: Measures | None = None,
+) -> pd.DataFrame:
     """
     Wrapper around calculate_percentage() used to calculate SAT At Benchmark %
-    dataframe (At Benchmark / Total Tested)
+    dataframe (At Benchmark / Total Tested). All categories are calculated at once.
 
     Args:
         data (pd.DataFrame): dataframe of SAT data
+        measures (Measures|None): the coerced measure columns of data
 
     Returns:
         pd.DataFrame: the same dataframe with "Benchmark %" column added.
     """
-    tested = data[
-        data.columns[data.columns.str.contains(r"Total Tested")]
-    ].columns.tolist()
+    tested = data.columns[data.columns.str.contains(r"Total Tested")].tolist()
 
-    for test in tested:
-        if test in data.columns:
-            # get Category + Subject string
-            cat_sub = test.split(" Total Tested")[0]
-            data[cat_sub + " Benchmark %"] = calculate_percentage(
-                data[cat_sub + " At Benchmark"], data[test],
-            )
+    if not tested:
+        return data
 
-    return data
+    # get Category + Subject strings
+    cat_subs = [test.split(" Total Tested")[0] for test in tested]
+
+    benchmark_rates = calculate_percentage(
+        select_measures(data, measures, [c + " At Benchmark" for c in cat_subs]),
+        select_measures(data, measures, tested),
+    )
+
+    return add_columns(data, [c + " Benchmark %" for c in cat_subs], benchmark_rates)
 
 
-def calculate_proficiency(df: pd.DataFrame) -> pd.DataFrame:
+def calculate_proficiency(
+    df: pd.DataFrame, measures: Measures | None = None,
+) -> pd.DataFrame:
     """
     Wrapper around calculate_percentage() used to calculate ILEARN Proficiency
     from academic dataframe (Total Proficient / Total Tested) and IREAD Proficiency
     from (IREAD Pass N / IREAD Test N ). If Tested == 0 or NaN or if Tested > 0,
-    but Proficient is NaN, all associated columns are dropped.
+    but Proficient is NaN, all associated columns are dropped. The tested and
+    proficient columns of every category are resolved up front, so the checks
+    and the percentages are each a single 2-D operation.
 
     Args:
         data (pd.DataFrame): dataframe of ILEARN data
+        measures (Measures|None): the coerced measure columns of data
 
     Returns:
         pd.DataFrame: the same dataframe with "Proficient %" column added.
@@ -223,45 +293,63 @@ def calculate_proficiency(df: pd.DataFrame) -> pd.DataFrame:
     data = df.copy()
 
     # Get a list of all "Total Tested" columns except those for ELA & Math
-    tested_categories = data[
-        data.columns[data.columns.str.contains(r"Total Tested|IREAD Test N")]
-    ].columns.tolist()
+    tested_categories = [
+        i
+        for i in data.columns[data.columns.str.contains(r"Total Tested|IREAD Test N")]
+        if "ELA and Math" not in i
+    ]
 
-    tested_categories = [i for i in tested_categories if "ELA and Math" not in i]
+    if not tested_categories:
+        return data
+
+    total_proficient = []
+    proficiency = []
 
     for tested in tested_categories:
-        if tested in data.columns:
-            if "Total Tested" in tested:
-                cat_sub = tested.split(" Total Tested")[0]
-                total_proficient = cat_sub + " Total Proficient"
-                proficiency = cat_sub + " Proficient %"
-            elif "IREAD Test" in tested:
-                cat_sub = tested.split("|IREAD Test N")[0]
-                total_proficient = cat_sub + "|IREAD Pass N"
-                proficiency = cat_sub + "|IREAD Proficient %"
-
-            # drop the entire category if ("Tested" == 0 or NaN) or if
-            # ("Tested" > 0 and "Total Proficient" is NaN. A "Total Proficient"
-            # value of NaN means it was a "***" before being converted to numeric
-            # we use sum/all because there could be one or many columns
-            if (
-                pd.to_numeric(data[tested], errors="coerce").sum() == 0
-                or pd.isna(data[tested]).all()
-            ) | (
-                pd.to_numeric(data[tested], errors="coerce").sum() > 0
-                and pd.isna(data[total_proficient]).all()
-            ):
-                data = data.drop([tested, total_proficient], axis=1)
-            else:
-                data[proficiency] = calculate_percentage(
-                    data[total_proficient], data[tested],
-                )
+        if "Total Tested" in tested:
+            cat_sub = tested.split(" Total Tested")[0]
+            total_proficient.append(cat_sub + " Total Proficient")
+            proficiency.append(cat_sub + " Proficient %")
+        else:
+            cat_sub = tested.split("|IREAD Test N")[0]
+            total_proficient.append(cat_sub + "|IREAD Pass N")
+            proficiency.append(cat_sub + "|IREAD Proficient %")
 
-    return data
+    tested_values = select_measures(data, measures, tested_categories)
+    proficient_values = select_measures(data, measures, total_proficient)
+
+    # drop the entire category if ("Tested" == 0 or NaN) or if
+    # ("Tested" > 0 and "Total Proficient" is null). we use sum/all
+    # because there could be one or many rows (a sum of all NaN is 0)
+    tested_sum = np.nansum(tested_values.values, axis=0)
+
+    drop = (tested_sum == 0) | ((tested_sum > 0) & proficient_values.null.all(axis=0))
+
+    keep = ~drop
+
+    data = data.drop(
+        [
+            col
+            for tested, proficient, dropped in zip(
+                tested_categories, total_proficient, drop, strict=True,
+            )
+            if dropped
+            for col in (tested, proficient)
+        ],
+        axis=1,
+    )
+
+    proficiency_values = calculate_percentage(
+        proficient_values.take_columns(keep), tested_values.take_columns(keep),
+    )
+
+    return add_columns(
+        data, [p for p, k in zip(proficiency, keep, strict=True) if k], proficiency_values,
+    )
 
 
 def recalculate_total_proficiency(
-    data: pd.DataFrame, school_data: pd.DataFrame,
+    data: pd.DataFrame, school_data: pd.DataFrame, measures: Measures | None = None,
 ) -> pd.DataFrame:
     """
     In order for an apples to apples comparison between aggregated school corporation
@@ -273,6 +361,7 @@ def recalculate_total_proficiency(
         corp_data (pd.DataFrame):   academic data for the school corporation in which
                                     the school is located and/or comparable schools
         school_data (pd.DataFrame): school academic data
+        measures (Measures|None): the coerced measure columns of corp_data
 
     Returns:
         pd.DataFrame: the dataframe after Total Proficiency is recalculated
@@ -290,15 +379,6 @@ def recalculate_total_proficiency(
         ["Year", "School ID", "School Name"]
     ]  # remove
 
-    numeric_columns = [
-        c
-        for c in revised_data.columns
-        if c not in ["School Name", "School ID", "Low Grade", "High Grade"]
-    ]
-
-    for col in numeric_columns:
-        revised_data[col] = pd.to_numeric(revised_data[col], errors="coerce")
-
     # get a list of the school grades offered by the school
     all_cols = school_data.columns.to_list()
     school_grades = [g.split("|")[0] for g in all_cols if g.startswith("Grade")]
@@ -309,29 +389,35 @@ def recalculate_total_proficiency(
     ela_prof = [e + "|ELA Total Proficient" for e in school_grades]
     ela_test = [e + "|ELA Total Tested" for e in school_grades]
 
-    # filter school corp data by available grades, and recalculate Total
-    # Proficiency for both Math and ELA
-    adj_corp_ela_prof = revised_data[revised_data.columns.intersection(ela_prof)]
-    adj_corp_ela_test = revised_data[revised_data.columns.intersection(ela_test)]
-
-    ela_proficiency_sum = adj_corp_ela_prof.sum(axis=1)
-    ela_test_sum = adj_corp_ela_test.sum(axis=1)
+    grade_columns = {*math_prof, *math_test, *ela_prof, *ela_test}
 
-    revised_totals["Total|ELA Proficient %"] = ela_proficiency_sum / ela_test_sum
+    if measures is None:
+        measures = Measures.from_frame(
+            revised_data, [c for c in revised_data.columns if c in grade_columns],
+        )
 
-    adj_corp_math_prof = revised_data[revised_data.columns.intersection(math_prof)]
-    adj_corp_math_test = revised_data[revised_data.columns.intersection(math_test)]
+    # filter school corp data by available grades, and recalculate Total
+    # Proficiency for both Math and ELA (a sum of all NaN is 0)
+    def sum_grades(columns: list) -> npt.NDArray:
+        return np.nansum(
+            measures.block(list(revised_data.columns.intersection(columns))), axis=0,
+        )
 
-    math_proficiency_sum = adj_corp_math_prof.sum(axis=1)
-    math_test_sum = adj_corp_math_test.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        revised_totals["Total|ELA Proficient %"] = (
+            sum_grades(ela_prof) / sum_grades(ela_test)
+        )
 
-    revised_totals["Total|Math Proficient %"] = math_proficiency_sum / math_test_sum
+        revised_totals["Total|Math Proficient %"] = (
+            sum_grades(math_prof) / sum_grades(math_test)
+        )
 
     return revised_totals
 
 
 def calculate_year_over_year(
-    current_year: pd.Series, previous_year: pd.Series,
+    current_year: pd.Series | pd.DataFrame | Measure,
+    previous_year: pd.Series | pd.DataFrame | Measure,
 ) -> npt.NDArray:
     """
     Calculates year_over_year differences, accounting for string representation
@@ -350,34 +436,32 @@ def calculate_year_over_year(
         if first value = 0 and second value is *** -> -***
         if first value = 0 and second value is NaN -> -***
 
+    The values are coerced before they are compared, so a 0 stored as a string
+    ("0") is flagged like a numeric 0 (the per-column version compared the raw
+    values, so "0" was not). 1-D or 2-D, see calculate_percentage.
+
     Args:
-        current_year (pd.Series): a series of current year values for all categories
-        previous_year (pd.Series): a series of previous year values for all categories
+        current_year (pd.Series|pd.DataFrame|Measure): a series of current year
+            values for all categories
+        previous_year (pd.Series|pd.DataFrame|Measure): a series of previous year
+            values for all categories
 
     Returns:
         np.ndarray: Either the difference between the current and previous year
         values, None, or a string ("***").
     """
-    return np.where(
-        (current_year == 0) & ((previous_year.isna()) | (previous_year == "***")),
-        "-***",
-        np.where(
-            (current_year == "***") | (previous_year == "***"),
-            "***",
-            np.where(  # type: ignore
-                (pd.to_numeric(current_year, errors="coerce").isna())
-                & (pd.to_numeric(previous_year, errors="coerce").isna()),
-                None,
-                np.where(  # type: ignore
-                    (~pd.to_numeric(current_year, errors="coerce").isna())
-                    & (pd.to_numeric(previous_year, errors="coerce").isna()),
-                    None,
-                    pd.to_numeric(current_year, errors="coerce")
-                    - pd.to_numeric(previous_year, errors="coerce"),
-                ),
-            ),
-        ),
-    )
+    current_year = as_measure(current_year)
+    previous_year = as_measure(previous_year)
+
+    result = _as_difference(current_year, previous_year)
+
+    result[np.isnan(previous_year.values)] = None
+    result[current_year.suppressed | previous_year.suppressed] = "***"
+    result[
+        (current_year.values == 0) & (previous_year.null | previous_year.suppressed)
+    ] = "-***"
+
+    return result
 
 
 def set_academic_rating(data: str | float | None, threshold: list, flag: int) -> str:
@@ -667,7 +751,7 @@ def check_for_insufficient_n_size(data: pd.DataFrame) -> str:
 
 
 def find_nearest(
-    school_idx: pd.Index, values: pd.DataFrame,
+    school_idx: pd.Index, values: pd.DataFrame, num_hits: int = 41,
 ) -> tuple[np.ndarray, np.ndarray]:
     """
     Based on https://stackoverflow.com/q/43020919/190597
@@ -691,6 +775,8 @@ def find_nearest(
     Args:
         school_idx (pd.Index): the dataFrame index of the selected school
         data (pd.DataFrame): a dataframe of schools and their lat/lon coordinates
+        num_hits (int): the number of schools to return (including the selected
+            school)
 
     Returns:
         index (np.ndarray) & distance (np.ndarray): an array of dataframe indexes
@@ -698,11 +784,6 @@ def find_nearest(
     """
     data = values.copy()
 
-    # number of schools to return (add 1 to account for the fact that the selected
-    # school is included in the return set) - number needs to be high enough to
-    # ensure there are enough left once non-comparable grades are filtered out.
-    num_hits = 41
-
     # the radius of earth in miles. For kilometers use 6372.8 km
     R = 3959.87433
 
@@ -960,7 +1041,9 @@ def calculate_comparison_school_list(
 
     # kdtree spatial tree function returns two np arrays: an array of
     # indexes and an array of distances
-    index_array, dist_array = find_nearest(school_idx, schools)
+    # the schools have already been filtered, so only [grade_max] hits are
+    # needed (the selected school is included in both)
+    index_array, dist_array = find_nearest(school_idx, schools, grade_max)
 
     index_list = index_array[0].tolist()
     distance_list = dist_array[0].tolist()
@@ -994,3 +1077,287 @@ def calculate_comparison_school_list(
     return comparison_set[["School ID", "School Name"]].to_dict(
         "records",
     )
+
+
+class ComparisonIndex:
+    """
+    A nearest neighbor index of every school for one year and school type that
+    is built once and then reused for every comparison school list. Holds the
+    cartesian coordinates of the schools in a scipy.spatial cKDTree, along with
+    arrays of grade spans and student counts, so that finding the comparison
+    schools for a school is a single tree query followed by vectorized
+    grade overlap and student count filters.
+
+    The filters are the same as those used by calculate_comparison_school_list:
+      1) a comparison school must have at least [min_students] students (the
+        selected school is always kept).
+      2) a comparison school must overlap the grade span of the selected school
+        by at least [overlap] + 1 grades (see calculate_comparison_school_list
+        for examples).
+
+    Args:
+        schools (pd.DataFrame): Lat, Lon, School ID, School Name, Low Grade,
+            High Grade, and Total Student Count of every school for a year
+    """
+
+    # the radius of earth in miles. For kilometers use 6372.8 km
+    R = 3959.87433
+
+    min_students = 30
+
+    # "overlap" should be one less than the the number of grades that we want as a
+    # minimum (a value of "1" means a 2 grade overlap, "2" means 3 grade overlap, etc.).
+    overlap = 1
+
+    # the filters are applied after the tree query, so rather than overfetch
+    # a fixed number of neighbors, the first query asks the tree for the
+    # number of schools requested and k is doubled until enough schools pass
+    # the filters, every school within [max_distance] miles (a search
+    # argument, no limit by default) has been scanned, or the whole tree has
+    # been scanned.
+
+    def __init__(self, schools: pd.DataFrame) -> None:
+        data = schools.reset_index(drop=True)
+
+        self.school_ids = pd.to_numeric(data["School ID"], errors="coerce").to_numpy()
+        self.school_names = data["School Name"].to_numpy(dtype=object)
+
+        # the grades are coerced below, so the replaced columns are left as
+        # objects rather than downcast
+        with pd.option_context("future.no_silent_downcasting", True):
+            grades = data[["Low Grade", "High Grade"]].replace({"PK": 0, "KG": 1})
+
+        self.low_grades = pd.to_numeric(
+            grades["Low Grade"], errors="coerce",
+        ).to_numpy(dtype=float)
+        self.high_grades = pd.to_numeric(
+            grades["High Grade"], errors="coerce",
+        ).to_numpy(dtype=float)
+
+        # blank student counts are coerced to NaN
+        self.student_counts = pd.to_numeric(
+            data["Total Student Count"], errors="coerce",
+        ).to_numpy(dtype=float)
+
+        lat = pd.to_numeric(data["Lat"], errors="coerce").to_numpy(dtype=float)
+        lon = pd.to_numeric(data["Lon"], errors="coerce").to_numpy(dtype=float)
+
+        # schools missing Lat/Lon data are not added to the tree
+        self.tree_rows = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+
+        self.tree_positions = np.full(len(data), -1)
+        self.tree_positions[self.tree_rows] = np.arange(len(self.tree_rows))
+
+        phi = np.deg2rad(lat[self.tree_rows])
+        theta = np.deg2rad(lon[self.tree_rows])
+
+        self.points = np.column_stack(
+            [
+                self.R * np.cos(phi) * np.cos(theta),
+                self.R * np.cos(phi) * np.sin(theta),
+                self.R * np.sin(phi),
+            ],
+        )
+
+        self.tree = spatial.cKDTree(self.points)
+
+        # row of each School ID (the first row if a school is listed twice)
+        self.rows = {}
+
+        for row, school_id in enumerate(self.school_ids):
+            if not np.isnan(school_id):
+                self.rows.setdefault(int(school_id), row)
+
+    def get_grade_span(self, row: int, type_tab: str) -> tuple[float, float]:
+        """
+        Gets the grade span of a school, limited to the grades of the selected
+        type tab (K8 or HS) for K12 schools.
+        """
+        school_low = self.low_grades[row]
+        school_high = self.high_grades[row]
+
+        if type_tab == "k8Tab":
+            school_high = 8 if school_high > 8 else school_high
+
+        elif type_tab == "hsTab":
+            school_low = 9 if school_low < 9 else school_low
+            school_high = school_high if school_high < 12 else 12
+
+        return school_low, school_high
+
+    def is_comparable(
+        self, row: int, candidates: np.ndarray, type_tab: str,
+    ) -> np.ndarray:
+        """
+        Vectorized grade overlap and student count filters.
+
+        Args:
+            row (int): row of the selected school
+            candidates (np.ndarray): rows of the possible comparison schools
+            type_tab (str): the selected type tab (k8Tab or hsTab)
+
+        Returns:
+            np.ndarray: boolean mask of the candidates that are comparable
+        """
+        school_low, school_high = self.get_grade_span(row, type_tab)
+
+        low = self.low_grades[candidates]
+        high = self.high_grades[candidates]
+
+        grade_overlap = (
+            (low <= school_low) & (high - school_low >= self.overlap)
+        ) | ((low >= school_low) & (school_high - low >= self.overlap))
+
+        enough_students = (self.student_counts[candidates] >= self.min_students) | (
+            self.school_ids[candidates] == self.school_ids[row]
+        )
+
+        return grade_overlap & enough_students
+
+    def _search(
+        self,
+        row: int,
+        type_tab: str,
+        max_schools: int,
+        max_distance: float,
+        hits: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, int]:
+        # adaptive k search. hits are the results of a first (batched) query
+        # if one was already made. returns the rows of the comparable schools
+        # and the number of candidates scanned
+        num_schools = len(self.tree_rows)
+        point = self.points[self.tree_positions[row]]
+
+        k = min(max_schools, num_schools) if hits is None else len(hits)
+
+        while True:
+            if hits is None:
+                _, hits = self.tree.query(
+                    point, k=k, distance_upper_bound=max_distance,
+                )
+                hits = np.atleast_1d(hits)
+
+            # missing neighbors (beyond max_distance) are returned as num_schools
+            candidates = self.tree_rows[hits[hits < num_schools]]
+            comparable = candidates[self.is_comparable(row, candidates, type_tab)]
+
+            if (
+                len(comparable) >= max_schools
+                or k >= num_schools
+                or len(candidates) < k
+            ):
+                return comparable[:max_schools], len(candidates)
+
+            k = min(k * 2, num_schools)
+            hits = None
+
+    def _to_records(self, rows: np.ndarray) -> list:
+        return [
+            {"School ID": int(self.school_ids[r]), "School Name": self.school_names[r]}
+            for r in rows
+        ]
+
+    def _get_row(self, school_id: int | str, type_tab: str) -> int | None:
+        row = self.rows.get(int(school_id))
+
+        # the school must be in the tree and be comparable to itself
+        if (
+            row is None
+            or self.tree_positions[row] < 0
+            or not self.is_comparable(row, np.array([row]), type_tab)[0]
+        ):
+            return None
+
+        return row
+
+    def search(
+        self,
+        school_id: int | str,
+        type_tab: str,
+        max_schools: int = 20,
+        max_distance: float = np.inf,
+    ) -> tuple[list, int]:
+        """
+        Gets the [max_schools] closest comparable schools to the selected
+        school, ordered by distance (the first school is the selected school).
+
+        Args:
+            school_id (int|str): the selected school
+            type_tab (str): the selected type tab (k8Tab or hsTab)
+            max_schools (int): the maximum number of schools to return
+            max_distance (float): only schools within this many miles of the
+                selected school are returned
+
+        Returns:
+            list: a list of {"School ID", "School Name"} dicts
+            int: the number of candidate schools scanned
+        """
+        row = self._get_row(school_id, type_tab)
+
+        if row is None:
+            return [], 0
+
+        selected, scanned = self._search(row, type_tab, max_schools, max_distance)
+
+        return self._to_records(selected), scanned
+
+    def nearest(
+        self,
+        school_id: int | str,
+        type_tab: str,
+        max_schools: int = 20,
+        max_distance: float = np.inf,
+    ) -> list:
+        """
+        Same as search(), without the number of candidates scanned.
+        """
+        return self.search(school_id, type_tab, max_schools, max_distance)[0]
+
+    def nearest_many(
+        self,
+        school_ids: list,
+        type_tab: str,
+        max_schools: int = 20,
+        max_distance: float = np.inf,
+    ) -> dict:
+        """
+        Batch version of nearest() - the first tree query is made for all of
+        the schools at once.
+
+        Args:
+            school_ids (list): the selected schools
+            type_tab (str): the selected type tab (k8Tab or hsTab)
+            max_schools (int): the maximum number of schools to return
+            max_distance (float): see search()
+
+        Returns:
+            dict: School ID -> list of {"School ID", "School Name"} dicts
+        """
+        comparison_lists = {int(school_id): [] for school_id in school_ids}
+
+        rows = {
+            school_id: self._get_row(school_id, type_tab)
+            for school_id in comparison_lists
+        }
+        rows = {school_id: row for school_id, row in rows.items() if row is not None}
+
+        if not rows:
+            return comparison_lists
+
+        k = min(max_schools, len(self.tree_rows))
+
+        _, hits = self.tree.query(
+            self.points[self.tree_positions[list(rows.values())]],
+            k=k,
+            distance_upper_bound=max_distance,
+        )
+
+        hits = np.asarray(hits).reshape(len(rows), -1)
+
+        for (school_id, row), school_hits in zip(rows.items(), hits, strict=True):
+            selected, _ = self._search(
+                row, type_tab, max_schools, max_distance, school_hits,
+            )
+            comparison_lists[school_id] = self._to_records(selected)
+
+        return comparison_lists
@@ -0,0 +1,76 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# gunicorn configuration                #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+# Run from the project root (the database path is relative):
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# The app is imported and warmed up once, in the gunicorn master, before the
+# workers are forked (preload_app). The resident tables, the encoded /load
+# response and the comparison indexes (KDTrees) of every year are then
+# shared by all of the workers copy-on-write, instead of being built again
+# by each worker. After the warm-up, gc.freeze() moves every object into
+# the permanent generation, so the garbage collector of a worker does not
+# write to (and copy) the shared pages when it runs.
+#
+# DASHBOARD_PRELOAD=0 turns this off: each worker imports and warms up the
+# app itself (see "python benchmark.py workers" for the memory use of both).
+
+import gc
+import os
+
+wsgi_app = "app:app"
+
+bind = os.environ.get("DASHBOARD_BIND", "0.0.0.0:3000")
+workers = int(os.environ.get("DASHBOARD_WORKERS", "4"))
+
+# each worker serves concurrent requests on [threads] threads, and runs the
+# sqlite/pandas work of the data endpoints on a smaller, bounded pool (see
+# work_pool.py and DASHBOARD_WORK_THREADS / DASHBOARD_MAX_PENDING in app.py)
+worker_class = os.environ.get("DASHBOARD_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("DASHBOARD_THREADS", "24"))
+
+preload_app = os.environ.get("DASHBOARD_PRELOAD", "1") == "1"
+
+# read the tables into memory (see load_data.py) - they are shared by the
+# workers when the app is preloaded. When the database file changes, each
+# worker reloads its own copy (restart the server to share them again)
+os.environ.setdefault("DASHBOARD_RESIDENT_DATA", "1")
+
+
+def when_ready(server) -> None:  # noqa: ANN001, ARG001
+    """
+    Runs in the master, after the app is loaded and before the workers are
+    forked.
+    """
+    if not preload_app:
+        return
+
+    import load_data
+    from app import warm_up
+
+    warm_up(all_years=True)
+
+    # sqlite connections must not be shared with the forked workers - each
+    # worker opens its own
+    load_data.get_engine().dispose()
+
+    gc.collect()
+    gc.freeze()
+
+
+def post_worker_init(worker) -> None:  # noqa: ANN001, ARG001
+    """
+    Runs in each worker after it has loaded the app.
+    """
+    if preload_app:
+        return
+
+    from app import warm_up
+
+    warm_up(all_years=True)
@@ -19,25 +19,279 @@
 # Financial - either 2023 (Audited) or 2024(Q4)
 # Graduation Rate - 2023
 
+import os
 import re
+import threading
+import time
+from collections.abc import Callable
 
 import numpy as np
 import pandas as pd
+from cache import FrameCache, ResidentTable, VersionedCache, file_version
 from calculations import (
+    ComparisonIndex,
     calculate_percentage,  # TODO: Move this as well
 )
-from sqlalchemy import create_engine, text
+from measures import Measures
+from sqlalchemy import Connection, Engine, TextClause, create_engine, event, text
+from sqlalchemy.pool import QueuePool
 
-engine = create_engine("sqlite:///data/indiana_schools_public.db")
+db_path = "data/indiana_schools_public.db"
 
-print("Database Engine Created . . .")  # noqa: T201
+# memory map up to 256MB of the database file and keep a 64MB page cache
+# (negative cache_size is in KiB) per connection
+sqlite_pragmas = {
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "query_only": 1,
+}
+
+
+def create_read_engine(path: str) -> Engine:
+    """
+    The dashboard only reads from the database, so it is opened read only
+    (mode=ro) and every connection is set to query_only. Connections are
+    pooled (check_same_thread=False lets a pooled connection move between
+    worker threads), so a request reuses an open connection and its page
+    cache instead of opening the file for every query. The database is not
+    opened as immutable, because the build steps in prepare_database.py
+    update it in place.
+
+    Args:
+        path (str): path to the sqlite database file
+
+    Returns:
+        Engine: a pooled, read only engine
+    """
+    if not os.path.exists(path):
+        msg = f"database file not found: {path}"
+        raise FileNotFoundError(msg)
+
+    read_engine = create_engine(
+        f"sqlite:///file:{path}?mode=ro&uri=true",
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=int(os.environ.get("DASHBOARD_DB_POOL_SIZE", "8")),
+        max_overflow=8,
+    )
+
+    @event.listens_for(read_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:  # noqa: ANN001, ARG001
+        cursor = dbapi_connection.cursor()
+
+        for pragma, value in sqlite_pragmas.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+        cursor.close()
+
+    return read_engine
+
+
+# raw academic data for individual schools, keyed by (table, tab, School ID)
+academic_data_cache = FrameCache(db_path)
+
+# comparison school indexes, keyed by (Year, K8|HS)
+comparison_indexes = VersionedCache(db_path)
+
+# names of the tables in the database (build steps may add tables), and
+# whether the tables written by build steps are current
+database_tables = VersionedCache(db_path)
+
+# academic table columns needed by each category tab, keyed by (table, tab)
+tab_columns = VersionedCache(db_path)
+
+
+# sqlite column headers do not have spaces between words. But we need to
+# display the column names, so we have to do a bunch of str.replace to
+# account for all conditions. Adding a space between any lowercase character
+# and any uppercase/number character takes care of most of it. The other
+# replace functions catch edge cases. The patterns are applied in order.
+column_name_patterns = [
+    (re.compile(r"([a-z])([A-Z1-9%])"), r"\1 \2"),
+    (re.compile(r"([WADTO])([CATPB&])"), r"\1 \2"),
+    ("EBRWand", "EBRW and"),
+    (re.compile(r"([A])([a])"), r"\1 \2"),
+    (re.compile(r"([1-9])([(])"), r"\1 \2"),
+    ("or ", " or "),
+]
+
+# raw sqlite column name -> display name, and the reverse. Both are filled
+# from the database schema at startup (see build_column_maps()) and extended
+# lazily for any other names (e.g., aliases) returned by a query.
+display_column_names = {}
+sql_column_names = {}
+
+# table name -> raw sqlite column names, in schema order
+table_columns = {}
+
+
+def to_display_name(column: str) -> str:
+    """
+    Translates a raw sqlite column name (e.g., "FreeorReducedPriceMeals|
+    ELATotalTested") into its display name ("Free or Reduced Price Meals|
+    ELA Total Tested"). Each name is only translated once.
+
+    Args:
+        column (str): raw sqlite column name
+
+    Returns:
+        str: display name
+    """
+    column = str(column)
+
+    display_name = display_column_names.get(column)
+
+    if display_name is None:
+        display_name = column
+
+        for pattern, replacement in column_name_patterns:
+            if isinstance(pattern, str):
+                display_name = display_name.replace(pattern, replacement)
+            else:
+                display_name = pattern.sub(replacement, display_name)
+
+        display_column_names[column] = display_name
+        sql_column_names.setdefault(display_name, column)
+
+    return display_name
+
+
+def to_sql_name(column: str) -> str:
+    """
+    Translates a display name back into the raw sqlite column name that is
+    used in queries. Falls back to stripping spaces for names that are not
+    in the schema.
+
+    Args:
+        column (str): display name
+
+    Returns:
+        str: raw sqlite column name
+    """
+    get_context()
+
+    return sql_column_names.get(column, column.replace(" ", ""))
+
+
+def build_column_maps(read_engine: Engine) -> None:
+    """
+    Reads the column names of every table in the database and builds the
+    raw -> display and display -> raw column name maps.
+
+    Args:
+        read_engine (Engine): database engine
+    """
+    with read_engine.connect() as conn:
+        tables = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'table'"),
+        ).scalars().all()
+
+        for table in tables:
+            columns = conn.execute(text(f'PRAGMA table_info("{table}")')).all()
+
+            table_columns[table] = [column[1] for column in columns]
+
+            for column in columns:
+                to_display_name(column[1])
+
+
+# The measures (the part of a "Category|Measure" column after the "|") used
+# by each academic category tab. Columns without a "|" (school information)
+# and the AHS columns (used by every AHS calculation) are always selected.
+academic_tab_measures = {
+    "ilearnTab": [
+        "ELA Total Tested",
+        "ELA Total Proficient",
+        "Math Total Tested",
+        "Math Total Proficient",
+    ],
+    "ireadTab": ["IREAD Test N", "IREAD Pass N"],
+    "gradTab": ["Cohort Count", "Graduates"],
+    "satTab": [
+        f"{subject} {measure}"
+        for subject in ["EBRW", "Math"]
+        for measure in [
+            "Total Tested",
+            "At Benchmark",
+            "Below Benchmark",
+            "Approaching Benchmark",
+        ]
+    ],
+}
+
+# Measures that a tab does not use, but that check_total_tested keys on: a
+# null or 0 HS "|Cohort Count" drops every column of its category
+# (including the SAT columns and, for Total, "Total Student Count"). They
+# are read with the tab and dropped by clean_academic_data after the check.
+academic_tab_check_measures = {"satTab": ["Cohort Count"]}
+
+always_selected_categories = ["AHS"]
+
+
+def get_tab_columns(table: str, tab: str | None) -> tuple | None:
+    """
+    Gets the columns of an academic table that are needed by a category tab
+    (see academic_tab_measures and academic_tab_check_measures). The columns
+    are read from the schema and cached until the database changes.
+
+    Args:
+        table (str): table name
+        tab (str|None): the selected category tab (e.g., ilearnTab, gradTab)
+
+    Returns:
+        tuple|None: raw sqlite column names, or None (all columns) if there
+        is no entry for the tab
+    """
+    measures = academic_tab_measures.get(tab)
+
+    if measures is None:
+        return None
+
+    measures = measures + academic_tab_check_measures.get(tab, [])
+
+    def read_tab_columns() -> tuple | None:
+        with get_engine().connect() as conn:
+            table_columns[table] = [
+                column[1]
+                for column in conn.execute(text(f'PRAGMA table_info("{table}")'))
+            ]
+
+        if not table_columns[table]:
+            return None
+
+        columns = []
+
+        for column in table_columns[table]:
+            category, separator, measure = to_display_name(column).partition("|")
+
+            if (
+                not separator
+                or measure in measures
+                or category in always_selected_categories
+            ):
+                columns.append(column)
+
+        return tuple(columns)
+
+    return tab_columns.get_or_create((table, tab), read_tab_columns)
+
+
+def get_select_list(columns: tuple | None) -> str:
+    """
+    Returns:
+        str: the quoted column list of a SELECT statement (* if None)
+    """
+    if columns is None:
+        return "*"
+
+    return ", ".join(f'"{c}"' for c in columns)
 
 
 def run_query(q, *args):
     """
     Takes sql text query, gets query as a dataframe (read_sql is a convenience function
-    wrapper around read_sql_query), and perform a variety of basic clean up functions
-    If no data matches the query, an empty df is returned
+    wrapper around read_sql_query), and translates the raw column names into display
+    names. If no data matches the query, an empty df is returned
 
     Args:
         q (string): a sqlalchemy "text" query
@@ -47,71 +301,347 @@ def run_query(q, *args):
     """
     conditions = None
 
-    with engine.connect() as conn:
-        if args:
-            conditions = args[0]
-
-        df = pd.read_sql_query(q, conn, params=conditions)
-
-        # sqlite column headers do not have spaces between words. But we need to
-        # display the column names, so we have to do a bunch of str.replace to
-        # account for all conditions. May be a better way, but this is pretty fast.
-        # Adding a space between any lowercase character and any uppercase/number
-        # character takes care of most of it. The other replace functions catch
-        # edge cases.
-        df.columns = df.columns.str.replace(r"([a-z])([A-Z1-9%])", r"\1 \2", regex=True)
-        df.columns = df.columns.str.replace(
-            r"([WADTO])([CATPB&])", r"\1 \2", regex=True,
-        )
-        df.columns = df.columns.str.replace(
-            "EBRWand", "EBRW and",
-        )  # better way to do this?
-        df.columns = df.columns.str.replace(r"([A])([a])", r"\1 \2", regex=True)
-        df.columns = df.columns.str.replace(r"([1-9])([(])", r"\1 \2", regex=True)
-        df.columns = df.columns.str.replace("or ", " or ")
-        df.columns = df.columns.astype(str)
+    if args:
+        conditions = args[0]
 
-        return df
+    with get_engine().connect() as conn:
+        return read_frame(conn, q, conditions)
 
 
-def get_current_academic_year():
+def read_frame(
+    conn: Connection, q: TextClause, params: dict | None = None,
+) -> pd.DataFrame:
     """
-    the most recent academic year of data according to the k8 ilearn
-    data file
+    Reads the results of a query as a dataframe with display column names.
+
+    Args:
+        conn (Connection): an open database connection
+        q (TextClause): a sqlalchemy "text" query
+        params (dict|None): query parameters
 
     Returns:
-        int: an int representing the most recent year
+        pd.DataFrame: the query results
+    """
+    df = pd.read_sql_query(q, conn, params=params)
+
+    df.columns = [to_display_name(c) for c in df.columns]
+
+    return df
+
+
+# Resident mode: the dataset is small by database standards (a few thousand
+# schools x ~10 years), so when DASHBOARD_RESIDENT_DATA=1 the tables used
+# by the dashboard are read into memory once at startup and served by index
+# slicing instead of sql. Any table that is not resident falls back to sql.
+# The tables are loaded when the data context is created (see DataContext)
+# and reloaded when the database file changes (see get_resident_table).
+use_resident_data = os.environ.get("DASHBOARD_RESIDENT_DATA", "0") == "1"
+
+resident_table_keys = {
+    "academic_data_k8": ["School ID", "Corporation ID", "Year"],
+    "academic_data_hs": ["School ID", "Corporation ID", "Year"],
+    "corporation_data_k8": ["Corporation ID"],
+    "corporation_data_hs": ["Corporation ID"],
+    "demographic_data_school": ["School ID"],
+    "demographic_data_corp": ["Corporation ID"],
+    "adm_all": ["Corporation ID"],
+}
+
+resident_tables = {}
+resident_tables_lock = threading.Lock()
+
+
+def load_resident_data(read_engine: Engine, path: str) -> None:
+    """
+    Reads each table in resident_table_keys into a ResidentTable, tagged
+    with the version of the database file it was read from.
+
+    Args:
+        read_engine (Engine): database engine
+        path (str): path to the sqlite database file
+    """
+    # read before the tables, so a change made while they are being read
+    # causes another reload
+    version = file_version(path)
+
+    tables = {}
+
+    with read_engine.connect() as conn:
+        for table, keys in resident_table_keys.items():
+            q = text(f"SELECT * FROM {table}")  # noqa: S608
+            tables[table] = ResidentTable(read_frame(conn, q), keys, version)
+
+    resident_tables.update(tables)
+
+
+def resident_memory_usage() -> dict:
+    """
+    Returns:
+        dict: the size in bytes of each resident table and the total
+    """
+    usage = {table: data.memory_usage() for table, data in resident_tables.items()}
+    usage["total"] = sum(usage.values())
+
+    return usage
+
+
+def select_resident_rows(
+    table: str, key: str, values: list, columns: list | None = None,
+) -> pd.DataFrame | None:
+    """
+    Gets rows from a resident table, or None if the table is not resident
+    (in which case the caller falls back to sql).
+
+    Args:
+        table (str): table name
+        key (str): key column (display name)
+        values (list): key values
+        columns (list|None): columns to return (display names)
+
+    Returns:
+        pd.DataFrame|None: the selected rows
+    """
+    resident = get_resident_table(table)
+
+    if resident is None:
+        return None
+
+    return resident.select(key, values, columns)
+
+
+def get_resident_table(table: str) -> ResidentTable | None:
+    """
+    Gets a resident table, first reloading the resident tables if the
+    database file has changed since they were read (e.g., a new year of
+    data was loaded while the dashboard was running).
+
+    Args:
+        table (str): table name
+
+    Returns:
+        ResidentTable|None: the table, or None if it is not resident
     """
-    db = engine.raw_connection()
-    cur = db.cursor()
-    cur.execute(""" SELECT MAX(Year) FROM academic_data_k8 """)
-    year = cur.fetchone()[0]
-    db.close()
+    context = get_context()
+
+    resident = resident_tables.get(table)
+
+    if resident is None:
+        return None
+
+    version = file_version(context.db_path)
 
-    return year
+    if resident.version != version:
+        with resident_tables_lock:
+            current = resident_tables.get(table)
 
+            if current is not None and current.version != version:
+                load_resident_data(context.engine, context.db_path)
 
-current_academic_year = get_current_academic_year()
+        resident = resident_tables.get(table)
 
+    return resident
 
-def get_current_demographic_year():
+
+def get_current_academic_year(read_engine: Engine) -> int:
     """
     the most recent academic year of data according to the k8 ilearn
     data file
 
+    Args:
+        read_engine (Engine): database engine
+
+    Returns:
+        int: an int representing the most recent year
+    """
+    with read_engine.connect() as conn:
+        return conn.execute(text("SELECT MAX(Year) FROM academic_data_k8")).scalar()
+
+
+def get_current_demographic_year(read_engine: Engine) -> int:
+    """
+    the most recent year of demographic data according to the corporation
+    demographic data file
+
+    Args:
+        read_engine (Engine): database engine
+
     Returns:
         int: an int representing the most recent year
     """
-    db = engine.raw_connection()
-    cur = db.cursor()
-    cur.execute(""" SELECT MAX(Year) FROM demographic_data_corp """)
-    year = cur.fetchone()[0]
-    db.close()
+    with read_engine.connect() as conn:
+        return conn.execute(
+            text("SELECT MAX(Year) FROM demographic_data_corp"),
+        ).scalar()
+
+
+class DataContext:
+    """
+    The state that is read from the database when the dashboard starts: the
+    engine, the column name maps, the resident tables (if resident mode is
+    on), and the current academic and demographic years (re-read when the
+    database file changes). Nothing is read at
+    import. The context is created by the first call to get_context() (in
+    practice the first request), or ahead of time by warm_up(), which also
+    fills the caches. Each startup phase is timed and logged.
+
+    Args:
+        path (str): path to the sqlite database file
+    """
+
+    def __init__(self, path: str) -> None:
+        self.db_path = path
+        self.timings = {}
+
+        self.engine = self.timed("Database engine created", create_read_engine, path)
+
+        self.timed("Column maps built", build_column_maps, self.engine)
+
+        if use_resident_data:
+            self.timed(
+                "Resident data loaded", load_resident_data, self.engine, path,
+            )
+
+            print(  # noqa: T201
+                "Resident data size: %.1f MB . . ." % (  # noqa: UP031
+                    resident_memory_usage()["total"] / 1024**2
+                ),
+            )
+
+        # the current years change when a new year of data is loaded, so they
+        # are re-read when the database file changes
+        self.current_years = VersionedCache(path)
+
+        self.timed("Current academic year read", lambda: self.current_academic_year)
+        self.timed("Current demographic year read", lambda: self.current_demographic_year)
 
-    return year
+    @property
+    def current_academic_year(self) -> int:
+        return self.current_years.get_or_create(
+            "academic", lambda: get_current_academic_year(self.engine),
+        )
+
+    @property
+    def current_demographic_year(self) -> int:
+        return self.current_years.get_or_create(
+            "demographic", lambda: get_current_demographic_year(self.engine),
+        )
+
+    def timed(self, phase: str, func: Callable, *args: object) -> object:
+        """
+        Calls func(*args), recording and logging how long it took.
+        """
+        start = time.perf_counter()
+        result = func(*args)
+        self.timings[phase] = (time.perf_counter() - start) * 1000
+
+        print(f"{phase} ({self.timings[phase]:.1f} ms) . . .")  # noqa: T201
 
+        return result
+
+
+data_context = None
+data_context_lock = threading.Lock()
+
+
+def get_context() -> DataContext:
+    """
+    Returns:
+        DataContext: the data context, created on first use
+    """
+    global data_context  # noqa: PLW0603
 
-current_demographic_year = get_current_demographic_year()
+    if data_context is None:
+        with data_context_lock:
+            if data_context is None:
+                data_context = DataContext(db_path)
+
+    return data_context
+
+
+def get_engine() -> Engine:
+    """
+    Returns:
+        Engine: the database engine of the data context
+    """
+    return get_context().engine
+
+
+def warm_up(all_years: bool = False) -> DataContext:
+    """
+    Creates the data context and fills the caches that the first requests
+    would otherwise fill: the table names and the comparison school indexes
+    of the current year (or of every year). Call it before serving (e.g.,
+    once per worker, or once in a preforking server before the workers are
+    forked - see gunicorn.conf.py) so that no request pays for startup.
+
+    Args:
+        all_years (bool): build the comparison indexes of every year
+
+    Returns:
+        DataContext: the data context
+    """
+    context = get_context()
+
+    context.timed("Table names read", get_table_names)
+
+    for school_type, table in [("K8", "academic_data_k8"), ("HS", "academic_data_hs")]:
+        if all_years:
+            years = get_table_years(table)
+        else:
+            years = [context.current_academic_year]
+
+        def build_indexes(years: list = years, school_type: str = school_type) -> None:
+            for year in years:
+                get_comparison_index(year, school_type)
+
+        context.timed(
+            f"{school_type} comparison indexes built ({len(years)} years)",
+            build_indexes,
+        )
+
+    return context
+
+
+def get_data_version() -> str:
+    """
+    A fingerprint of the data (the size and modification time of the
+    database file, and the current years), used to validate cached
+    responses. The database file is only replaced or modified when new
+    data is loaded.
+
+    Returns:
+        str: data version
+    """
+    try:
+        stat = os.stat(db_path)
+        file_version = f"{stat.st_mtime_ns}-{stat.st_size}"
+    except OSError:
+        file_version = "missing"
+
+    context = get_context()
+
+    return (
+        f"{file_version}-{context.current_academic_year}-"
+        f"{context.current_demographic_year}"
+    )
+
+
+def get_pool_stats() -> dict:
+    """
+    Returns:
+        dict: connection pool and cache statistics
+    """
+    pool = get_engine().pool
+
+    return {
+        "pool": {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        },
+        "academic_data_cache": academic_data_cache.stats(),
+    }
 
 
 def get_excluded_years(year: str, category: str) -> list:
@@ -128,10 +658,12 @@ def get_excluded_years(year: str, category: str) -> list:
 
     excluded_years = []
 
+    context = get_context()
+
     if category == "demographic":
-        test_year = current_demographic_year
+        test_year = context.current_demographic_year
     else:
-        test_year = current_academic_year
+        test_year = context.current_academic_year
 
     if int(year) == test_year:
         return []
@@ -163,27 +695,24 @@ def get_geo_corp(*args):
         string: Corp ID
     """
 
-    if params["type"] == "K8":
-        q = text(
-            """
-            SELECT DISTINCT GEOCorp
-                FROM academic_data_k8
-                WHERE SchoolID = :id
-            """,
-        )
+    table = "academic_data_k8" if params["type"] == "K8" else "academic_data_hs"
 
-    else:
+    result = select_resident_rows(
+        table, "School ID", [int(params["id"])], ["GEO Corp"],
+    )
+
+    if result is None:
         q = text(
-            """
+            f"""
             SELECT DISTINCT GEOCorp
-                FROM academic_data_hs
+                FROM {table}
                 WHERE SchoolID = :id
-            """,
+            """,  # noqa: S608
         )
 
-    result = run_query(q, params)
+        result = run_query(q, params)
 
-    return str(result["GEO Corp"][0])
+    return str(int(result["GEO Corp"][0]))
 
 
 
@@ -191,29 +720,149 @@ def get_school_coordinates(*args):
     keys = ["year", "type"]
     params = dict(zip(keys, args, strict=False))
 
+    columns = [
+        "Lat", "Lon", "School ID", "School Name", "High Grade", "Low Grade",
+        "Total Student Count",
+    ]
+
     if params["type"] == "HS":
+        table = "academic_data_hs"
+    else:
+        table = "academic_data_k8"
+        columns.append("Total|ELA Total Tested")
+
+    result = select_resident_rows(table, "Year", [int(params["year"])], columns)
+
+    if result is None:
         q = text(
-            """
-            SELECT Lat, Lon, SchoolID, SchoolName, HighGrade, LowGrade,
-                TotalStudentCount
-            FROM academic_data_hs
+            f"""
+            SELECT {", ".join(f'"{to_sql_name(c)}"' for c in columns)}
+            FROM {table}
             WHERE Year = :year
-        """,
+        """,  # noqa: S608
         )
-    else:
+
+        result = run_query(q, params)
+
+    return result
+
+
+def get_comparison_index(year: str | int, school_type: str) -> ComparisonIndex:
+    """
+    Gets the comparison school index for a year and school type, building it
+    from get_school_coordinates() the first time it is requested.
+
+    Args:
+        year (str|int): the selected year
+        school_type (str): K8, K12, HS, or AHS (K12 schools use the K8 index)
+
+    Returns:
+        ComparisonIndex: the index of all schools of the type for the year
+    """
+    index_type = "HS" if school_type == "HS" else "K8"
+
+    return comparison_indexes.get_or_create(
+        (int(year), index_type),
+        lambda: ComparisonIndex(get_school_coordinates(year, index_type)),
+    )
+
+
+def get_table_years(table: str) -> list:
+    """
+    Returns:
+        list: the years (int) of the data in a table
+    """
+    q = text(f"SELECT DISTINCT Year FROM {table} ORDER BY Year")  # noqa: S608
+
+    return [int(y) for y in run_query(q)["Year"]]
+
+
+def get_table_names() -> set:
+    """
+    Returns:
+        set: the names of the tables in the database
+    """
+    def read_table_names() -> set:
+        with get_engine().connect() as conn:
+            return set(
+                conn.execute(
+                    text("SELECT name FROM sqlite_master WHERE type = 'table'"),
+                ).scalars(),
+            )
+
+    return database_tables.get_or_create("tables", read_table_names)
+
+
+def get_comparison_list(
+    year: str | int,
+    school_type: str,
+    school_id: str | int,
+    type_tab: str,
+    max_schools: int = 20,
+    max_distance: float = np.inf,
+) -> tuple[list, int]:
+    """
+    Gets the comparison school list for a school. Lists are precomputed by
+    "python prepare_database.py comparisons" (without a distance limit) - if
+    the comparison_lists table does not exist, its list for the school is
+    shorter than max_schools (there are not enough comparable schools, or
+    the table was built with fewer schools per list), or max_distance is
+    set, the list is calculated from the comparison index.
+
+    Args:
+        year (str|int): the selected year
+        school_type (str): K8, K12, HS, or AHS
+        school_id (str|int): the selected school
+        type_tab (str): the selected type tab (k8Tab or hsTab)
+        max_schools (int): the maximum number of schools to return
+        max_distance (float): only schools within this many miles of the
+            selected school are returned
+
+    Returns:
+        list: a list of {"School ID", "School Name"} dicts (the first school
+            is the selected school)
+        int: the number of candidate schools scanned (0 if precomputed)
+    """
+    if max_distance == np.inf and "comparison_lists" in get_table_names():
         q = text(
             """
-            SELECT Lat, Lon, SchoolID, SchoolName, HighGrade, LowGrade,
-                TotalStudentCount, "Total|ELATotalTested"
-            FROM academic_data_k8
-            WHERE Year = :year
+            SELECT ComparisonID, ComparisonName
+            FROM comparison_lists
+            WHERE Year = :year AND SchoolType = :type AND TypeTab = :tab
+                AND SchoolID = :id AND Rank < :max_schools
+            ORDER BY Rank
         """,
         )
 
-    return run_query(q, params)
+        params = {
+            "year": int(year),
+            "type": "HS" if school_type == "HS" else "K8",
+            "tab": type_tab,
+            "id": int(school_id),
+            "max_schools": max_schools,
+        }
+
+        with get_engine().connect() as conn:
+            rows = conn.execute(q, params).all()
+
+        if len(rows) >= max_schools:
+            return [{"School ID": int(r[0]), "School Name": r[1]} for r in rows], 0
+
+    return get_comparison_index(year, school_type).search(
+        school_id, type_tab, max_schools, max_distance,
+    )
 
 
 def get_public_dropdown():
+    """
+    Gets the school dropdown list: the Year, Corporation ID and Name, School
+    ID and Name, School Type, and Sub Type of every school in the
+    demographic data. Type and Sub Type are determined by the grade span
+    (the lowest and highest grades with any students).
+
+    Returns:
+        pd.DataFrame: dropdown list
+    """
     params = {"id": ""}
     q = text(
         """
@@ -224,98 +873,73 @@ def get_public_dropdown():
 
     results = run_query(q, params)
 
-    grades = results[
-        [
-            "Grade 3",
-            "Grade 4",
-            "Grade 5",
-            "Grade 6",
-            "Grade 7",
-            "Grade 8",
-            "Grade 9",
-            "Grade 10",
-            "Grade 11",
-            "Grade 12",
-        ]
-    ]
+    grade_numbers = np.arange(3, 13)
+
+    grades = results[[f"Grade {g}" for g in grade_numbers]]
     grades = grades.replace(0, np.nan)
     grades = grades.replace("0", np.nan)
 
-    low_high = pd.DataFrame()
-    low_high["Low Grade"] = (
-        grades.dropna(how="all").notna().idxmax(axis=1).astype("string")
-    )
-    low_high["High Grade"] = grades.apply(
-        pd.Series.last_valid_index, axis=1,
-    ).reset_index(drop=True)
+    # rows without students in any grade are dropped
+    has_grades = grades.notna().to_numpy()
+    has_span = has_grades.any(axis=1)
+    has_grades = has_grades[has_span]
 
-    low_high["Low Grade"] = low_high["Low Grade"].str.replace("Grade ", "")
-    low_high["High Grade"] = low_high["High Grade"].str.replace("Grade ", "")
+    # first and last grade with students
+    low_grade = grade_numbers[has_grades.argmax(axis=1)]
+    high_grade = grade_numbers[len(grade_numbers) - 1 - has_grades[:, ::-1].argmax(axis=1)]
 
-    low_high["School Type"] = np.where(
-        (low_high["Low Grade"].astype(int) < 9)
-        & (low_high["High Grade"].astype(int) < 9),
+    school_type = np.select(
+        [
+            (low_grade < 9) & (high_grade < 9),
+            low_grade >= 9,
+            (low_grade <= 3) & (high_grade >= 9),
+        ],
+        ["K8", "HS", "K12"],
         "K8",
-        np.where(
-            low_high["Low Grade"].astype(int) >= 9,
-            "HS",
-            np.where(
-                (low_high["Low Grade"].astype(int) <= 3)
-                & (low_high["High Grade"].astype(int) >= 9),
-                "K12",
-                "K8",
-            ),
-        ),
     )
 
-    low_high["Sub Type"] = np.where(
-        (low_high["Low Grade"].astype(int) < 5)
-        & (low_high["High Grade"].astype(int) <= 5),
-        "ES",
-        np.where(
-            (low_high["Low Grade"].astype(int) >= 5)
-            & (low_high["High Grade"].astype(int) < 9),
-            "MS",
-            np.where(
-                low_high["Low Grade"].astype(int) >= 9,
-                "HS",
-                np.where(
-                    (low_high["Low Grade"].astype(int) <= 3)
-                    & (low_high["High Grade"].astype(int) >= 9),
-                    "K12",
-                    "K8",
-                ),
-            ),
-        ),
+    sub_type = np.select(
+        [
+            (low_grade < 5) & (high_grade <= 5),
+            (low_grade >= 5) & (high_grade < 9),
+            low_grade >= 9,
+            (low_grade <= 3) & (high_grade >= 9),
+        ],
+        ["ES", "MS", "HS", "K12"],
+        "K8",
     )
 
-    filtered = results[
-        ["Year", "Corporation ID", "Corporation Name", "School ID", "School Name"]
+    dropdown_list = results.loc[
+        has_span,
+        ["Year", "Corporation ID", "Corporation Name", "School ID", "School Name"],
     ]
 
-    dropdown_list = pd.merge(
-        filtered,
-        low_high[["School Type", "Sub Type"]],
-        left_index=True,
-        right_index=True,
-    )
+    dropdown_list["School Type"] = school_type
+    dropdown_list["Sub Type"] = sub_type
 
     # cannot identify AHS by gradespan because their grade levels are
     # not reliably stored in the demographics file (usually as 11 & 12,
     # rarely "Adult")
-    ahs_data = get_ahs_averages()
-
-    ahs_data = ahs_data[["School ID", "School Type"]]
-    ahs_data["Sub Type"] = ahs_data["School Type"]
-
-    ahs_data = ahs_data.drop_duplicates(subset=["School ID"])
-
-    ahs_data = ahs_data.set_index(["School ID"])
-    dropdown_list = dropdown_list.set_index(["School ID"])
+    ahs_ids = run_query(
+        text(
+            """
+            SELECT DISTINCT SchoolID
+                FROM academic_data_hs
+                WHERE SchoolType = 'AHS'
+            """,
+        ),
+    )["School ID"]
 
-    dropdown_list.update(ahs_data)
-    return dropdown_list.reset_index()
+    dropdown_list.loc[
+        dropdown_list["School ID"].isin(ahs_ids), ["School Type", "Sub Type"],
+    ] = "AHS"
 
+    return dropdown_list[
+        [
+            "School ID", "Year", "Corporation ID", "Corporation Name",
+            "School Name", "School Type", "Sub Type",
+        ]
+    ].reset_index(drop=True)
 
 
 def get_academic_dropdown_years(*args):
@@ -356,15 +980,99 @@ def get_academic_dropdown_years(*args):
     return years
 
 
+def has_current_corporation_attendance(table: str) -> bool:
+    """
+    Whether the corporation_attendance table has been built and is current
+    for an academic table: a new year of data loaded after the build is not
+    in it, so the attendance is aggregated on the fly until it is rebuilt.
+
+    Args:
+        table (str): academic table (academic_data_k8 or academic_data_hs)
+
+    Returns:
+        bool: True if corporation_attendance has the newest year of table
+    """
+    if "corporation_attendance" not in get_table_names():
+        return False
+
+    def read_is_current() -> bool:
+        q = text(
+            f"""
+            SELECT
+                (SELECT MAX(Year)
+                    FROM corporation_attendance
+                    WHERE AcademicTable = :table),
+                (SELECT MAX(Year) FROM {table})
+        """,  # noqa: S608
+        )
+
+        with get_engine().connect() as conn:
+            stored_year, source_year = conn.execute(q, {"table": table}).one()
+
+        return stored_year is not None and (
+            source_year is None or stored_year >= source_year
+        )
+
+    return database_tables.get_or_create(
+        ("corporation_attendance", table), read_is_current,
+    )
+
+
+def aggregate_attendance(data: pd.DataFrame, keys: list) -> pd.DataFrame:
+    """
+    Rough up the attendance of a corporation by combining all of its schools:
+    the total number of students chronically absent and of students, and
+    the average attendance rate. Values that are not numbers (e.g., "***"
+    and blanks) are dropped. Used on the fly and to build the
+    corporation_attendance table (see prepare_database.py).
+
+    NOTE: This is approximate only - because K8 doesn't include HS and
+    vice versa.
+
+    Args:
+        data (pd.DataFrame): the attendance columns of the schools
+        keys (list): the columns to aggregate by (e.g., ["Year"])
+
+    Returns:
+        pd.DataFrame: aggregated attendance indexed by keys
+    """
+    data = data.copy()
+
+    for col in ["Students Chronically Absent", "Total Student Count", "Attendance Rate"]:
+        data[col] = pd.to_numeric(data[col], errors="coerce")
+
+    return data.groupby(keys).agg(
+        {
+            "Students Chronically Absent": "sum",
+            "Total Student Count": "sum",
+            "Attendance Rate": "mean",
+        },
+    )
+
+
 # Gets demographic data, attendance rate, and chronic absenteeism
 # data for selected school and GEO Corp
 def get_demographic_data(params):
+    """
+    Gets the demographic and attendance data of a school and of the school
+    corporation in which it is located. The school data is one query (the
+    demographics joined to the attendance columns of the academic table).
+    For the corporation data the GEO Corp of the school is found by a
+    subquery, and the attendance of every school in the corp is read from
+    the corporation_attendance table if it is current (one query, see
+    has_current_corporation_attendance), or read and aggregated by
+    aggregate_attendance() otherwise.
+
+    Args:
+        params (dict): school_id, school_type, and year
+
+    Returns:
+        pd.DataFrame: school and corporation demographic data
+    """
     school_id = params["school_id"]
     school_type = params["school_type"]
     year = params["year"]
 
-    geo_corp = get_geo_corp(school_id, school_type)
-
     # NOTE: For K12 schools, attendance data is the same in both
     # k8 and hs files - need to eventually fix this
     # TODO: currently treating K12 schools as K8 - need to fix once
@@ -372,111 +1080,179 @@ def get_demographic_data(params):
 
     if school_type == "K8" or school_type == "K12":
         table = "academic_data_k8"
-    elif school_type == "HS":
+    else:
         table = "academic_data_hs"
 
-    # School demographic and attendance data
-    w = text(
-        """
-        SELECT *
-            FROM demographic_data_school
-            WHERE SchoolID = :school_id
-        """,
-    )
+    # see get_geo_corp()
+    geo_table = "academic_data_k8" if school_type == "K8" else "academic_data_hs"
 
-    school_demographics = run_query(w, params)
+    attendance_columns = [
+        "Year", "Attendance Rate", "Students Chronically Absent",
+        "Total Student Count",
+    ]
 
-    school_attendance_query_string = f"""
-        SELECT Year, AttendanceRate, StudentsChronicallyAbsent, TotalStudentCount
-            FROM {table}
-            WHERE SchoolID = :school_id
-        """  # noqa: S608
+    get_context()
 
-    y = text(school_attendance_query_string)
+    if table in resident_tables and geo_table in resident_tables and all(
+        t in resident_tables
+        for t in ["demographic_data_school", "demographic_data_corp"]
+    ):
+        school_merged, corp_merged = get_resident_demographic_data(
+            school_id, school_type, table, attendance_columns,
+        )
 
-    school_attendance = run_query(y, params)
+    else:
+        # School demographic and attendance data
+        school_query_string = f"""
+            SELECT d.*, a.AttendanceRate, a.StudentsChronicallyAbsent,
+                a.TotalStudentCount
+                FROM demographic_data_school AS d
+                LEFT JOIN {table} AS a
+                    ON a.SchoolID = d.SchoolID AND a.Year = d.Year
+                WHERE d.SchoolID = :school_id
+            """  # noqa: S608
+
+        school_merged = run_query(
+            text(school_query_string), {"school_id": int(school_id)},
+        )
 
-    school_attendance = school_attendance.sort_values(by="Year", ascending=False)
+        school_merged[attendance_columns[1:]] = school_merged[
+            attendance_columns[1:]
+        ].replace(r"^\s*$", np.nan, regex=True)
+
+        # Corp demographic and attendance data
+        # NOTE: Do not believe that we are currently using this anywhere.
+        geo_corp_query_string = f"""
+            WITH geo_corp AS (
+                SELECT GEOCorp
+                    FROM {geo_table}
+                    WHERE SchoolID = :school_id
+                    LIMIT 1
+            )"""
+
+        if has_current_corporation_attendance(table):
+            corp_query_string = f"""{geo_corp_query_string},
+            attendance AS (
+                SELECT *
+                    FROM corporation_attendance
+                    WHERE AcademicTable = '{table}'
+                        AND CorporationID = (SELECT GEOCorp FROM geo_corp)
+            )
+            SELECT d.*, d.CorporationID AS SchoolID,
+                d.CorporationName AS SchoolName,
+                a.StudentsChronicallyAbsent, a.TotalStudentCount,
+                a.AttendanceRate
+                FROM demographic_data_corp AS d
+                LEFT JOIN attendance AS a ON a.Year = d.Year
+                WHERE d.CorporationID = (SELECT GEOCorp FROM geo_corp)
+            """  # noqa: S608
+
+            corp_merged = run_query(
+                text(corp_query_string), {"school_id": int(school_id)},
+            )
 
-    school_attendance = school_attendance.replace(r"^\s*$", np.nan, regex=True)
+        else:
+            corp_query_string = f"""{geo_corp_query_string}
+            SELECT d.*, d.CorporationID AS SchoolID,
+                d.CorporationName AS SchoolName
+                FROM demographic_data_corp AS d
+                WHERE d.CorporationID = (SELECT GEOCorp FROM geo_corp)
+            """  # noqa: S608
+
+            corp_attendance_query_string = f"""{geo_corp_query_string}
+            SELECT Year, AttendanceRate, StudentsChronicallyAbsent,
+                TotalStudentCount
+                FROM {table}
+                WHERE CorporationID = (SELECT GEOCorp FROM geo_corp)
+            """  # noqa: S608
 
-    school_attendance["Chronic Absenteeism %"] = calculate_percentage(
-        school_attendance["Students Chronically Absent"],
-        school_attendance["Total Student Count"],
-    )
+            corp_demographics = run_query(
+                text(corp_query_string), {"school_id": int(school_id)},
+            )
 
-    # Merge left on on demographics (will always have more data than attendance)
-    school_merged = pd.merge(
-        school_demographics, school_attendance, on="Year", how="left",
+            corp_attendance_raw = run_query(
+                text(corp_attendance_query_string), {"school_id": int(school_id)},
+            )
+
+            corp_merged = pd.merge(
+                corp_demographics,
+                aggregate_attendance(corp_attendance_raw, ["Year"]),
+                on="Year",
+                how="left",
+            )
+
+    school_merged["Chronic Absenteeism %"] = calculate_percentage(
+        school_merged["Students Chronically Absent"],
+        school_merged["Total Student Count"],
     )
 
-    # Corp demographic and attendance data
-    # NOTE: Do not believe that we are currently using this anywhere.
-    corp_demographics_query_string = f"""
-        SELECT *
-            FROM demographic_data_corp
-	        WHERE CorporationID = {geo_corp}
-        """  # noqa: E101, S608
+    corp_merged["Chronic Absenteeism %"] = (
+        corp_merged["Students Chronically Absent"]
+        / corp_merged["Total Student Count"]
+    )
 
-    x = text(corp_demographics_query_string)
+    # merge school and corp data
+    all_demographics = pd.concat([school_merged, corp_merged], axis=0)
 
-    corp_demographics = run_query(x, params)
+    all_demographics = all_demographics.drop(
+        ["Students Chronically Absent", "Total Student Count"], axis=1,
+    )
 
-    # add missing columns
-    corp_demographics[["School ID", "School Name"]] = corp_demographics[
-        ["Corporation ID", "Corporation Name"]
-    ]
+    excluded_years = get_excluded_years(year, "demographic")
 
-    corp_attendance_query_string = f"""
-        SELECT Year, AttendanceRate, StudentsChronicallyAbsent, TotalStudentCount
-            FROM {table}
-            WHERE CorporationID = {geo_corp}
-        """  # noqa: S608
+    if excluded_years:
+        all_demographics = all_demographics[
+            ~all_demographics["Year"].isin(excluded_years)
+        ]
 
-    z = text(corp_attendance_query_string)
+    return all_demographics
 
-    corp_attendance_raw = run_query(z, params)
 
-    # Rough up an average by combining all schools from the corp
-    # NOTE: This is approximate only - because K8 doesn't include
-    # HS and vice versa.
-    corp_attendance_raw = corp_attendance_raw.fillna("")
+def get_resident_demographic_data(
+    school_id: str, school_type: str, table: str, attendance_columns: list,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    The resident table version of the two get_demographic_data() queries.
 
-    for col in corp_attendance_raw.columns[1:]:
-        corp_attendance_raw[col] = pd.to_numeric(
-            corp_attendance_raw[col], errors="coerce",
-        )
+    Returns:
+        tuple: the school and the corporation demographic data (with raw and
+        aggregated attendance data respectively)
+    """
+    geo_corp = get_geo_corp(school_id, school_type)
 
-    corp_attendance = corp_attendance_raw.groupby("Year")[
-        ["Students Chronically Absent", "Total Student Count"]
-    ].sum()
+    school_demographics = select_resident_rows(
+        "demographic_data_school", "School ID", [int(school_id)],
+    )
 
-    corp_attendance["Chronic Absenteeism %"] = (
-        corp_attendance["Students Chronically Absent"]
-        / corp_attendance["Total Student Count"]
+    school_attendance = select_resident_rows(
+        table, "School ID", [int(school_id)], attendance_columns,
     )
 
-    corp_attendance["Attendance Rate"] = corp_attendance_raw.groupby("Year").agg(
-        {"Attendance Rate": "mean"},
+    school_attendance = school_attendance.replace(r"^\s*$", np.nan, regex=True)
+
+    # Merge left on on demographics (will always have more data than attendance)
+    school_merged = pd.merge(
+        school_demographics, school_attendance, on="Year", how="left",
     )
 
-    corp_merged = pd.merge(corp_demographics, corp_attendance, on="Year", how="left")
+    corp_demographics = select_resident_rows(
+        "demographic_data_corp", "Corporation ID", [int(geo_corp)],
+    )
 
-    # merge school and corp data
-    all_demographics = pd.concat([school_merged, corp_merged], axis=0)
+    # add missing columns
+    corp_demographics[["School ID", "School Name"]] = corp_demographics[
+        ["Corporation ID", "Corporation Name"]
+    ]
 
-    all_demographics = all_demographics.drop(
-        ["Students Chronically Absent", "Total Student Count"], axis=1,
+    corp_attendance_raw = select_resident_rows(
+        table, "Corporation ID", [int(geo_corp)], attendance_columns,
     )
 
-    excluded_years = get_excluded_years(year, "demographic")
+    corp_attendance = aggregate_attendance(corp_attendance_raw, ["Year"])
 
-    if excluded_years:
-        all_demographics = all_demographics[
-            ~all_demographics["Year"].isin(excluded_years)
-        ]
+    corp_merged = pd.merge(corp_demographics, corp_attendance, on="Year", how="left")
 
-    return all_demographics
+    return school_merged, corp_merged
 
 
 def get_academic_data(*args):
@@ -487,38 +1263,97 @@ def get_academic_data(*args):
     Args:
     schools (list): list of school IDs
     type (str): school type ("k8","k12","hs","ahs")
-    year (str): selected year
-    page (str): page from which data is requested
+    tab (str): selected category tab (optional) - only the columns needed by
+        the tab are read (all columns if None)
 
     Returns:
         data: pd.DataFrame
     """
 
-    keys = ["schools", "type"]
+    keys = ["schools", "type", "tab"]
 
     params = dict(zip(keys, args, strict=False))
 
-    # if length of school_id is > 1, then we are pulling data for a list
-    # of schools (academic_analysis), otherwise one school (academic_info and
-    # academic_metric)
-    if len(params["schools"]) > 1:
-        school_str = ", ".join([str(int(v)) for v in params["schools"]])
-
-    else:
-        school_str = params["schools"][0]
-
     # Get data for academic_information and academic_metrics
     # all data / all years for school(s) and school corporation
     school_table = "academic_data_k8" if params["type"] == "K8" else "academic_data_hs"
 
-    query_string = f"""
-        SELECT *
-            FROM {school_table}
-            WHERE SchoolID IN ({school_str})"""  # noqa: S608
+    # the raw rows for each school are cached individually, so the selected
+    # school and comparison schools are shared across different comparison
+    # lists. only schools that are not already cached are queried.
+    school_ids = list(dict.fromkeys(int(v) for v in params["schools"]))
+
+    columns = get_tab_columns(school_table, params.get("tab"))
+
+    # the tab is part of the cache key only if it changes the columns
+    tab = None if columns is None else params["tab"]
+
+    resident_data = select_resident_rows(
+        school_table,
+        "School ID",
+        school_ids,
+        None if columns is None else [to_display_name(c) for c in columns],
+    )
+
+    if resident_data is not None:
+        return resident_data
+
+    academic_data_cache.validate()
+
+    school_frames = {}
+    missing = []
+
+    for school_id in school_ids:
+        frame = academic_data_cache.get((school_table, tab, school_id))
+
+        if frame is None:
+            missing.append(school_id)
+        else:
+            school_frames[school_id] = frame
+
+    if missing:
+        school_str = ", ".join([str(v) for v in missing])
 
-    q = text(query_string)
+        query_string = f"""
+            SELECT {get_select_list(columns)}
+                FROM {school_table}
+                WHERE SchoolID IN ({school_str})"""  # noqa: S608
 
-    return run_query(q, params)
+        q = text(query_string)
+
+        results = run_query(q, params)
+
+        # schools without any rows are cached as empty frames so that
+        # they are not queried again
+        for school_id in missing:
+            frame = results[results["School ID"] == school_id].reset_index(drop=True)
+            academic_data_cache.put((school_table, tab, school_id), frame)
+            school_frames[school_id] = frame
+
+    frames = [school_frames[school_id] for school_id in school_ids]
+
+    # schools without any rows only add their dtypes to the concat, and a
+    # column that is all null (object) for one school and numeric for
+    # another is concatenated as object, so that the result does not depend
+    # on how pandas treats empty or all-NA entries when it picks the dtypes
+    frames = [frame for frame in frames if not frame.empty] or frames[:1]
+
+    mixed_columns = [
+        col
+        for col in frames[0].columns
+        if len({frame[col].dtype for frame in frames}) > 1
+    ]
+
+    if mixed_columns:
+        frames = [
+            frame.astype(dict.fromkeys(mixed_columns, object)) for frame in frames
+        ]
+
+    data = pd.concat(frames, ignore_index=True)
+
+    # restore the dtype that each mixed column would have had if the
+    # schools had been read together
+    return data.infer_objects()
 
 
 def get_available_years(*args):
@@ -629,24 +1464,16 @@ def get_available_years(*args):
     pd.set_option('display.max_columns', None)
     pd.set_option('display.max_rows', None)
 
-    for col in result.columns:
-        result[col] = pd.to_numeric(result[col], errors="coerce")
-
-    result.replace(0, np.nan, inplace=True)
-
-    result = result.dropna(axis=1, how="all")
-
-    results = (
-        result.set_index("Year")
-        .T.rename_axis("Category")
-        .rename_axis(None, axis=1)
-        .reset_index()
+    # keep the years where at least one category has a non-zero value
+    measures = Measures.from_frame(
+        result, [c for c in result.columns if c != "Year"],
     )
-    results = results.dropna(axis=1, how="all")
 
-    years = results.columns.tolist()
+    has_data = ((measures.values != 0) & ~np.isnan(measures.values)).any(axis=0)
+
+    years = pd.to_numeric(result["Year"], errors="coerce")[has_data]
 
-    return [str(col) for col in years if "Category" not in str(col)]
+    return [str(year) for year in years]
 
 
 def get_corporation_academic_data(*args: str) -> pd.DataFrame:
@@ -657,11 +1484,12 @@ def get_corporation_academic_data(*args: str) -> pd.DataFrame:
     Args:
         school_id (str): 4 digit school id in string format
         school_type (str): k8, hs, ahs, k12
+        tab (str): selected category tab (optional, see get_tab_columns)
 
     Returns:
         pd.DataFrame: ilearn proficiency data for corporation
     """
-    keys = ["id", "type"]
+    keys = ["id", "type", "tab"]
     params = dict(zip(keys, args))
 
     # TODO: What if AHS?
@@ -670,13 +1498,25 @@ def get_corporation_academic_data(*args: str) -> pd.DataFrame:
     else:
         table = "corporation_data_k8"
 
+    columns = get_tab_columns(table, params.get("tab"))
+
+    results = select_resident_rows(
+        table,
+        "Corporation ID",
+        [int(params["id"])],
+        None if columns is None else [to_display_name(c) for c in columns],
+    )
+
+    if results is not None:
+        return results.sort_values(by="Year")
+
     q = text(
         """
-        SELECT *
+        SELECT {}
             FROM {}
             WHERE CorporationID = :id
         """.format(
-            table
+            get_select_list(columns), table
         )
     )
 
@@ -770,6 +1610,11 @@ def get_adm_data(corp_id: str) -> pd.DataFrame:
     """
     params = dict(id=corp_id)
 
+    results = select_resident_rows("adm_all", "Corporation ID", [int(corp_id)])
+
+    if results is not None:
+        return results
+
     q = text(
         """
         SELECT * 
@@ -831,9 +1676,9 @@ def get_year_over_year_data(*args):
             passed = params["category"] + " Total Proficient"
             result = params["category"] + " Proficient"
 
-    # Query strings (param must be passed in with spaces)
-    passed_query = passed.replace(" ", "")
-    tested_query = tested.replace(" ", "")
+    # Query strings (translate display names back to sqlite column names)
+    passed_query = to_sql_name(passed)
+    tested_query = to_sql_name(tested)
 
     school_query_str = (
         "Year, SchoolID, SchoolName, LowGrade, HighGrade, SchoolType, "
@@ -0,0 +1,265 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# numeric measure representation        #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+# Academic measures come out of the database as a mix of numbers, nulls, and
+# the "***" insufficient n-size marker, so the same columns used to be run
+# through pd.to_numeric(errors="coerce") again and again by the calculation
+# functions. A Measures object coerces a block of measure columns once and
+# keeps the two pieces of information that coercion throws away (whether a
+# value was "***" and whether it was null in the source) as packed bitmasks.
+
+import numpy as np
+import pandas as pd
+
+SUPPRESSED = "***"
+
+
+class Measure:
+    """
+    A measure column (1-D) or a block of measure columns (2-D, rows x columns):
+    float values (NaN for anything that is not a number), and boolean masks of
+    the values that were "***" (suppressed) or null in the source data. The
+    calculation kernels are elementwise, so they work on either shape.
+
+    Args:
+        values (np.ndarray): float values
+        suppressed (np.ndarray): True where the source value was "***"
+        null (np.ndarray): True where the source value was null/NaN
+        integer (bool|np.ndarray): True if the column (one per column for a
+            block) coerces to an integer dtype. pd.to_numeric keeps integers,
+            so differences of integer columns are integers.
+    """
+
+    __slots__ = ("integer", "null", "suppressed", "values")
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        suppressed: np.ndarray,
+        null: np.ndarray,
+        integer: bool | np.ndarray = False,
+    ) -> None:
+        self.values = values
+        self.suppressed = suppressed
+        self.null = null
+        self.integer = integer
+
+    @classmethod
+    def from_values(
+        cls, data: pd.Series | pd.DataFrame | np.ndarray | list,
+    ) -> "Measure":
+        """
+        Coerces a column (or frame) of raw values (numbers, nulls, and "***").
+        """
+        if isinstance(data, pd.DataFrame):
+            raw = data.to_numpy(dtype=object)
+
+            numeric = data.apply(pd.to_numeric, errors="coerce")
+
+            return cls(
+                numeric.to_numpy(dtype=float, na_value=np.nan),
+                raw == SUPPRESSED,
+                pd.isna(raw),
+                numeric.dtypes.map(pd.api.types.is_integer_dtype).to_numpy(dtype=bool),
+            )
+
+        series = data if isinstance(data, pd.Series) else pd.Series(data)
+
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            null = series.isna().to_numpy()
+            suppressed = np.zeros(len(series), dtype=bool)
+        else:
+            raw = series.to_numpy(dtype=object)
+            null = pd.isna(raw)
+            suppressed = raw == SUPPRESSED
+
+        numeric = pd.to_numeric(series, errors="coerce")
+
+        return cls(
+            numeric.to_numpy(dtype=float, na_value=np.nan),
+            suppressed,
+            null,
+            pd.api.types.is_integer_dtype(numeric.dtype),
+        )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def take_columns(self, columns: np.ndarray) -> "Measure":
+        """
+        Selects columns of a 2-D block (a boolean mask or column positions).
+        """
+        return Measure(
+            self.values[:, columns],
+            self.suppressed[:, columns],
+            self.null[:, columns],
+            np.asarray(self.integer)[columns],
+        )
+
+
+def as_measure(data: Measure | pd.Series | pd.DataFrame | np.ndarray) -> Measure:
+    """
+    Returns data unchanged if it is already a Measure, otherwise coerces it.
+    """
+    if isinstance(data, Measure):
+        return data
+
+    return Measure.from_values(data)
+
+
+class Measures:
+    """
+    A block of measure columns of an academic dataframe, coerced once. The
+    values are held as a (columns x rows) float array so that each column is
+    contiguous, and the "***" and null masks are packed eight rows to a byte
+    with np.packbits. Rows are positional - they match the rows of the frame
+    the Measures were built from (use take() for a subset of the rows).
+
+    Args:
+        values (np.ndarray): (columns x rows) float values
+        suppressed_bits (np.ndarray): packed "***" mask
+        null_bits (np.ndarray): packed null mask
+        columns (list): column names
+        integer (np.ndarray): True for each column that coerced to integers
+    """
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        suppressed_bits: np.ndarray,
+        null_bits: np.ndarray,
+        columns: list,
+        integer: np.ndarray,
+    ) -> None:
+        self.values = values
+        self.suppressed_bits = suppressed_bits
+        self.null_bits = null_bits
+        self.columns = list(columns)
+        self.integer = integer
+        self.num_rows = values.shape[1]
+
+        self._positions = {col: i for i, col in enumerate(self.columns)}
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, columns: list | None = None) -> "Measures":
+        """
+        Coerces the measure columns of a frame. By default these are all of
+        the "Category|Measure" columns.
+
+        Args:
+            frame (pd.DataFrame): academic data
+            columns (list|None): the columns to coerce
+
+        Returns:
+            Measures: the coerced columns
+        """
+        if columns is None:
+            columns = [c for c in frame.columns if "|" in c]
+
+        num_rows = len(frame.index)
+
+        values = np.empty((len(columns), num_rows), dtype=float)
+        suppressed = np.zeros((len(columns), num_rows), dtype=bool)
+        null = np.zeros((len(columns), num_rows), dtype=bool)
+        integer = np.zeros(len(columns), dtype=bool)
+
+        for i, col in enumerate(columns):
+            measure = Measure.from_values(frame[col])
+
+            values[i] = measure.values
+            suppressed[i] = measure.suppressed
+            null[i] = measure.null
+            integer[i] = measure.integer
+
+        return cls(
+            values,
+            np.packbits(suppressed, axis=1),
+            np.packbits(null, axis=1),
+            columns,
+            integer,
+        )
+
+    def __contains__(self, column: str) -> bool:
+        return column in self._positions
+
+    def __getitem__(self, column: str) -> Measure:
+        i = self._positions[column]
+
+        return Measure(
+            self.values[i],
+            np.unpackbits(self.suppressed_bits[i], count=self.num_rows).astype(bool),
+            np.unpackbits(self.null_bits[i], count=self.num_rows).astype(bool),
+            bool(self.integer[i]),
+        )
+
+    def select(self, columns: list) -> Measure:
+        """
+        Gets a block of columns as a 2-D (rows x columns) Measure.
+        """
+        positions = [self._positions[c] for c in columns]
+
+        return Measure(
+            self.values[positions].T,
+            np.unpackbits(
+                self.suppressed_bits[positions], axis=1, count=self.num_rows,
+            ).astype(bool).T,
+            np.unpackbits(
+                self.null_bits[positions], axis=1, count=self.num_rows,
+            ).astype(bool).T,
+            self.integer[positions],
+        )
+
+    def block(self, columns: list) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: the (columns x rows) float values of the columns
+        """
+        return self.values[[self._positions[c] for c in columns]]
+
+    def take(self, rows: np.ndarray) -> "Measures":
+        """
+        Selects a subset of the rows (the integer flags are those of the
+        full columns).
+
+        Args:
+            rows (np.ndarray): a boolean mask or row positions
+
+        Returns:
+            Measures: the selected rows
+        """
+        suppressed = np.unpackbits(
+            self.suppressed_bits, axis=1, count=self.num_rows,
+        ).astype(bool)[:, rows]
+
+        null = np.unpackbits(self.null_bits, axis=1, count=self.num_rows).astype(bool)[
+            :, rows
+        ]
+
+        return Measures(
+            self.values[:, rows],
+            np.packbits(suppressed, axis=1),
+            np.packbits(null, axis=1),
+            self.columns,
+            self.integer,
+        )
+
+
+def select_measures(
+    data: pd.DataFrame, measures: "Measures | None", columns: list,
+) -> Measure:
+    """
+    Gets a block of columns of a frame as a 2-D (rows x columns) Measure,
+    from the precoerced measures if they hold every column, otherwise by
+    coercing the raw columns.
+    """
+    if measures is not None and all(
+        column in measures and column in data.columns for column in columns
+    ):
+        return measures.select(columns)
+
+    return Measure.from_values(data[columns])
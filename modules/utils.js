@@ -313,3 +313,70 @@ function removeItemsByValue(obj, value) {
 function removeObjectWithValue(array, key, value) {
   return array.filter(obj => obj[key] !== value);
 };
+
+
+// convert a columnar response ({columns, values, nulls} - see serialize.py)
+// into the array of row objects of the default response. the keys listed
+// in "nulls" for a row are left out of the row object, as they are in the
+// default response. anything that is not a columnar table (e.g., an empty
+// response) is returned as is
+function fromColumnar(table) {
+  if (!table || Array.isArray(table)) {
+    return table;
+  }
+
+  const { columns, values, nulls } = table;
+  const numRows = columns.length ? values[0].length : 0;
+  const rows = Array.from({ length: numRows }, () => ({}));
+
+  columns.forEach((column, j) => {
+    const columnValues = values[j];
+    const isNull = new Uint8Array(numRows);
+
+    nulls[j].forEach(i => { isNull[i] = 1; });
+
+    for (let i = 0; i < numRows; i++) {
+      if (!isNull[i]) {
+        rows[i][column] = columnValues[i];
+      }
+    }
+  });
+
+  return rows;
+};
+
+
+// the canonical query string of a selection object (keys sorted, arrays
+// joined by commas, and null/undefined values left out), used to GET the
+// data endpoints so that the same selection is always the same url (and
+// can be cached by the browser). the same as canonical_query in app.py
+function canonicalQuery(obj) {
+  return Object.keys(obj)
+    .sort()
+    .filter(k => obj[k] !== null && typeof obj[k] !== "undefined")
+    .map(k => {
+      const value = Array.isArray(obj[k]) ? obj[k].join(",") : obj[k];
+      return encodeURIComponent(k) + "=" +
+        encodeURIComponent(value).replace(/%2C/g, ",");
+    })
+    .join("&");
+};
+
+
+// fetch that retries (up to [retries] times) when the server is too busy
+// to take the request (503), after waiting the number of seconds in its
+// Retry-After header. the data endpoints return 503 when their work pool
+// is full (see work_pool.py)
+async function fetchWithRetry(url, options, retries = 3) {
+  for (let attempt = 0; ; attempt++) {
+    const response = await fetch(url, options);
+
+    if (response.status !== 503 || attempt >= retries) {
+      return response;
+    }
+
+    const seconds = Number(response.headers.get("Retry-After")) || 1;
+
+    await new Promise(resolve => setTimeout(resolve, seconds * 1000));
+  }
+};
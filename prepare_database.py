@@ -0,0 +1,803 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# offline database build steps          #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+# Run from the project root after a new year of data is loaded into the
+# database (the dashboard reads the results, but never writes them):
+#
+#   python prepare_database.py comparisons          # build
+#   python prepare_database.py comparisons --check  # verify
+#   python prepare_database.py indexes              # create indexes & ANALYZE
+#   python prepare_database.py indexes --check      # fail on full table scans
+#   python prepare_database.py attendance           # build
+#   python prepare_database.py attendance --check   # verify
+
+import argparse
+import math
+import random
+import re
+import sys
+from collections.abc import Callable
+
+import pandas as pd
+from calculations import calculate_comparison_school_list
+from sqlalchemy import create_engine, event, text
+
+from load_data import (
+    academic_data_cache,
+    aggregate_attendance,
+    db_path,
+    get_academic_data,
+    get_academic_dropdown_years,
+    get_adm_data,
+    get_ahs_averages,
+    get_available_years,
+    get_comparison_index,
+    get_comparison_list,
+    get_context,
+    get_corporation_academic_data,
+    get_current_academic_year,
+    get_current_demographic_year,
+    get_demographic_data,
+    get_engine,
+    get_geo_corp,
+    get_graduation_data,
+    get_public_dropdown,
+    get_school_coordinates,
+    get_table_years,
+    get_year_over_year_data,
+    resident_tables,
+    run_query,
+)
+
+# build steps write to the database, so they use their own engine
+write_engine = create_engine(f"sqlite:///{db_path}")
+
+type_tabs = ["k8Tab", "hsTab"]
+
+# the number of schools in the lists that /where asks for
+comparison_list_size = 20
+
+comparison_tables = {"K8": "academic_data_k8", "HS": "academic_data_hs"}
+
+attendance_tables = ["academic_data_k8", "academic_data_hs"]
+
+
+def calculate_comparison_lists(max_schools: int) -> list:
+    """
+    Calculates the comparison school list of every school for every year,
+    school type (K8 or HS), and type tab using the same ComparisonIndex
+    that serves /where when a list has not been precomputed.
+
+    Args:
+        max_schools (int): the number of schools in each list (including
+            the selected school)
+
+    Returns:
+        list: (Year, SchoolType, TypeTab, SchoolID, Rank, ComparisonID,
+            ComparisonName) tuples
+    """
+    rows = []
+
+    for school_type, table in comparison_tables.items():
+        for year in get_table_years(table):
+            comparison_index = get_comparison_index(year, school_type)
+            school_ids = list(comparison_index.rows)
+
+            for type_tab in type_tabs:
+                comparison_lists = comparison_index.nearest_many(
+                    school_ids, type_tab, max_schools,
+                )
+
+                for school_id, schools in comparison_lists.items():
+                    rows.extend(
+                        (
+                            year, school_type, type_tab, school_id, rank,
+                            school["School ID"], school["School Name"],
+                        )
+                        for rank, school in enumerate(schools)
+                    )
+
+    return rows
+
+
+def build_comparison_lists(max_schools: int) -> None:
+    """
+    Writes the comparison_lists table. The table is clustered on its
+    primary key, so that the list for a school is a single index range.
+    """
+    rows = calculate_comparison_lists(max_schools)
+
+    with write_engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS comparison_lists"))
+        conn.execute(
+            text(
+                """
+                CREATE TABLE comparison_lists (
+                    Year INTEGER NOT NULL,
+                    SchoolType TEXT NOT NULL,
+                    TypeTab TEXT NOT NULL,
+                    SchoolID INTEGER NOT NULL,
+                    Rank INTEGER NOT NULL,
+                    ComparisonID INTEGER NOT NULL,
+                    ComparisonName TEXT,
+                    PRIMARY KEY (Year, SchoolType, TypeTab, SchoolID, Rank)
+                ) WITHOUT ROWID
+            """,
+            ),
+        )
+        conn.execute(
+            text(
+                """
+                INSERT INTO comparison_lists
+                VALUES (:year, :type, :tab, :id, :rank, :comp_id, :comp_name)
+            """,
+            ),
+            [
+                dict(
+                    zip(
+                        ["year", "type", "tab", "id", "rank", "comp_id", "comp_name"],
+                        row,
+                        strict=True,
+                    ),
+                )
+                for row in rows
+            ],
+        )
+
+    print(f"comparison_lists: {len(rows)} rows written")  # noqa: T201
+
+
+def calculate_reference_list(
+    coordinates: pd.DataFrame, school_id: int, type_tab: str, max_schools: int,
+) -> list | None:
+    """
+    The comparison school list of a school as /where calculated it before
+    the lists were precomputed: schools with fewer than 30 students (or a
+    blank student count) are dropped, unless they are the selected school,
+    and calculate_comparison_school_list() finds the nearest of the rest.
+
+    Args:
+        coordinates (pd.DataFrame): get_school_coordinates() of the year
+        school_id (int): the selected school
+        type_tab (str): the selected type tab (k8Tab or hsTab)
+        max_schools (int): the number of schools in the list
+
+    Returns:
+        list|None: (School ID, School Name) tuples, or None if the previous
+        path could not calculate a list for the school (it raised for a
+        school with a blank student count, and did not handle schools
+        without coordinates)
+    """
+    selected = coordinates[coordinates["School ID"] == school_id]
+
+    if (
+        selected.empty
+        or pd.to_numeric(selected["Total Student Count"], errors="coerce").isna().any()
+        or selected[["Lat", "Lon"]].isna().any(axis=None)
+    ):
+        return None
+
+    schools = coordinates.copy()
+
+    schools["Total Student Count"] = pd.to_numeric(
+        schools["Total Student Count"], errors="coerce",
+    )
+
+    schools = schools.dropna(subset=["Total Student Count"])
+
+    schools = schools[
+        (schools["Total Student Count"].astype(int) >= 30)  # noqa: PLR2004
+        | (schools["School ID"] == school_id)
+    ]
+
+    selections = {"school_id": school_id, "type_tab": type_tab}
+
+    try:
+        comparison_list = calculate_comparison_school_list(
+            selections, schools, max_schools,
+        )
+    except (ValueError, IndexError):
+        return None
+
+    # (a school that does not overlap its own grade span has no list)
+    if isinstance(comparison_list, tuple):
+        return []
+
+    return [(school["School ID"], school["School Name"]) for school in comparison_list]
+
+
+def check_comparison_lists(max_schools: int, sample: int | None = None) -> int:
+    """
+    Compares the stored comparison lists with the lists calculated by the
+    previous /where path (see calculate_reference_list), which does not
+    share any code with ComparisonIndex.
+
+    Args:
+        max_schools (int): the number of schools in each list
+        sample (int|None): only check this many (randomly chosen) schools
+            for each year, school type, and type tab
+
+    Returns:
+        int: the number of (year, type, tab, school) lists that differ
+    """
+    q = text(
+        """
+        SELECT Year, SchoolType, TypeTab, SchoolID, Rank, ComparisonID,
+            ComparisonName
+        FROM comparison_lists
+        WHERE Rank < :max_schools
+    """,
+    )
+
+    with write_engine.connect() as conn:
+        stored = conn.execute(q, {"max_schools": max_schools}).all()
+
+    stored_lists = {}
+
+    for year, school_type, type_tab, school_id, _, comp_id, comp_name in sorted(stored):
+        stored_lists.setdefault((year, school_type, type_tab, school_id), []).append(
+            (comp_id, comp_name),
+        )
+
+    mismatches = []
+    checked = 0
+    skipped = 0
+    rng = random.Random(0)
+
+    for school_type, table in comparison_tables.items():
+        for year in get_table_years(table):
+            coordinates = get_school_coordinates(year, school_type)
+            school_ids = sorted(
+                {int(v) for v in coordinates["School ID"].dropna()},
+            )
+
+            if sample is not None and sample < len(school_ids):
+                school_ids = sorted(rng.sample(school_ids, sample))
+
+            for type_tab in type_tabs:
+                for school_id in school_ids:
+                    key = (year, school_type, type_tab, school_id)
+
+                    reference = calculate_reference_list(
+                        coordinates, school_id, type_tab, max_schools,
+                    )
+
+                    if reference is None:
+                        skipped += 1
+                        continue
+
+                    checked += 1
+
+                    if stored_lists.get(key, []) != reference:
+                        mismatches.append(key)
+
+    for key in mismatches[:20]:
+        print(f"comparison_lists: mismatch for {key}")  # noqa: T201
+
+    print(  # noqa: T201
+        f"comparison_lists: {checked} lists checked against the previous "
+        f"calculation ({skipped} skipped), {len(mismatches)} mismatches",
+    )
+
+    return len(mismatches)
+
+
+def build_corporation_attendance() -> None:
+    """
+    Writes the corporation_attendance table: the attendance of every school
+    corporation by year, aggregated from each academic table.
+    """
+    attendance = {
+        table: calculate_corporation_attendance(table).reset_index()
+        for table in attendance_tables
+    }
+
+    with write_engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS corporation_attendance"))
+        conn.execute(
+            text(
+                """
+                CREATE TABLE corporation_attendance (
+                    AcademicTable TEXT NOT NULL,
+                    CorporationID INTEGER NOT NULL,
+                    Year INTEGER NOT NULL,
+                    StudentsChronicallyAbsent REAL,
+                    TotalStudentCount REAL,
+                    AttendanceRate REAL,
+                    PRIMARY KEY (AcademicTable, CorporationID, Year)
+                ) WITHOUT ROWID
+            """,
+            ),
+        )
+
+        for table in attendance_tables:
+            rows = [
+                {
+                    "table": table,
+                    "corp_id": int(corp_id),
+                    "year": int(year),
+                    **{
+                        key: None if math.isnan(value) else float(value)
+                        for key, value in zip(
+                            ["absent", "students", "rate"], values, strict=True,
+                        )
+                    },
+                }
+                for corp_id, year, *values in attendance[table].itertuples(index=False)
+            ]
+
+            if rows:
+                conn.execute(
+                    text(
+                        """
+                        INSERT INTO corporation_attendance
+                        VALUES (:table, :corp_id, :year, :absent, :students, :rate)
+                    """,
+                    ),
+                    rows,
+                )
+
+        count = conn.execute(
+            text("SELECT COUNT(*) FROM corporation_attendance"),
+        ).scalar()
+
+    print(f"corporation_attendance: {count} rows written")  # noqa: T201
+
+
+def calculate_corporation_attendance(table: str) -> pd.DataFrame:
+    """
+    The attendance of every school corporation by year (see
+    aggregate_attendance), as computed on the fly by get_demographic_data.
+
+    Returns:
+        pd.DataFrame: aggregated attendance indexed by (Corporation ID, Year)
+    """
+    q = text(
+        f"""
+        SELECT CorporationID, Year, AttendanceRate, StudentsChronicallyAbsent,
+            TotalStudentCount
+        FROM {table}
+    """,  # noqa: S608
+    )
+
+    return aggregate_attendance(run_query(q), ["Corporation ID", "Year"])
+
+
+def check_corporation_attendance() -> int:
+    """
+    Compares the stored corporation attendance with the on the fly
+    computation.
+
+    Returns:
+        int: the number of (table, corporation, year) rows that differ
+    """
+    mismatches = 0
+    checked = 0
+
+    for table in attendance_tables:
+        q = text(
+            """
+            SELECT CorporationID, Year, StudentsChronicallyAbsent,
+                TotalStudentCount, AttendanceRate
+            FROM corporation_attendance
+            WHERE AcademicTable = :table
+        """,
+        )
+
+        stored = run_query(q, {"table": table}).set_index(["Corporation ID", "Year"])
+        live = calculate_corporation_attendance(table)
+
+        for key in sorted(set(stored.index) | set(live.index)):
+            checked += 1
+
+            if key not in stored.index or key not in live.index:
+                same = False
+            else:
+                same = all(
+                    (math.isnan(a) and math.isnan(b)) or math.isclose(a, b)
+                    for a, b in zip(
+                        stored.loc[key, live.columns], live.loc[key], strict=True,
+                    )
+                )
+
+            if not same:
+                mismatches += 1
+
+                if mismatches <= 20:
+                    print(f"corporation_attendance: mismatch for {table} {key}")  # noqa: T201
+
+    print(  # noqa: T201
+        f"corporation_attendance: {checked} rows checked, {mismatches} mismatches",
+    )
+
+    return mismatches
+
+
+# the indexes used by the hot queries of the dashboard, which all filter on
+# SchoolID, CorporationID, GEOCorp, or Year. The trailing columns make the
+# indexes covering for the queries that only read them (e.g., the years
+# of data for a school, or the GEO Corp of a school)
+index_columns = {
+    "academic_data_k8": [["SchoolID", "Year", "GEOCorp"], ["CorporationID", "Year"], ["Year"]],
+    "academic_data_hs": [
+        ["SchoolID", "Year", "GEOCorp"], ["CorporationID", "Year"], ["Year"], ["SchoolType"],
+    ],
+    "corporation_data_k8": [["CorporationID", "Year"]],
+    "corporation_data_hs": [["CorporationID", "Year"]],
+    "demographic_data_school": [["SchoolID", "Year"]],
+    "demographic_data_corp": [["CorporationID", "Year"]],
+    "adm_all": [["CorporationID"]],
+    "school_index": [["SchoolID", "GEOCorp"]],
+}
+
+# the load_data functions that query the database, as (name, function,
+# args). They are called with sample ids (see get_sample_ids) and the
+# statements they send are captured from the engine, so the plans checked
+# are those of the sql the dashboard actually runs.
+def get_dashboard_calls(ids: dict) -> tuple[list, list]:
+    """
+    Args:
+        ids (dict): sample ids (see get_sample_ids)
+
+    Returns:
+        list: calls whose queries must not scan a full table
+        list: calls that read every row of a table (not checked)
+    """
+    year = ids["year"]
+    k8, k8_comparison = ids["K8"], ids["K8 comparison"]
+    hs, hs_comparison = ids["HS"], ids["HS comparison"]
+
+    hot_calls = [
+        ("current academic year", get_current_academic_year, (get_engine(),)),
+        ("current demographic year", get_current_demographic_year, (get_engine(),)),
+        *[
+            (f"get_table_years ({table})", get_table_years, (table,))
+            for table in ["academic_data_k8", "academic_data_hs"]
+        ],
+    ]
+
+    for school_type, school_id, comparison_id, type_tab, tabs in [
+        ("K8", k8, k8_comparison, "k8Tab", ["ilearnTab", "ireadTab"]),
+        ("HS", hs, hs_comparison, "hsTab", ["gradTab", "satTab"]),
+    ]:
+        hot_calls += [
+            (f"get_geo_corp ({school_type})", get_geo_corp, (school_id, school_type)),
+            (
+                f"get_school_coordinates ({school_type})",
+                get_school_coordinates,
+                (year, school_type),
+            ),
+            (
+                f"get_academic_dropdown_years ({school_type})",
+                get_academic_dropdown_years,
+                (school_id, school_type),
+            ),
+            (
+                f"get_demographic_data ({school_type})",
+                get_demographic_data,
+                ({"school_id": school_id, "school_type": school_type, "year": year},),
+            ),
+            (
+                f"get_academic_data ({school_type})",
+                get_academic_data,
+                ([school_id, comparison_id], school_type),
+            ),
+            (
+                f"get_comparison_list ({school_type})",
+                get_comparison_list,
+                (year, school_type, school_id, type_tab),
+            ),
+            *[
+                (
+                    f"get_academic_data ({school_type}, {tab})",
+                    get_academic_data,
+                    ([school_id, comparison_id], school_type, tab),
+                )
+                for tab in tabs
+            ],
+            *[
+                (
+                    f"get_available_years ({tab})",
+                    get_available_years,
+                    (school_id, tab),
+                )
+                for tab in tabs
+            ],
+            *[
+                (
+                    f"get_corporation_academic_data ({school_type}, {tab})",
+                    get_corporation_academic_data,
+                    (ids["corp"], school_type, tab),
+                )
+                for tab in [None, *tabs]
+            ],
+        ]
+
+    hot_calls += [
+        ("get_adm_data", get_adm_data, (ids["corp"],)),
+        *[
+            (
+                f"get_year_over_year_data ({category}, {flag or 'k8'})",
+                get_year_over_year_data,
+                (school_id, [comparison_id], category, year, flag),
+            )
+            for school_id, comparison_id, category, flag in [
+                (k8, k8_comparison, "Total|ELA", ""),
+                (k8, k8_comparison, "Total|IREAD", ""),
+                (hs, hs_comparison, "Total|", "grad"),
+                (hs, hs_comparison, "Total|EBRW", "sat"),
+            ]
+        ],
+    ]
+
+    full_scan_calls = [
+        ("get_public_dropdown", get_public_dropdown, ()),
+        # SchoolType has only a few values, so depending on the statistics
+        # from ANALYZE the planner may prefer a scan to the SchoolType index
+        ("get_ahs_averages", get_ahs_averages, ()),
+        ("get_graduation_data", get_graduation_data, ()),
+    ]
+
+    return hot_calls, full_scan_calls
+
+
+def get_sample_ids() -> dict:
+    """
+    Two K8 and two HS schools with data in the current academic year, and
+    the corporation of the first K8 school, used to call the dashboard
+    query functions.
+
+    Returns:
+        dict: sample ids (as strings, like the dashboard passes them)
+    """
+    year = get_context().current_academic_year
+
+    ids = {"year": str(year)}
+
+    with get_engine().connect() as conn:
+        for school_type, table in comparison_tables.items():
+            schools = conn.execute(
+                text(
+                    f"SELECT SchoolID, GEOCorp FROM {table} "  # noqa: S608
+                    "WHERE Year = :year ORDER BY SchoolID LIMIT 2",
+                ),
+                {"year": year},
+            ).all()
+
+            ids[school_type] = str(schools[0][0])
+            ids[f"{school_type} comparison"] = str(schools[-1][0])
+
+            if school_type == "K8":
+                ids["corp"] = str(schools[0][1])
+
+    return ids
+
+
+def capture_queries(func: Callable, *args: object) -> list:
+    """
+    Calls func(*args) and records the statements it sends to the database.
+
+    Returns:
+        list: (statement, parameters) of every SELECT statement
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany) -> None:  # noqa: ANN001, ARG001, PLR0913
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    engine = get_engine()
+
+    event.listen(engine, "before_cursor_execute", record)
+
+    try:
+        func(*args)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    return statements
+
+
+# a plan step that reads a table without an index ("SCAN table", as opposed
+# to "SEARCH table USING INDEX ..." or "SCAN table USING COVERING INDEX ...")
+full_scan = re.compile(r"^SCAN (\w+)$")
+
+
+def get_schema(conn) -> dict:  # noqa: ANN001
+    """
+    Returns:
+        dict: table name -> set of column names
+    """
+    tables = conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'table'"),
+    ).scalars().all()
+
+    return {
+        table: {c[1] for c in conn.execute(text(f'PRAGMA table_info("{table}")'))}
+        for table in tables
+    }
+
+
+def create_indexes() -> None:
+    """
+    Creates the indexes in index_columns for the tables and columns that
+    exist in the database, then runs ANALYZE so that the query planner has
+    statistics for them.
+    """
+    with write_engine.begin() as conn:
+        schema = get_schema(conn)
+
+        for table, indexes in index_columns.items():
+            if table not in schema:
+                print(f"indexes: skipping {table} (table does not exist)")  # noqa: T201
+                continue
+
+            for columns in indexes:
+                missing = [c for c in columns if c not in schema[table]]
+
+                if missing:
+                    print(f"indexes: skipping {table} {columns} (missing {missing})")  # noqa: T201
+                    continue
+
+                name = f"idx_{table}_{'_'.join(columns)}"
+                column_list = ", ".join(f'"{c}"' for c in columns)
+
+                conn.execute(
+                    text(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({column_list})'),
+                )
+
+                print(f"indexes: {name}")  # noqa: T201
+
+        conn.execute(text("ANALYZE"))
+
+    print("indexes: ANALYZE complete")  # noqa: T201
+
+
+def explain_queries() -> int:
+    """
+    Prints the EXPLAIN QUERY PLAN of every query the dashboard issues (see
+    get_dashboard_calls).
+
+    Returns:
+        int: the number of hot calls with a query that scans a full table
+    """
+    # the plans are of the sql path, so nothing is served from memory
+    get_context()
+    resident_tables.clear()
+    academic_data_cache.clear()
+
+    hot_calls, full_scan_calls = get_dashboard_calls(get_sample_ids())
+
+    full_scans = 0
+
+    for calls, allow_full_scan in [(hot_calls, False), (full_scan_calls, True)]:
+        for name, func, args in calls:
+            plans = []
+
+            for statement, parameters in capture_queries(func, *args):
+                with get_engine().connect() as conn:
+                    plan = [
+                        row[-1]
+                        for row in conn.exec_driver_sql(
+                            "EXPLAIN QUERY PLAN " + statement, parameters,
+                        )
+                    ]
+
+                # (common table expressions are not tables, and the schema
+                # table is read for the table names)
+                not_tables = {"sqlite_master", *re.findall(r"(\w+) AS \(", statement)}
+
+                scans = [
+                    step
+                    for step in plan
+                    if full_scan.match(step)
+                    and full_scan.match(step).group(1) not in not_tables
+                ]
+
+                plans.append((plan, scans))
+
+            scanned = any(scans for _, scans in plans)
+
+            if scanned and not allow_full_scan:
+                full_scans += 1
+                status = "FULL TABLE SCAN"
+            elif scanned:
+                status = "full table scan (expected)"
+            else:
+                status = "ok"
+
+            print(f"\n{name}: {status} ({len(plans)} queries)")  # noqa: T201
+
+            for plan, _ in plans:
+                for step in plan:
+                    print(f"    {step}")  # noqa: T201
+
+    print(f"\nindexes: {full_scans} hot calls scan a full table")  # noqa: T201
+
+    return full_scans
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Offline build steps for the dashboard database.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    comparisons = subparsers.add_parser(
+        "comparisons",
+        help="precompute the comparison school list of every school",
+    )
+    comparisons.add_argument(
+        "--max-schools",
+        type=int,
+        default=comparison_list_size,
+        help=f"schools in each list (a build needs at least {comparison_list_size}, "
+        "the number /where asks for)",
+    )
+    comparisons.add_argument(
+        "--check",
+        action="store_true",
+        help="compare the stored lists with the previous /where calculation",
+    )
+    comparisons.add_argument(
+        "--sample",
+        type=int,
+        help="with --check, only check this many schools per year, type, and tab",
+    )
+
+    indexes = subparsers.add_parser(
+        "indexes",
+        help="create the indexes used by the dashboard queries and ANALYZE",
+    )
+    indexes.add_argument(
+        "--check",
+        action="store_true",
+        help="only print the query plans (exits 1 if a hot query scans a full table)",
+    )
+
+    attendance = subparsers.add_parser(
+        "attendance",
+        help="precompute the attendance of every school corporation",
+    )
+    attendance.add_argument(
+        "--check",
+        action="store_true",
+        help="compare the stored attendance with the on the fly computation",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "comparisons":
+        if args.check:
+            return 1 if check_comparison_lists(args.max_schools, args.sample) else 0
+
+        if args.max_schools < comparison_list_size:
+            parser.error(
+                f"--max-schools must be at least {comparison_list_size} (shorter "
+                "lists cannot serve /where)",
+            )
+
+        build_comparison_lists(args.max_schools)
+
+    elif args.command == "indexes":
+        if not args.check:
+            create_indexes()
+
+        return 1 if explain_queries() else 0
+
+    elif args.command == "attendance":
+        if args.check:
+            return 1 if check_corporation_attendance() else 0
+
+        build_corporation_attendance()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
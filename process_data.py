@@ -6,6 +6,8 @@
 # version:  0.9  # noqa: ERA001
 # date:     02/21/24
 
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 from calculations import (
@@ -16,12 +18,14 @@ from calculations import (
     recalculate_total_proficiency,
 )
 from load_data import (
+    academic_tab_check_measures,
     get_adm_data,
     get_ahs_averages,
     get_corporation_academic_data,
     get_excluded_years,
     # get_graduation_data,
 )
+from measures import Measures
 
 
 def reorder_columns(data: pd.DataFrame, match_cols: list) -> list:
@@ -48,8 +52,69 @@ def reorder_columns(data: pd.DataFrame, match_cols: list) -> list:
     return final_cols
 
 
+def get_category_key(category: str, keys: set) -> str | None:
+    """
+    Finds the longest key in a set of keys that a category name starts with,
+    where the match ends on a word boundary (e.g., "Total|ELA Proficient %"
+    -> "Total|ELA"). Only one set lookup per word in the category is needed.
+
+    Args:
+        category (str): a category name
+        keys (set): a set of category keys
+
+    Returns:
+        str|None: the matching key or None if there is no match
+    """
+    words = str(category).split(" ")
+
+    for i in range(len(words), 0, -1):
+        candidate = " ".join(words[:i])
+
+        if candidate in keys:
+            return candidate
+
+    return None
+
+
+@lru_cache(maxsize=64)
+def get_tested_column_groups(columns: tuple, school_type: str) -> tuple:
+    """
+    Maps each "Total Tested", "Test N" (K8), or "Cohort Count" (HS/AHS)
+    column to every column that shares its Category prefix. The columns of
+    an academic frame only depend on the school type (and the tab), so the
+    map is built once per schema.
+
+    Args:
+        columns (tuple): the columns of the academic data
+        school_type (str): the school type
+
+    Returns:
+        tuple: the tested columns and, for each tested column, the columns
+            that are dropped if there are no tested students
+    """
+    count_string = " Test N" if school_type == "K8" else "|Cohort Count"
+
+    tested_cols = []
+    matching_cols = []
+
+    for col in columns:
+        if "Total Tested" in col:
+            match_string = " Total Tested"
+        elif count_string.strip(" |") in col:
+            match_string = count_string
+        else:
+            continue
+
+        prefix = col.split(match_string)[0]
+
+        tested_cols.append(col)
+        matching_cols.append(tuple(c for c in columns if c.startswith(prefix)))
+
+    return tuple(tested_cols), tuple(matching_cols)
+
+
 def check_total_tested(
-    df: pd.DataFrame, school_id: str, school_type: str,
+    df: pd.DataFrame, school_id: str, school_type: str, measures: Measures | None = None,
 ) -> pd.DataFrame:
     """
     Drop all columns for a Category if the value of "Total Tested" for
@@ -60,53 +125,40 @@ def check_total_tested(
     raw_df (pd.DataFrame): academic data
     school_id (str): the SchoolID
     school_type (str): the school type
+    measures (Measures|None): the coerced measure columns of raw_df
 
     Returns:
         data (pd.DataFrame): df with null/0 categories removed
     """
-    drop_columns = []
-
     data = df.copy()
 
     # School ID and school_id should both be type str
     data["School ID"] = data["School ID"].astype("Int64").astype("str")
     data["Corporation ID"] = data["Corporation ID"].astype("Int64").astype("str")
 
-    if school_type == "K8":
-        tested_cols = [
-            col
-            for col in data.columns.to_list()
-            if "Total Tested" in col or "Test N" in col
-        ]
-    else:
-        tested_cols = [
-            col
-            for col in data.columns.to_list()
-            if "Total Tested" in col or "Cohort Count" in col
-        ]
+    tested_cols, matching_cols = get_tested_column_groups(
+        tuple(data.columns), school_type,
+    )
 
-    for col in tested_cols:
-        if (
-            pd.to_numeric(
-                data[data["School ID"] == str(school_id)][col], errors="coerce",
-            ).sum()
-            == 0
-            or data[data["School ID"] == str(school_id)][col].isnull().all()
-        ):
-            if "Total Tested" in col:
-                match_string = " Total Tested"
-            else:
-                match_string = " Test N" if school_type == "K8" else "|Cohort Count"
-
-            matching_cols = data.columns[
-                pd.Series(data.columns).str.startswith(col.split(match_string)[0])
-            ]
+    # a sum of 0 means every value for the school is 0, null, or suppressed
+    school_rows = (data["School ID"] == str(school_id)).to_numpy()
 
-            drop_columns.append(matching_cols.tolist())
+    if measures is not None and all(col in measures for col in tested_cols):
+        tested = measures.block(list(tested_cols))[:, school_rows]
+        no_tested = np.nansum(tested, axis=1) == 0
+    else:
+        tested = data.loc[school_rows, list(tested_cols)]
+        tested = tested.apply(pd.to_numeric, errors="coerce")
+        no_tested = (tested.sum(axis=0) == 0).to_numpy()
 
-    drop_all = [i for sub_list in drop_columns for i in sub_list]
+    drop_all = {
+        col
+        for cols, drop in zip(matching_cols, no_tested, strict=True)
+        if drop
+        for col in cols
+    }
 
-    data = data.drop(drop_all, axis=1).copy()
+    data = data.drop(list(drop_all), axis=1)
 
     return data.reset_index(drop=True)
 
@@ -218,14 +270,14 @@ def transpose_data(raw_df: pd.DataFrame, school_type: str) -> pd.DataFrame:
         filter_cols = r"^Category|CCR Percentage|Grade 12\|Graduation Rate|Total\|Graduation Rate|ADM Average|Graduation to Enrollment\|Graduation Rate|Benchmark \%|Below|Approaching|At|^Year$"  # noqa: E501
         substring_dict = {
             " Total Tested": "",
-            r"|Cohort Count": r"|Graduation",
-            r"|Count": "",
+            "|Cohort Count": "|Graduation",
+            "|Count": "",
         }
 
     elif school_type == "HS":
         tested_cols = r"Total Tested|Cohort Count|Year"
         filter_cols = r"^Category|Graduation Rate$|AHS|Pass Rate$|Benchmark %|Below|Approaching|At|^Year$"  # noqa: E501
-        substring_dict = {r" Total Tested": "", r"|Cohort Count": r"|Graduation"}
+        substring_dict = {" Total Tested": "", "|Cohort Count": "|Graduation"}
 
     else:
         tested_cols = "Total Tested|Test N|Year"
@@ -233,10 +285,10 @@ def transpose_data(raw_df: pd.DataFrame, school_type: str) -> pd.DataFrame:
         substring_dict = {" Total Tested": "", " Test N": ""}
 
     # We get proficiency and cohort/tested (N-Size) data in separate dataframes,
-    # convert the n-size category names into a substring of the data category
-    # names and then merge the two dataframes based on a substring match
+    # convert the n-size category names into a key that is a prefix of the data
+    # category names and then join the two dataframes on that key
     # e.g., use the substring dict to convert "Graduation to Enrollment|Cohort Count" to
-    # the substring "Graduation to Enrollment|Graduation" which matches
+    # the key "Graduation to Enrollment|Graduation" which is a prefix of
     # "Graduation to Enrollment|Graduation Rate"
     df.columns = df.columns.astype(str)
 
@@ -262,11 +314,14 @@ def transpose_data(raw_df: pd.DataFrame, school_type: str) -> pd.DataFrame:
     if tested_data.empty:
         return tested_data
 
-    # add new column with substring values and drop the original
-    # Category column
-    tested_data["Substring"] = tested_data["Category"].replace(
-        substring_dict, regex=True,
-    )
+    # add new column with the key values and drop the original
+    # Category column (the substring dict keys are literal strings)
+    tested_data["Substring"] = tested_data["Category"]
+
+    for substring, replacement in substring_dict.items():
+        tested_data["Substring"] = tested_data["Substring"].str.replace(
+            substring, replacement, regex=False,
+        )
 
     tested_data = tested_data.drop("Category", axis=1)
 
@@ -295,33 +350,24 @@ def transpose_data(raw_df: pd.DataFrame, school_type: str) -> pd.DataFrame:
 
     proficiency_data = proficiency_data.fillna(value=np.nan)
 
-    # Merge Total Tested DF with Proficiency DF based on substring match
-    # NOTE: the cross-merge and substring match process takes about .3s,
-    # is there a faster way?
-    merged_data = proficiency_data.merge(tested_data, how="cross")
-
-    # Need to temporarily rename "English Learner" because otherwise merge
-    # will match both "English" and "Non English"
-    merged_data = merged_data.replace(
-        {
-            "Non English Learners": "Temp1",
-            "English Learners": "Temp2",
-        },
-        regex=True,
+    # Join Total Tested DF with Proficiency DF on the key. The key for a
+    # proficiency category is the longest n-size key that the category starts
+    # with (ending on a word boundary), e.g. "Grade 3|ELA Proficient %" ->
+    # "Grade 3|ELA". Using the longest prefix rather than any substring means
+    # "Non English Language Learners|ELA" does not also match "English Language
+    # Learners|ELA". (This is intended to differ from the previous substring
+    # match, as is the HS/AHS output - see tests/test_transpose_data.py.)
+    tested_keys = set(tested_data["Substring"])
+
+    proficiency_data["Substring"] = proficiency_data["Category"].map(
+        lambda category: get_category_key(category, tested_keys),
     )
 
-    merged_data = merged_data[
-        [a in b for a, b in zip(merged_data["Substring"], merged_data["Category"],
-            strict=False)]
-    ]
+    # a left merge of the rows with a key keeps the rows in proficiency order,
+    # the order of the cross-merge
+    proficiency_data = proficiency_data[proficiency_data["Substring"].notna()]
 
-    merged_data = merged_data.replace(
-        {
-            "Temp1": "Non English Learners",
-            "Temp2": "English Learners",
-        },
-        regex=True,
-    )
+    merged_data = proficiency_data.merge(tested_data, on="Substring", how="left")
 
     merged_data = merged_data.drop("Substring", axis=1)
     merged_data = merged_data.reset_index(drop=True)
@@ -343,7 +389,12 @@ def transpose_data(raw_df: pd.DataFrame, school_type: str) -> pd.DataFrame:
 
 
 def clean_academic_data(
-    df: pd.DataFrame, school_list: list, school_type: str, year: str, location: str,
+    df: pd.DataFrame,
+    school_list: list,
+    school_type: str,
+    year: str,
+    location: str,
+    tab: str | None = None,
 ) -> pd.DataFrame:
     """
     A big chonky function that takes raw academic data and processes it in
@@ -354,6 +405,8 @@ def clean_academic_data(
         school_list (list): list of school(s)
         school_type (str): school type
         year (str): selected year
+        tab (str|None): selected category tab (the corporation data is read
+            with the same columns as df)
 
     Returns:
         data (pd.DataFrame): processed dataframe
@@ -385,7 +438,7 @@ def clean_academic_data(
             raw_ahs_data = get_ahs_averages()
             corp_data = calculate_ahs_average(raw_ahs_data)
         else:
-            corp_data = get_corporation_academic_data(corp_id, school_type)
+            corp_data = get_corporation_academic_data(corp_id, school_type, tab)
 
         # add columns not in corp database
         corp_data["School ID"] = corp_data["Corporation ID"]
@@ -425,7 +478,20 @@ def clean_academic_data(
             list(school_data.filter(regex="ELA and Math")), axis=1,
         )
 
-    data = check_total_tested(school_data, school_id, school_type)
+    # the measure columns are coerced once here and shared by the checks and
+    # calculations below (the rows stay aligned with school_data)
+    measures = Measures.from_frame(school_data)
+
+    data = check_total_tested(school_data, school_id, school_type, measures)
+
+    # the columns read for the tab only because the check keys on them
+    check_measures = academic_tab_check_measures.get(tab, [])
+
+    if check_measures:
+        data = data.drop(
+            [c for c in data.columns if c.partition("|")[2] in check_measures],
+            axis=1,
+        )
 
     # HS/AHS data
     if school_type == "HS" or school_type == "AHS":
@@ -433,11 +499,11 @@ def clean_academic_data(
 
         # In Cohort Grad Rate
         if "Total|Cohort Count" in processed_data.columns:
-            processed_data = calculate_graduation_rate(processed_data)
+            processed_data = calculate_graduation_rate(processed_data, measures)
 
         # SAT Benchmark proficiency
         if "Total|EBRW Total Tested" in processed_data.columns:
-            processed_data = calculate_sat_rate(processed_data)
+            processed_data = calculate_sat_rate(processed_data, measures)
 
         # AHS only data
         if school_type == "AHS":
@@ -553,21 +619,23 @@ def clean_academic_data(
     elif school_type == "K8":
         processed_data = data.copy()
 
-        processed_data = calculate_proficiency(processed_data)
+        processed_data = calculate_proficiency(processed_data, measures)
 
         # In order for an apples to apples comparison between School Total Proficiency,
         # we need to recalculate it for the comparison schools using the same grade span
         # as the selected school. E.g., school is k-5, comparison school is k-8, we
         # recalculate comparison school totals using only grade k-5 data.
-        comparison_data = processed_data.loc[
-            processed_data["School ID"] != school_id
-        ].copy()
+        comparison_rows = (processed_data["School ID"] != school_id).to_numpy()
+
+        comparison_data = processed_data.loc[comparison_rows].copy()
 
         school_data = processed_data.loc[
             processed_data["School ID"] == school_id
         ].copy()
 
-        revised_totals = recalculate_total_proficiency(comparison_data, school_data)
+        revised_totals = recalculate_total_proficiency(
+            comparison_data, school_data, measures.take(comparison_rows),
+        )
 
         processed_data = processed_data.set_index(["School ID", "Year"])
         processed_data.update(revised_totals.set_index(["School ID", "Year"]))
@@ -634,9 +702,6 @@ def clean_academic_data(
                     analysis_data["School ID"] == str(school_id)
                 ].tolist()[0]
 
-                filename99 = "analysis_data.csv"
-                analysis_data.to_csv(filename99, index=False)
-
                 # for col in hs_cols:
                 #     analysis_data[col] = pd.to_numeric(
                 #         analysis_data[col], errors="coerce",
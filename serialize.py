@@ -0,0 +1,154 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# json serialization                    #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+# Dataframes are sent to the frontend as a list of row objects without the
+# null values of the row. Rather than df.to_dict(orient="records") followed
+# by a comprehension over every value, the records are built from arrays of
+# the whole frame: the values are converted to python objects in one call,
+# the null mask is computed for the whole frame at once, and the rows are
+# zipped (and filtered) at C speed by itertools.compress.
+#
+# The columnar format (opt in, see to_columns) sends each column name once,
+# instead of once per row.
+#
+# The records are encoded with orjson if it is installed (it is optional -
+# see requirements.txt), and with the standard library json module
+# otherwise. Either way keys are sorted, as they are by Flask's JSON
+# provider.
+
+import json
+from itertools import compress
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def to_records(df: pd.DataFrame) -> list:
+    """
+    Converts a dataframe to a list of dicts (one per row) without the null
+    (NaN/None) values of each row. Equivalent to:
+
+        [
+            {k: v for k, v in m.items() if v == v and v is not None}
+            for m in df.to_dict(orient="records")
+        ]
+
+    except that infinite values (e.g., a percentage of 0 tested) are kept
+    as None, because they cannot be encoded as valid json.
+
+    Args:
+        df (pd.DataFrame): data
+
+    Returns:
+        list: row records
+    """
+    if df.columns.has_duplicates:
+        msg = "to_records requires unique column names"
+        raise ValueError(msg)
+
+    columns = df.columns.tolist()
+
+    if not columns:
+        return [{} for _ in range(len(df.index))]
+
+    # numeric columns are converted to python numbers by the object array
+    values = df.to_numpy(dtype=object)
+
+    infinite = df.isin([np.inf, -np.inf]).to_numpy()
+
+    if infinite.any():
+        values[infinite] = None
+
+    valid = df.notna().to_numpy()
+
+    records = []
+
+    for row, row_valid in zip(values.tolist(), valid.tolist(), strict=True):
+        if all(row_valid):
+            records.append(dict(zip(columns, row, strict=True)))
+        else:
+            records.append(
+                dict(zip(compress(columns, row_valid), compress(row, row_valid))),
+            )
+
+    return records
+
+
+def to_columns(df: pd.DataFrame) -> dict:
+    """
+    Converts a dataframe to the columnar response format: the column names
+    (sorted, the same key order as the records), and for each column its
+    values (aligned by row) and the positions of the rows where the value
+    is null (the keys to_records() leaves out of the row). Infinite values
+    are None, as they are in to_records(), but are not in the null rows.
+
+    Args:
+        df (pd.DataFrame): data
+
+    Returns:
+        dict: {"columns": [...], "values": [[...], ...], "nulls": [[...], ...]}
+    """
+    if df.columns.has_duplicates:
+        msg = "to_columns requires unique column names"
+        raise ValueError(msg)
+
+    data = df[sorted(df.columns)]
+
+    values = data.to_numpy(dtype=object)
+
+    valid = data.notna().to_numpy()
+
+    values[~valid | data.isin([np.inf, -np.inf]).to_numpy()] = None
+
+    return {
+        "columns": data.columns.tolist(),
+        "values": values.T.tolist(),
+        "nulls": [np.flatnonzero(~column).tolist() for column in valid.T],
+    }
+
+
+def default(value: object) -> object:
+    """
+    Fallback for values the json encoders do not handle.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+
+    msg = f"Object of type {type(value).__name__} is not JSON serializable"
+    raise TypeError(msg)
+
+
+def dumps(data: object) -> bytes:
+    """
+    Encodes data (e.g., the output of to_records()) as json, with sorted
+    keys.
+
+    Args:
+        data (object): json serializable data
+
+    Returns:
+        bytes: utf-8 json
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            default=default,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+        )
+
+    return json.dumps(
+        data, default=default, sort_keys=True, separators=(",", ":"),
+    ).encode()
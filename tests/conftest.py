@@ -0,0 +1,273 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# tests: shared fixtures                #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+# A small database with the tables and columns the dashboard queries (a
+# few corporations, K8 and HS schools, and years of random data), for tests
+# that need to run the load_data functions against sqlite.
+
+import random
+import shutil
+import sqlite3
+from collections.abc import Iterator
+from pathlib import Path
+
+import load_data
+import pytest
+
+years = [2022, 2023, 2024]
+
+categories = [
+    "Total", "Grade3", "Grade4", "Grade5", "Grade6", "Grade7", "Grade8",
+    "Black", "White", "PaidMeals", "EnglishLanguageLearners",
+    "NonEnglishLanguageLearners",
+]
+
+k8_measures = [
+    f"{category}|{measure}"
+    for category in categories
+    for measure in [
+        "ELATotalTested", "ELATotalProficient", "MathTotalTested",
+        "MathTotalProficient", "IREADTestN", "IREADPassN",
+    ]
+]
+
+hs_measures = [
+    f"{category}|{measure}"
+    for category in ["Total", *categories[7:]]
+    for measure in [
+        *[
+            f"{subject}{measure}"
+            for subject in ["EBRW", "Math"]
+            for measure in [
+                "TotalTested", "AtBenchmark", "BelowBenchmark",
+                "ApproachingBenchmark",
+            ]
+        ],
+        "CohortCount", "Graduates",
+    ]
+]
+
+ahs_columns = ["AHS|CCR", "AHS|ActualGraduates", "AHS|ActualEnrollment"]
+
+demographic_columns = [f"Grade{g}" for g in range(3, 13)] + categories[7:]
+
+
+# the declared types of the real database (the other columns have none)
+column_types = {
+    "Year": "INTEGER",
+    "SchoolID": "INTEGER",
+    "CorporationID": "INTEGER",
+    "GEOCorp": "INTEGER",
+    "Lat": "REAL",
+    "Lon": "REAL",
+    "SchoolName": "TEXT",
+    "CorporationName": "TEXT",
+    "SchoolType": "TEXT",
+    "LowGrade": "TEXT",
+    "HighGrade": "TEXT",
+}
+
+
+def create_table(conn: sqlite3.Connection, table: str, rows: list) -> None:
+    columns = list(rows[0])
+    column_list = ", ".join(f'"{c}" {column_types.get(c, "")}' for c in columns)
+
+    conn.execute(f"CREATE TABLE {table} ({column_list})")
+    conn.executemany(
+        f"INSERT INTO {table} VALUES ({', '.join('?' for _ in columns)})",  # noqa: S608
+        [[row[c] for c in columns] for row in rows],
+    )
+
+
+def build_database(path: Path) -> None:
+    """
+    Writes the test database to path.
+    """
+    rng = random.Random(7)
+
+    def value(n: int) -> object:
+        # suppressed and missing values, as in the real data
+        r = rng.random()
+        return "***" if r < 0.08 else None if r < 0.14 else n  # noqa: PLR2004
+
+    corps = [(1000 + i, f"Corp {i}") for i in range(3)]
+
+    # (id, name, corp, low grade, high grade, type)
+    k8_schools = []
+    hs_schools = []
+
+    for corp_id, _ in corps:
+        for _ in range(4):
+            school_id = 2000 + len(k8_schools)
+            k8_schools.append((school_id, f"School {school_id}", corp_id, "KG", "8", "K8"))
+
+        for school_type in ["HS", "AHS"] if corp_id == corps[0][0] else ["HS"]:
+            school_id = 3000 + len(hs_schools)
+            hs_schools.append((school_id, f"High {school_id}", corp_id, "9", "12", school_type))
+
+    def school_rows(schools: list, measures: list, extra: list) -> list:
+        return [
+            {
+                "Year": year,
+                "SchoolID": school[0],
+                "SchoolName": school[1],
+                "CorporationID": school[2],
+                "CorporationName": f"Corp {school[2] - 1000}",
+                "GEOCorp": school[2],
+                "LowGrade": school[3],
+                "HighGrade": school[4],
+                "SchoolType": school[5],
+                "Lat": 39 + rng.random(),
+                "Lon": -87 + rng.random(),
+                "TotalStudentCount": rng.randint(100, 800),
+                "AttendanceRate": value(round(rng.random(), 3)),
+                "StudentsChronicallyAbsent": value(rng.randint(0, 80)),
+                **{column: rng.randint(1, 60) for column in extra},
+                **{column: value(rng.randint(0, 200)) for column in measures},
+            }
+            for school in schools
+            for year in years
+        ]
+
+    def corp_rows(measures: list, low: str, high: str) -> list:
+        return [
+            {
+                "Year": year,
+                "CorporationID": corp_id,
+                "CorporationName": corp_name,
+                "LowGrade": low,
+                "HighGrade": high,
+                **{column: value(rng.randint(0, 900)) for column in measures},
+            }
+            for corp_id, corp_name in corps
+            for year in years
+        ]
+
+    conn = sqlite3.connect(path)
+
+    create_table(conn, "academic_data_k8", school_rows(k8_schools, k8_measures, []))
+    create_table(
+        conn, "academic_data_hs", school_rows(hs_schools, hs_measures, ahs_columns),
+    )
+    create_table(conn, "corporation_data_k8", corp_rows(k8_measures, "KG", "8"))
+    create_table(conn, "corporation_data_hs", corp_rows(hs_measures, "9", "12"))
+
+    create_table(
+        conn,
+        "demographic_data_school",
+        [
+            {
+                "Year": year,
+                "CorporationID": school[2],
+                "CorporationName": f"Corp {school[2] - 1000}",
+                "SchoolID": school[0],
+                "SchoolName": school[1],
+                **{
+                    column: rng.randint(10, 90)
+                    if not column.startswith("Grade")
+                    or (int(column[5:]) >= 9) == (school[3] == "9")  # noqa: PLR2004
+                    else 0
+                    for column in demographic_columns
+                },
+            }
+            for school in k8_schools + hs_schools
+            for year in years
+        ],
+    )
+    create_table(
+        conn,
+        "demographic_data_corp",
+        [
+            {
+                "Year": year,
+                "CorporationID": corp_id,
+                "CorporationName": corp_name,
+                **{column: rng.randint(100, 900) for column in demographic_columns},
+            }
+            for corp_id, corp_name in corps
+            for year in years
+        ],
+    )
+    create_table(
+        conn,
+        "adm_all",
+        [
+            {
+                "CorporationID": corp_id,
+                "CorporationName": corp_name,
+                **{
+                    f"{year}{adm}ADM": rng.randint(50, 100)
+                    for year in years
+                    for adm in ["Fall", "Spring"]
+                },
+            }
+            for corp_id, corp_name in corps
+        ],
+    )
+    create_table(
+        conn,
+        "school_index",
+        [
+            {"SchoolID": school[0], "GEOCorp": school[2]}
+            for school in k8_schools + hs_schools
+        ],
+    )
+
+    conn.commit()
+    conn.close()
+
+
+def reset_data_context() -> None:
+    """
+    Drops the data context and every cache, so the next load_data call
+    reads the database in the current directory.
+    """
+    if load_data.data_context is not None:
+        load_data.data_context.engine.dispose()
+
+    load_data.data_context = None
+    load_data.resident_tables.clear()
+    load_data.table_columns.clear()
+    load_data.academic_data_cache.clear()
+    load_data.comparison_indexes.clear()
+    load_data.database_tables.clear()
+    load_data.tab_columns.clear()
+
+
+@pytest.fixture(scope="session")
+def database_template(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    path = tmp_path_factory.mktemp("template") / "indiana_schools_public.db"
+
+    build_database(path)
+
+    return path
+
+
+@pytest.fixture
+def database(
+    database_template: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[Path]:
+    """
+    A fresh copy of the test database at load_data.db_path, relative to a
+    temporary working directory (build steps write to it).
+
+    Yields:
+        Path: the database file
+    """
+    path = tmp_path / load_data.db_path
+    path.parent.mkdir(parents=True)
+    shutil.copy(database_template, path)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(load_data, "use_resident_data", False)
+
+    reset_data_context()
+
+    yield path
+
+    reset_data_context()
@@ -0,0 +1,96 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# tests: app                            #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+import sqlite3
+from pathlib import Path
+
+import load_data
+import pytest
+from app import app
+
+selections = {
+    "school_id": "2000",
+    "school_type": "K8",
+    "school_subtype": "K8",
+    "year": "2024",
+    "type_tab": "k8Tab",
+    "k8_tab": "ilearnTab",
+    "hs_tab": "gradTab",
+}
+
+
+@pytest.mark.parametrize("route", ["/academic", "/school"])
+def test_comparison_schools_are_optional(database: Path, route: str) -> None:  # noqa: ARG001
+    client = app.test_client()
+
+    for page_tab in ["infoTab", "analysisTab"]:
+        response = client.get(route, query_string={**selections, "page_tab": page_tab})
+
+        assert response.status_code == 200  # noqa: PLR2004
+
+        response = client.post(route, json={**selections, "page_tab": page_tab})
+
+        assert response.status_code == 200  # noqa: PLR2004
+
+
+def academic_records(client, selections: dict) -> dict:  # noqa: ANN001
+    response = client.get("/academic", query_string=selections)
+
+    assert response.status_code == 200  # noqa: PLR2004
+
+    return {
+        (record["School ID"], record["Year"]): record
+        for record in (response.get_json() or [[]])[0]
+    }
+
+
+@pytest.mark.parametrize("category", ["Black", "Total"])
+def test_sat_tab_projection_matches_all_columns(
+    database: Path, monkeypatch: pytest.MonkeyPatch, category: str,
+) -> None:
+    # a null cohort count drops every column of the category for the school
+    # (for Total, also "Total Student Count"), so the projected read of the
+    # SAT tab needs the cohort counts as well
+    with sqlite3.connect(database) as conn:
+        conn.execute(
+            f'UPDATE academic_data_hs SET "{category}|CohortCount" = NULL '  # noqa: S608
+            "WHERE SchoolID = 3000",
+        )
+
+    hs_selections = {
+        **selections,
+        "school_id": "3000",
+        "school_type": "HS",
+        "school_subtype": "HS",
+        "type_tab": "hsTab",
+        "hs_tab": "satTab",
+        "page_tab": "analysisTab",
+        "comparison_schools": "3002,3003",
+    }
+
+    client = app.test_client()
+
+    projected = academic_records(client, hs_selections)
+
+    # every column
+    monkeypatch.setattr(load_data, "academic_tab_measures", {})
+    load_data.academic_data_cache.clear()
+
+    full = academic_records(client, hs_selections)
+
+    assert projected.keys() == full.keys()
+
+    for key, record in full.items():
+        # the graduation columns are not read for the SAT tab
+        expected = {
+            column: value
+            for column, value in record.items()
+            if not column.endswith(("|Graduates", "|Graduation Rate"))
+        }
+
+        assert projected[key] == expected, key
@@ -0,0 +1,208 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# tests: calculation kernels            #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+# calculate_percentage, calculate_difference, and calculate_year_over_year
+# coerce their inputs once (see measures.Measure) and work on 1-D columns or
+# 2-D blocks. They must return exactly what the per-column functions they
+# replaced (copied below) returned, with one intended difference: the old
+# calculate_year_over_year compared the raw current year value with 0, so a
+# zero stored as a string ("0") did not get the "-***" flag that a numeric
+# zero gets. The kernels see coerced values, so "0" is a zero like any other.
+
+import random
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import pytest
+from calculations import (
+    calculate_difference,
+    calculate_percentage,
+    calculate_year_over_year,
+)
+
+
+def calculate_percentage_reference(
+    numerator: pd.Series, denominator: pd.Series,
+) -> npt.NDArray:
+    return np.where(
+        (numerator == "***") | (denominator == "***"),
+        "***",
+        np.where(
+            pd.to_numeric(numerator, errors="coerce").isna()
+            & pd.to_numeric(denominator, errors="coerce").isna(),
+            None,
+            np.where(
+                pd.to_numeric(numerator, errors="coerce").isna(),
+                0,
+                pd.to_numeric(numerator, errors="coerce")
+                / pd.to_numeric(denominator, errors="coerce"),
+            ),
+        ),
+    )
+
+
+def calculate_difference_reference(
+    value1: pd.Series, value2: pd.Series,
+) -> npt.NDArray:
+    return np.where(
+        (value1 == "***") | (value2 == "***"),
+        "***",
+        np.where(
+            pd.to_numeric(value1, errors="coerce").isna(),
+            None,
+            pd.to_numeric(value1, errors="coerce")
+            - pd.to_numeric(value2, errors="coerce"),
+        ),
+    )
+
+
+def calculate_year_over_year_reference(
+    current_year: pd.Series, previous_year: pd.Series,
+) -> npt.NDArray:
+    return np.where(
+        (current_year == 0) & ((previous_year.isna()) | (previous_year == "***")),
+        "-***",
+        np.where(
+            (current_year == "***") | (previous_year == "***"),
+            "***",
+            np.where(
+                (pd.to_numeric(current_year, errors="coerce").isna())
+                & (pd.to_numeric(previous_year, errors="coerce").isna()),
+                None,
+                np.where(
+                    (~pd.to_numeric(current_year, errors="coerce").isna())
+                    & (pd.to_numeric(previous_year, errors="coerce").isna()),
+                    None,
+                    pd.to_numeric(current_year, errors="coerce")
+                    - pd.to_numeric(previous_year, errors="coerce"),
+                ),
+            ),
+        ),
+    )
+
+
+def string_zero_year_over_year(
+    current_year: pd.Series, previous_year: pd.Series, expected: npt.NDArray,
+) -> npt.NDArray:
+    # the intended difference from the old calculate_year_over_year: a zero
+    # stored as a string is flagged like a numeric zero
+    string_zero = current_year.map(
+        lambda v: isinstance(v, str) and pd.to_numeric(v, errors="coerce") == 0,
+    ).to_numpy(dtype=bool)
+
+    previous_missing = (previous_year.isna() | (previous_year == "***")).to_numpy(
+        dtype=bool,
+    )
+
+    expected = expected.astype(object)
+    expected[string_zero & previous_missing] = "-***"
+
+    return expected
+
+
+kernels = [
+    (calculate_percentage_reference, calculate_percentage, None),
+    (calculate_difference_reference, calculate_difference, None),
+    (
+        calculate_year_over_year_reference,
+        calculate_year_over_year,
+        string_zero_year_over_year,
+    ),
+]
+
+# values that exercise every special case of the kernels
+kernel_values = [
+    0, 0.0, 1, 7, 12.5, 250, -3, "***", None, np.nan, "12", "", "0", "0.0",
+]
+
+
+def assert_same_values(expected: npt.NDArray, result: npt.NDArray) -> None:
+    """
+    Exact comparison of two object arrays (same shape, same types, and same
+    values - NaN is equal to NaN).
+    """
+    assert expected.shape == result.shape
+    assert expected.dtype == result.dtype
+
+    for e, r in zip(expected.ravel(), result.ravel(), strict=True):
+        assert type(e) is type(r), (e, r)
+        assert e == r or (e != e and r != r), (e, r)  # noqa: PLR0124
+
+
+def random_blocks(rng: random.Random) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Two blocks of the same random shape: raw values (numbers, zeros, nulls,
+    "***", and numeric strings) or, one time in five, float columns.
+    """
+    num_rows = rng.randint(0, 12)
+    num_cols = rng.randint(1, 6)
+
+    numeric = rng.random() < 0.2  # noqa: PLR2004
+    choices = [0, 1.5, 7, np.nan] if numeric else kernel_values
+
+    return tuple(
+        pd.DataFrame(
+            [[rng.choice(choices) for _ in range(num_cols)] for _ in range(num_rows)],
+            columns=range(num_cols),
+            dtype=float if numeric else object,
+        )
+        for _ in range(2)
+    )
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize(
+    ("reference", "kernel", "intended"), kernels, ids=lambda k: getattr(k, "__name__", ""),
+)
+def test_kernels_match_reference(reference, kernel, intended, seed) -> None:  # noqa: ANN001
+    rng = random.Random(seed)
+
+    for _ in range(40):
+        left, right = random_blocks(rng)
+
+        expected = []
+
+        for col in left.columns:
+            column_expected = reference(left[col], right[col])
+
+            if intended is not None:
+                column_expected = intended(left[col], right[col], column_expected)
+
+            expected.append(column_expected)
+
+            assert_same_values(column_expected, kernel(left[col], right[col]))
+
+        # the whole block at once
+        assert_same_values(np.column_stack(expected), kernel(left, right))
+
+
+def test_year_over_year_string_zero() -> None:
+    current = pd.Series(["0", "0", "0.0", 0, "0", "5"], dtype=object)
+    previous = pd.Series([None, "***", np.nan, None, 3, None], dtype=object)
+
+    # the old function: only the numeric zero is flagged
+    old = calculate_year_over_year_reference(current, previous)
+    assert list(old) == [None, "***", None, "-***", -3.0, None]
+
+    result = calculate_year_over_year(current, previous)
+    assert list(result) == ["-***", "-***", "-***", "-***", -3.0, None]
+
+
+def test_string_zero_unchanged_in_percentage_and_difference() -> None:
+    numerator = pd.Series(["0", "0", 0, "***"], dtype=object)
+    denominator = pd.Series(["10", None, 10, "0"], dtype=object)
+
+    assert_same_values(
+        calculate_percentage_reference(numerator, denominator),
+        calculate_percentage(numerator, denominator),
+    )
+    assert_same_values(
+        calculate_difference_reference(numerator, denominator),
+        calculate_difference(numerator, denominator),
+    )
@@ -0,0 +1,199 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# tests: load_data                      #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+import math
+import os
+import sqlite3
+from pathlib import Path
+
+import load_data
+import prepare_database
+import pytest
+from load_data import (
+    get_academic_data,
+    get_context,
+    get_data_version,
+    get_demographic_data,
+    get_excluded_years,
+    get_tab_columns,
+    select_resident_rows,
+)
+from sqlalchemy import create_engine
+
+
+def touch(path: Path) -> None:
+    # a later modification time than the file system resolution allows
+    # a rebuild to have in a test
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**10))
+
+
+def add_year(database: Path, tables: list) -> None:
+    # a copy of the 2024 rows of each table as 2025
+    with sqlite3.connect(database) as conn:
+        for table in tables:
+            conn.execute(
+                f"CREATE TEMP TABLE new_year AS SELECT * FROM {table} WHERE Year = 2024",  # noqa: S608
+            )
+            conn.execute("UPDATE new_year SET Year = 2025")
+            conn.execute(f"INSERT INTO {table} SELECT * FROM new_year")  # noqa: S608
+            conn.execute("DROP TABLE new_year")
+
+    touch(database)
+
+
+def test_tab_columns_follow_the_database(database: Path) -> None:
+    columns = get_tab_columns("academic_data_k8", "ireadTab")
+
+    assert "Total|IREADTestN" in columns
+    assert "Total|ELATotalTested" not in columns
+    assert "Asian|IREADTestN" not in columns
+
+    # a new year of data adds a category
+    with sqlite3.connect(database) as conn:
+        conn.execute('ALTER TABLE academic_data_k8 ADD COLUMN "Asian|IREADTestN"')
+        conn.execute('UPDATE academic_data_k8 SET "Asian|IREADTestN" = 12')
+
+    touch(database)
+
+    assert "Asian|IREADTestN" in get_tab_columns("academic_data_k8", "ireadTab")
+
+    data = get_academic_data([2000], "K8", "ireadTab")
+
+    assert (data["Asian|IREAD Test N"] == 12).all()  # noqa: PLR2004
+
+
+def test_tab_without_measures_reads_all_columns(database: Path) -> None:  # noqa: ARG001
+    assert get_tab_columns("academic_data_k8", None) is None
+    assert get_tab_columns("academic_data_k8", "k8Tab") is None
+
+
+def corp_attendance(year: int) -> tuple:
+    data = get_demographic_data(
+        {"school_id": "2000", "school_type": "K8", "year": str(year)},
+    )
+
+    row = data[(data["School ID"] == 1000) & (data["Year"] == year)].iloc[0]  # noqa: PLR2004
+
+    return row["Attendance Rate"], row["Chronic Absenteeism %"]
+
+
+def test_corporation_attendance_is_coerced_like_pandas(
+    database: Path, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # the values of the four schools of corporation 1000 in 2024: negative,
+    # exponent, and malformed numbers are coerced as pd.to_numeric does
+    values = {
+        "StudentsChronicallyAbsent": ["-3", "1e1", "1.2.3", " 4 "],  # 11
+        "TotalStudentCount": ["100", "2e2", "1_000", ""],  # 300
+        "AttendanceRate": ["0.5", "1e-1", "1.2.3", "***"],  # 0.3
+    }
+
+    with sqlite3.connect(database) as conn:
+        rowids = conn.execute(
+            "SELECT rowid FROM academic_data_k8 WHERE CorporationID = 1000 "
+            "AND Year = 2024 ORDER BY rowid",
+        ).fetchall()
+
+        for column, column_values in values.items():
+            for (rowid,), value in zip(rowids, column_values, strict=True):
+                conn.execute(
+                    f'UPDATE academic_data_k8 SET "{column}" = ? WHERE rowid = ?',  # noqa: S608
+                    (value, rowid),
+                )
+
+    expected = (0.3, 11 / 300)
+
+    # aggregated on the fly
+    assert all(map(math.isclose, corp_attendance(2024), expected))
+
+    # read from corporation_attendance
+    monkeypatch.setattr(
+        prepare_database, "write_engine", create_engine(f"sqlite:///{database}"),
+    )
+    prepare_database.build_corporation_attendance()
+    touch(database)
+
+    assert all(map(math.isclose, corp_attendance(2024), expected))
+    assert prepare_database.check_corporation_attendance() == 0
+
+
+def test_stale_corporation_attendance_is_not_used(
+    database: Path, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        prepare_database, "write_engine", create_engine(f"sqlite:///{database}"),
+    )
+    prepare_database.build_corporation_attendance()
+
+    # a new year of data, loaded after corporation_attendance was built
+    add_year(database, ["academic_data_k8", "demographic_data_corp"])
+
+    with sqlite3.connect(database) as conn:
+        conn.execute(
+            "UPDATE academic_data_k8 SET AttendanceRate = 0.9 WHERE Year = 2025",
+        )
+
+    touch(database)
+
+    assert math.isclose(corp_attendance(2025)[0], 0.9)  # noqa: PLR2004
+
+    # current again once it is rebuilt
+    prepare_database.build_corporation_attendance()
+    touch(database)
+
+    assert math.isclose(corp_attendance(2025)[0], 0.9)  # noqa: PLR2004
+    assert prepare_database.check_corporation_attendance() == 0
+
+
+def test_current_years_follow_the_database(database: Path) -> None:
+    context = get_context()
+
+    assert context.current_academic_year == 2024  # noqa: PLR2004
+    assert context.current_demographic_year == 2024  # noqa: PLR2004
+    assert get_data_version().endswith("-2024-2024")
+
+    add_year(database, ["academic_data_k8"])
+
+    assert context.current_academic_year == 2025  # noqa: PLR2004
+    assert context.current_demographic_year == 2024  # noqa: PLR2004
+    assert get_excluded_years("2024", "academic") == [2025]
+    assert get_excluded_years("2024", "demographic") == []
+    assert get_data_version().endswith("-2025-2024")
+
+    add_year(database, ["demographic_data_corp"])
+
+    assert context.current_demographic_year == 2025  # noqa: PLR2004
+    assert get_data_version().endswith("-2025-2025")
+
+
+def test_resident_tables_follow_the_database(
+    database: Path, monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(load_data, "use_resident_data", True)
+
+    get_context()
+    resident = load_data.resident_tables["academic_data_k8"]
+
+    assert select_resident_rows("academic_data_k8", "Year", [2025]).empty
+
+    # unchanged, so not reloaded
+    select_resident_rows("academic_data_k8", "Year", [2024])
+
+    assert load_data.resident_tables["academic_data_k8"] is resident
+
+    add_year(database, ["academic_data_k8"])
+
+    rows = select_resident_rows("academic_data_k8", "Year", [2025])
+
+    assert len(rows) == len(select_resident_rows("academic_data_k8", "Year", [2024]))
+    assert load_data.resident_tables["academic_data_k8"] is not resident
+
+    data = get_academic_data([2000], "K8", "ireadTab")
+
+    assert 2025 in data["Year"].astype(int).tolist()  # noqa: PLR2004
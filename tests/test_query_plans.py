@@ -0,0 +1,58 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# tests: query plans                    #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+# The gate of "python prepare_database.py indexes": the queries that the
+# load_data functions send must not scan a full table once the indexes are
+# built (see prepare_database.get_dashboard_calls).
+
+from pathlib import Path
+
+import prepare_database
+import pytest
+from prepare_database import (
+    build_corporation_attendance,
+    capture_queries,
+    create_indexes,
+    explain_queries,
+    get_dashboard_calls,
+    get_sample_ids,
+)
+from sqlalchemy import create_engine
+
+
+@pytest.fixture(autouse=True)
+def write_engine(database: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # (the write engine is bound to the database path at import)
+    monkeypatch.setattr(
+        prepare_database, "write_engine", create_engine(f"sqlite:///{database}"),
+    )
+
+
+def test_hot_queries_use_indexes() -> None:
+    create_indexes()
+
+    assert explain_queries() == 0
+
+
+def test_hot_queries_use_indexes_with_corporation_attendance() -> None:
+    build_corporation_attendance()
+    create_indexes()
+
+    assert explain_queries() == 0
+
+
+def test_full_table_scans_are_reported() -> None:
+    # without the indexes, the lookups by school and corporation scan
+    assert explain_queries() > 0
+
+
+def test_every_call_sends_queries() -> None:
+    hot_calls, full_scan_calls = get_dashboard_calls(get_sample_ids())
+
+    for name, func, args in hot_calls + full_scan_calls:
+        assert capture_queries(func, *args), name
@@ -0,0 +1,203 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# tests: transpose_data                 #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+# transpose_data used to cross-merge every proficiency row with every n-size
+# row and keep the pairs where the n-size key was a substring of the
+# proficiency category. It now joins each proficiency row to the n-size row
+# whose key is the longest word-boundary prefix of the category. That
+# changes the output in two (intended) ways, both covered below:
+#   K8: "Non English Language Learners|ELA" also contained "English Language
+#       Learners|ELA", so those rows were paired with both n-size rows.
+#   HS/AHS: the substring dict was applied as a regex, where "|Cohort Count"
+#       is an alternation with the empty string, so no key matched and the
+#       result was always empty.
+# The rows are otherwise in the same order as before (proficiency column
+# order), whatever the order of the n-size columns.
+
+import numpy as np
+import pandas as pd
+from process_data import transpose_data
+
+columns = ["Category", "2023School", "2023SN-Size", "2024School", "2024SN-Size"]
+
+
+def school_info() -> dict:
+    return {
+        "Year": [2023, 2024],
+        "School ID": [1001, 1001],
+        "Corporation ID": [5000, 5000],
+        "School Name": ["A", "A"],
+        "Corporation Name": ["C", "C"],
+    }
+
+
+def k8_frame() -> pd.DataFrame:
+    data = school_info()
+    data["Low Grade"] = ["3", "3"]
+    data["High Grade"] = ["8", "8"]
+
+    categories = [
+        "Total", "Grade 3", "English Language Learners",
+        "Non English Language Learners", "Male", "Female",
+    ]
+
+    for i, category in enumerate(categories):
+        for subject in ["ELA", "Math"]:
+            data[f"{category}|{subject} Total Tested"] = [10.0 + i, 20.0 + i]
+            data[f"{category}|{subject} Proficient %"] = [0.1 * (i + 1), 0.05 * (i + 1)]
+
+    return pd.DataFrame(data)
+
+
+def hs_frame() -> pd.DataFrame:
+    data = school_info()
+
+    categories = [
+        "Total", "English Language Learners", "Non English Language Learners",
+    ]
+
+    for i, category in enumerate(categories):
+        data[f"{category}|Cohort Count"] = [30.0 + i, 40.0 + i]
+        data[f"{category}|Graduation Rate"] = [0.9 - i / 10, 0.8 - i / 10]
+        data[f"{category}|EBRW Total Tested"] = [12.0 + i, 14.0 + i]
+        data[f"{category}|EBRW Benchmark %"] = [0.5, 0.25 + i / 10]
+
+    return pd.DataFrame(data)
+
+
+def as_rows(data: pd.DataFrame) -> list:
+    assert list(data.columns) == columns
+
+    # (rounded, as the test frames are built with float arithmetic)
+    return [
+        tuple(
+            None if pd.isna(v) else round(v, 6) if isinstance(v, float) else v
+            for v in row
+        )
+        for row in data.itertuples(index=False)
+    ]
+
+
+# the output of the cross-merge implementation for k8_frame()
+previous_k8_rows = [
+    ("Total|ELA Proficient %", 0.1, 10.0, 0.05, 20.0),
+    ("Total|Math Proficient %", 0.1, 10.0, 0.05, 20.0),
+    ("Grade 3|ELA Proficient %", 0.2, 11.0, 0.1, 21.0),
+    ("Grade 3|Math Proficient %", 0.2, 11.0, 0.1, 21.0),
+    ("English Language Learners|ELA Proficient %", 0.3, 12.0, 0.15, 22.0),
+    ("English Language Learners|Math Proficient %", 0.3, 12.0, 0.15, 22.0),
+    ("Non English Language Learners|ELA Proficient %", 0.4, 12.0, 0.2, 22.0),
+    ("Non English Language Learners|ELA Proficient %", 0.4, 13.0, 0.2, 23.0),
+    ("Non English Language Learners|Math Proficient %", 0.4, 12.0, 0.2, 22.0),
+    ("Non English Language Learners|Math Proficient %", 0.4, 13.0, 0.2, 23.0),
+    ("Male|ELA Proficient %", 0.5, 14.0, 0.25, 24.0),
+    ("Male|Math Proficient %", 0.5, 14.0, 0.25, 24.0),
+    ("Female|ELA Proficient %", 0.6, 15.0, 0.3, 25.0),
+    ("Female|Math Proficient %", 0.6, 15.0, 0.3, 25.0),
+    ("Low Grade", "3", None, "3", None),
+    ("High Grade", "8", None, "8", None),
+]
+
+
+def test_k8_matches_previous_output_without_duplicate_pairs() -> None:
+    # the only difference from the previous output: Non English Language
+    # Learners is no longer also paired with the English Language Learners
+    # n-size (12.0 / 22.0)
+    expected = [
+        row
+        for row in previous_k8_rows
+        if not (row[0].startswith("Non English") and row[2] == 12.0)
+    ]
+
+    assert as_rows(transpose_data(k8_frame(), "K8")) == expected
+
+
+def test_k8_order_does_not_follow_n_size_columns() -> None:
+    # the n-size columns in reverse order, the proficiency columns last
+    data = k8_frame()
+
+    info = [c for c in data.columns if "|" not in c]
+    tested = [c for c in data.columns if "Total Tested" in c]
+    proficiency = [c for c in data.columns if "Proficient %" in c]
+
+    data = data[info + tested[::-1] + proficiency]
+
+    # the output of the cross-merge implementation for the frame, without
+    # the duplicate pairs
+    expected = [
+        ("Total|ELA Proficient %", 0.1, 10.0, 0.05, 20.0),
+        ("Total|Math Proficient %", 0.1, 10.0, 0.05, 20.0),
+        ("Grade 3|ELA Proficient %", 0.2, 11.0, 0.1, 21.0),
+        ("Grade 3|Math Proficient %", 0.2, 11.0, 0.1, 21.0),
+        ("English Language Learners|ELA Proficient %", 0.3, 12.0, 0.15, 22.0),
+        ("English Language Learners|Math Proficient %", 0.3, 12.0, 0.15, 22.0),
+        ("Non English Language Learners|ELA Proficient %", 0.4, 13.0, 0.2, 23.0),
+        ("Non English Language Learners|Math Proficient %", 0.4, 13.0, 0.2, 23.0),
+        ("Male|ELA Proficient %", 0.5, 14.0, 0.25, 24.0),
+        ("Male|Math Proficient %", 0.5, 14.0, 0.25, 24.0),
+        ("Female|ELA Proficient %", 0.6, 15.0, 0.3, 25.0),
+        ("Female|Math Proficient %", 0.6, 15.0, 0.3, 25.0),
+        ("Low Grade", "3", None, "3", None),
+        ("High Grade", "8", None, "8", None),
+    ]
+
+    assert as_rows(transpose_data(data, "K8")) == expected
+
+
+def test_k8_every_category_has_one_n_size() -> None:
+    result = transpose_data(k8_frame(), "K8")
+
+    assert not result["Category"].duplicated().any()
+
+
+def test_hs_rows_are_joined_to_their_n_size() -> None:
+    # the previous output was empty (see the note at the top of the file)
+    expected = [
+        ("Total|Graduation Rate", 0.9, 30.0, 0.8, 40.0),
+        ("Total|EBRW Benchmark %", 0.5, 12.0, 0.25, 14.0),
+        ("English Language Learners|Graduation Rate", 0.8, 31.0, 0.7, 41.0),
+        ("English Language Learners|EBRW Benchmark %", 0.5, 13.0, 0.35, 15.0),
+        ("Non English Language Learners|Graduation Rate", 0.7, 32.0, 0.6, 42.0),
+        ("Non English Language Learners|EBRW Benchmark %", 0.5, 14.0, 0.45, 16.0),
+    ]
+
+    assert as_rows(transpose_data(hs_frame(), "HS")) == expected
+
+
+def test_ahs_rows_are_joined_to_their_n_size() -> None:
+    # the AHS filter only keeps the Total graduation rate (previous output
+    # was empty as well)
+    expected = [
+        ("Total|Graduation Rate", 0.9, 30.0, 0.8, 40.0),
+        ("Total|EBRW Benchmark %", 0.5, 12.0, 0.25, 14.0),
+        ("English Language Learners|EBRW Benchmark %", 0.5, 13.0, 0.35, 15.0),
+        ("Non English Language Learners|EBRW Benchmark %", 0.5, 14.0, 0.45, 16.0),
+    ]
+
+    assert as_rows(transpose_data(hs_frame(), "AHS")) == expected
+
+
+def test_previous_hs_keys_did_not_match() -> None:
+    # why the previous HS/AHS output was empty: applied as a regex, the
+    # "|Cohort Count" key matches the empty string at every position
+    categories = pd.Series(["Total|Cohort Count"])
+
+    previous = categories.replace({r"|Cohort Count": r"|Graduation"}, regex=True)
+
+    assert previous[0] != "Total|Graduation"
+    assert not previous[0].startswith("Total|Graduation")
+
+
+def test_missing_n_size_is_nan() -> None:
+    data = k8_frame()
+    data["Total|ELA Total Tested"] = [0.0, np.nan]
+
+    result = transpose_data(data, "K8").set_index("Category")
+
+    assert np.isnan(result.loc["Total|ELA Proficient %", "2023SN-Size"])
+    assert np.isnan(result.loc["Total|ELA Proficient %", "2024SN-Size"])
@@ -0,0 +1,150 @@
+#########################################
+# ICSB Public School Academic Dashboard #
+# bounded pool for data requests        #
+#########################################
+# author:   jbetley (https://github.com/jbetley)
+# version:  0.9  # noqa: ERA001
+# date:     10/18/26
+
+# The data endpoints spend their time in sqlite queries and pandas. Under a
+# threaded server (gunicorn's gthread worker - see gunicorn.conf.py) one
+# worker serves many users at once, but running every request's pandas work
+# at the same time only adds contention for the GIL, and a burst of
+# requests would queue without limit. So the request threads hand the data
+# work to a small pool of threads: the request threads stay free for cheap
+# requests (/load, /config, 304s), the data work of concurrent users
+# overlaps up to the size of the pool (sqlite releases the GIL while a
+# query runs), and when more requests are waiting for the pool than it can
+# absorb they are rejected at once (Overloaded - a 503 with Retry-After)
+# instead of timing out.
+
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class Overloaded(Exception):  # noqa: N818
+    """
+    Raised when the pool cannot take (or finish in time) another job.
+    """
+
+
+class WorkPool:
+    """
+    A thread pool with a bound on the number of jobs that may be running or
+    waiting at once. Threads are started on first use, so a pool created
+    in a preforking server's master is safe to use in the workers.
+
+    Args:
+        max_workers (int): threads that run jobs
+        max_pending (int): jobs that may wait for a thread
+        timeout (float): seconds a caller waits for its job
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, timeout: float) -> None:
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="work_pool",
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def run(self, func: Callable, *args: object) -> object:
+        """
+        Runs func(*args) on the pool and returns its result (or raises its
+        exception).
+
+        Raises:
+            Overloaded: if max_workers + max_pending jobs are already running
+                or waiting, or if the job does not finish within timeout (it
+                is cancelled if it has not started)
+        """
+        return self.run_all([(func, *args)])[0]
+
+    def run_all(self, calls: list) -> list:
+        """
+        Runs several jobs at once on the pool (each job takes a slot) and
+        returns their results, in order. If a job raises an exception, it
+        is raised once every job has finished.
+
+        Args:
+            calls (list): (func, *args) tuples
+
+        Raises:
+            Overloaded: see run()
+        """
+        acquired = 0
+
+        for _ in calls:
+            if not self._slots.acquire(blocking=False):
+                for _ in range(acquired):
+                    self._slots.release()
+
+                with self._lock:
+                    self.rejected += 1
+
+                msg = "too many requests are waiting for data"
+                raise Overloaded(msg)
+
+            acquired += 1
+
+        with self._lock:
+            self._active += acquired
+
+        futures = []
+
+        for call in calls:
+            try:
+                future = self._executor.submit(*call)
+            except BaseException:
+                for _ in range(acquired - len(futures)):
+                    self._release()
+                raise
+
+            # the slot is held until the job finishes, even if the caller
+            # has given up on it
+            future.add_done_callback(lambda _: self._release())
+            futures.append(future)
+
+        _, not_done = wait(futures, timeout=self.timeout)
+
+        if not_done:
+            for future in not_done:
+                future.cancel()
+
+            with self._lock:
+                self.timeouts += 1
+
+            msg = f"data request did not finish in {self.timeout:g} seconds"
+            raise Overloaded(msg)
+
+        return [future.result() for future in futures]
+
+    def _release(self) -> None:
+        with self._lock:
+            self._active -= 1
+            self.completed += 1
+
+        self._slots.release()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: pool size, active (running or waiting) jobs, and counts of
+            completed, rejected, and timed out jobs
+        """
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "active": self._active,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }